@@ -0,0 +1,45 @@
+# Escolha de lote FEFO (first-expired-first-out): para uma vacina num
+# estoque (ou em qualquer estoque de uma unidade), o lote ainda válido,
+# com doses, que vence primeiro.
+#
+#     WHERE estoque_id = :e AND vacina_id = :v AND quantidade > 0 AND validade >= now()
+#     ORDER BY validade LIMIT 1
+#
+# é respondido pelo índice parcial idx_lote_fefo (model.py), que só tem os
+# lotes com doses: o histórico de lotes zerados não entra no índice, e a
+# busca é um range scan que para no primeiro lote.
+import datetime
+import uuid
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import model
+
+
+def consulta_fefo(vacina_id, estoque_id: Optional[int] = None, unidade_id: Optional[uuid.UUID] = None):
+    """SELECT do lote FEFO; `vacina_id` pode ser um valor ou uma subquery escalar."""
+    stmt = select(model.Lote).where(
+        model.Lote.vacina_id == vacina_id,
+        # mesmo predicado do índice parcial, senão o planner não usa
+        model.Lote.quantidade > 0,
+        model.Lote.validade >= datetime.datetime.now(),
+    )
+    if estoque_id is not None:
+        stmt = stmt.where(model.Lote.estoque_id == estoque_id)
+    if unidade_id is not None:
+        estoques = select(model.Estoque.id_estoque).where(model.Estoque.nome_unidade == unidade_id)
+        stmt = stmt.where(model.Lote.estoque_id.in_(estoques.scalar_subquery()))
+    return stmt.order_by(model.Lote.validade, model.Lote.id_lote).limit(1)
+
+
+async def lote_fefo(
+    db: AsyncSession,
+    vacina_id: int,
+    estoque_id: Optional[int] = None,
+    unidade_id: Optional[uuid.UUID] = None,
+    options=(),
+) -> Optional[model.Lote]:
+    stmt = consulta_fefo(vacina_id, estoque_id, unidade_id).options(*options)
+    return (await db.execute(stmt)).scalars().first()
@@ -0,0 +1,71 @@
+# Dados mínimos para testes e benchmarks que registram aplicações: uma
+# unidade com estoques, lotes e os usuários envolvidos, com nomes, CNPJs e
+# CPFs únicos por chamada (a base pode ser reaproveitada entre execuções).
+# Usado por tests/conftest.py e bench/estoque.py; não importa _comum, quem
+# importa este módulo já tem backend/ no sys.path.
+import datetime
+import uuid
+
+import model
+from database import AsyncSessionLocal
+
+
+def usuario(cls, sufixo: str, i: int, rotulo: str = "Teste", **extra):
+    return cls(
+        pnome=rotulo, unome=cls.__name__, senha=rotulo.lower(), telefone="0000000000",
+        email=f"{rotulo.lower()}.{cls.__name__.lower()}.{sufixo}.{i}@exemplo.com",
+        cpf_usuario=f"{sufixo[:8]}{i:03d}", **extra,
+    )
+
+
+async def criar_cenario(
+    lotes: int = 1, doses: int = 10, pacientes: int = 1, estoques: int = 1, rotulo: str = "Teste"
+) -> dict:
+    """
+    Uma unidade com `estoques` estoques e `lotes` lotes (cada um de uma
+    vacina diferente, com `doses` doses), mais os usuários para registrar
+    aplicações. Devolve os ids.
+    """
+    sufixo = uuid.uuid4().hex[:10]
+    agora = datetime.datetime.now()
+    async with AsyncSessionLocal() as db:
+        fabricante = model.Fabricante(cnpj_fabricante=sufixo, nome=rotulo, telefone="0")
+        fornecedor = model.Fornecedor(cnpj_fornecedor=sufixo, nome=rotulo, telefone="0")
+        unidade = model.UnidadeDeSaude(
+            nome_unidade=f"UBS {rotulo} {sufixo}", tipo=rotulo.lower(), rua="-", bairro="-",
+            cidade="-", estado="-",
+        )
+        lista_estoques = [
+            model.Estoque(unidade=unidade, gestor=usuario(model.Gestor, sufixo, i, rotulo))
+            for i in range(estoques)
+        ]
+        vacinas = [
+            model.Vacina(
+                nome=f"{rotulo} {sufixo} {i}", publico_alvo=rotulo.lower(), doenca=rotulo.lower(),
+                quantidade_doses=1, fabricante=fabricante,
+            )
+            for i in range(lotes)
+        ]
+        lista_doses = [model.Dose(intervalo=0, numero=1, vacina=v) for v in vacinas]
+        lista_lotes = [
+            model.Lote(
+                validade=agora + datetime.timedelta(days=365), data_chegada=agora, quantidade=doses,
+                estoque=lista_estoques[i % estoques], vacina=v, fornecedor=fornecedor,
+            )
+            for i, v in enumerate(vacinas)
+        ]
+        admin = usuario(model.Admin, sufixo, 0, rotulo)
+        profissional = usuario(model.Profissional, sufixo, 0, rotulo, garu_formacao=rotulo.lower())
+        lista_pacientes = [usuario(model.Paciente, sufixo, i, rotulo) for i in range(1, pacientes + 1)]
+        db.add_all([*lista_doses, *lista_lotes, admin, profissional, *lista_pacientes])
+        await db.commit()
+
+        return {
+            "unidade_id": unidade.id,
+            "estoques": [e.id_estoque for e in lista_estoques],
+            "lotes": [lote.id_lote for lote in lista_lotes],
+            "doses": [d.id_dose for d in lista_doses],
+            "admin_id": admin.id,
+            "profissional_id": profissional.id,
+            "pacientes": [p.id for p in lista_pacientes],
+        }
@@ -0,0 +1,27 @@
+# Peças comuns dos scripts de bench/.
+#
+# Os scripts rodam como `python bench/x.py`, com bench/ no sys.path e não
+# backend/. Importar este módulo antes dos módulos da aplicação resolve:
+#
+#     from _comum import latencias_ms
+#
+#     import model
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentil(valores: list, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def latencias_ms(latencias: list) -> dict:
+    """p50/p95/p99 em ms, no formato que todos os scripts imprimem."""
+    return {
+        f"p{int(p * 100)}_ms": round(percentil(latencias, p) * 1000, 2)
+        for p in (0.50, 0.95, 0.99)
+    }
@@ -0,0 +1,102 @@
+# Custo da autenticação (seguranca.py), sem precisar de banco.
+#
+#     python bench/auth.py --logins 200 --concorrencia 32
+#     python bench/auth.py --url http://localhost:8000 --email a@b.com --senha x   # login via HTTP
+#
+# Mede:
+#   - logins/s e p50/p95/p99 da verificação de senha no pool de processos;
+#   - o maior atraso do event loop durante esses logins (um "tique" a cada
+#     1 ms): se o hash rodasse inline, o atraso seria do tamanho do hash;
+#   - o custo por requisição de conferir o token (emitir + ler, em µs).
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from _comum import latencias_ms
+import seguranca
+from model import RoleEnum
+from senhas import gerar_hash
+
+
+async def _tique(parar: asyncio.Event, atrasos: list):
+    while not parar.is_set():
+        inicio = time.perf_counter()
+        await asyncio.sleep(0.001)
+        atrasos.append(time.perf_counter() - inicio - 0.001)
+
+
+async def medir_logins(logins: int, concorrencia: int, login) -> dict:
+    limite = asyncio.Semaphore(concorrencia)
+    latencias = []
+
+    async def um():
+        async with limite:
+            inicio = time.perf_counter()
+            assert await login()
+            latencias.append(time.perf_counter() - inicio)
+
+    await login()  # sobe os processos do pool
+    parar, atrasos = asyncio.Event(), []
+    tique = asyncio.create_task(_tique(parar, atrasos))
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(um() for _ in range(logins)))
+    duracao = time.perf_counter() - inicio
+    parar.set()
+    await tique
+
+    return {
+        "logins": logins,
+        "concorrencia": concorrencia,
+        "logins_por_s": round(logins / duracao, 1),
+        **latencias_ms(latencias),
+        "maior_atraso_event_loop_ms": round(max(atrasos, default=0) * 1000, 2),
+    }
+
+
+def medir_token(repeticoes: int) -> dict:
+    usuario_id = uuid.uuid4()
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        token, _ = seguranca.emitir_token(usuario_id, RoleEnum.PROFISSIONAL)
+    emitir = (time.perf_counter() - inicio) / repeticoes
+
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        seguranca.ler_token(token)
+    ler = (time.perf_counter() - inicio) / repeticoes
+
+    return {"emitir_token_us": round(emitir * 1e6, 2), "ler_token_us": round(ler * 1e6, 2)}
+
+
+async def main(args):
+    if args.url:
+        import httpx
+
+        async with httpx.AsyncClient(base_url=args.url, timeout=30) as http:
+            async def login():
+                resposta = await http.post("/auth/login", json={"email": args.email, "senha": args.senha})
+                return resposta.status_code == 200
+            logins = await medir_logins(args.logins, args.concorrencia, login)
+    else:
+        guardado = gerar_hash("senha-de-teste")
+
+        async def login():
+            return await seguranca.verificar_senha("senha-de-teste", guardado)
+        logins = await medir_logins(args.logins, args.concorrencia, login)
+        seguranca.encerrar_pool()
+
+    print(json.dumps({"login": logins, "token": medir_token(args.tokens)}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de login e de checagem de token.")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concorrencia", type=int, default=32)
+    parser.add_argument("--tokens", type=int, default=100_000, help="repetições da medida de token")
+    parser.add_argument("--url", help="mede o login pela API em vez de chamar o pool direto")
+    parser.add_argument("--email")
+    parser.add_argument("--senha")
+    asyncio.run(main(parser.parse_args()))
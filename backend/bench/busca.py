@@ -0,0 +1,109 @@
+# Latência da busca de usuários (busca.buscar_usuarios) direto no banco.
+#
+#     python bench/busca.py --popular 1000000   # cria 1M pacientes sintéticos
+#     python bench/busca.py --buscas 2000
+#
+# Mostra p50/p95/p99 e o plano de uma busca, para conferir que ela está
+# saindo do índice GIN parcial e não de um Seq Scan.
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from sqlalchemy import text
+
+from _comum import latencias_ms
+import busca
+from database import AsyncSessionLocal
+from model import RoleEnum
+
+PRENOMES = [
+    "Ana", "Bruno", "Carla", "Daniel", "Eduarda", "Felipe", "Gabriela", "Heitor",
+    "Isabela", "João", "Karina", "Lucas", "Mariana", "Nicolas", "Olivia", "Pedro",
+    "Rafaela", "Samuel", "Tatiane", "Vinicius", "Yasmin", "Kauã", "Erykles", "Beatriz",
+]
+SOBRENOMES = [
+    "Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira",
+    "Lima", "Gomes", "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes",
+    "Soares", "Fernandes", "Vieira", "Barbosa", "Rocha", "Dias", "Nascimento", "Andrade",
+]
+
+_POPULAR = """
+WITH novos AS (
+    INSERT INTO usuario (id, pnome, unome, senha, email, telefone, cpf_usuario, role)
+    SELECT
+        gen_random_uuid(),
+        p.nomes[1 + floor(random() * cardinality(p.nomes))::int],
+        s.nomes[1 + floor(random() * cardinality(s.nomes))::int],
+        'bench',
+        'bench' || i || '.' || md5(random()::text) || '@exemplo.com',
+        '0000000000',
+        lpad((CAST(:base AS bigint) + i)::text, 11, '0'),
+        'PACIENTE'
+    FROM generate_series(1, :n) AS i,
+         (SELECT CAST(:prenomes AS text[]) AS nomes) p,
+         (SELECT CAST(:sobrenomes AS text[]) AS nomes) s
+    RETURNING id
+)
+INSERT INTO paciente (id) SELECT id FROM novos
+"""
+
+
+async def popular(n: int):
+    async with AsyncSessionLocal() as db:
+        base = (await db.execute(text("SELECT count(*) FROM usuario"))).scalar()
+        await db.execute(text(_POPULAR), {
+            "prenomes": PRENOMES, "sobrenomes": SOBRENOMES, "n": n, "base": 10**10 + base,
+        })
+        await db.execute(text("ANALYZE usuario"))
+        await db.commit()
+
+
+async def medir(buscas: int) -> dict:
+    termos = [
+        random.choice([random.choice(PRENOMES), random.choice(SOBRENOMES)])[:random.randint(3, 7)]
+        for _ in range(buscas)
+    ]
+    latencias = []
+    async with AsyncSessionLocal() as db:
+        total = (await db.execute(text("SELECT count(*) FROM usuario"))).scalar()
+
+        # aquece cache e prepared statements
+        for termo in termos[:20]:
+            await busca.buscar_usuarios(db, RoleEnum.PACIENTE, termo)
+
+        for termo in termos:
+            inicio = time.perf_counter()
+            await busca.buscar_usuarios(db, RoleEnum.PACIENTE, termo)
+            latencias.append(time.perf_counter() - inicio)
+
+        plano = (await db.execute(
+            text(
+                "EXPLAIN (ANALYZE, BUFFERS) "
+                "SELECT id FROM usuario WHERE role = 'PACIENTE' "
+                "AND (pnome || ' ' || unome) %> :t "
+                "ORDER BY word_similarity(:t, pnome || ' ' || unome) DESC LIMIT 10"
+            ),
+            {"t": termos[0]},
+        )).scalars().all()
+
+    return {
+        "usuarios": total,
+        "buscas": buscas,
+        **latencias_ms(latencias),
+        "plano": plano,
+    }
+
+
+async def main(args):
+    if args.popular:
+        await popular(args.popular)
+    print(json.dumps(await medir(args.buscas), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da busca aproximada de usuários.")
+    parser.add_argument("--popular", type=int, default=0, help="insere N pacientes sintéticos antes")
+    parser.add_argument("--buscas", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
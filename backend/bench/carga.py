@@ -0,0 +1,61 @@
+# Teste de carga simples: N clientes concorrentes batendo em uma URL por
+# um tempo fixo. Mostra requisições/s e latências p50/p95/p99.
+#
+# Para comparar a API síncrona com a assíncrona, suba cada versão
+# (ex.: `git stash`/checkout do commit anterior) com o mesmo número de
+# workers e rode o mesmo comando contra as duas:
+#
+#     uvicorn main:app --workers 1
+#     python bench/carga.py http://localhost:8000/users/pacientes?limit=50 --clientes 200
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+from _comum import latencias_ms
+
+
+async def cliente(http: httpx.AsyncClient, url: str, fim: float, latencias: list, erros: list):
+    while time.perf_counter() < fim:
+        inicio = time.perf_counter()
+        try:
+            resposta = await http.get(url)
+            if resposta.status_code >= 400:
+                erros.append(resposta.status_code)
+        except httpx.HTTPError as e:
+            erros.append(type(e).__name__)
+        latencias.append(time.perf_counter() - inicio)
+
+
+async def rodar(url: str, clientes: int, duracao: float) -> dict:
+    latencias, erros = [], []
+    limites = httpx.Limits(max_connections=clientes, max_keepalive_connections=clientes)
+    async with httpx.AsyncClient(limits=limites, timeout=60) as http:
+        fim = time.perf_counter() + duracao
+        await asyncio.gather(
+            *(cliente(http, url, fim, latencias, erros) for _ in range(clientes))
+        )
+
+    return {
+        "url": url,
+        "clientes": clientes,
+        "duracao_s": duracao,
+        "requisicoes": len(latencias),
+        "erros": len(erros),
+        "req_por_s": round(len(latencias) / duracao, 1),
+        **latencias_ms(latencias),
+        "media_ms": round(statistics.fmean(latencias) * 1000, 2) if latencias else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga concorrente contra um endpoint.")
+    parser.add_argument("url")
+    parser.add_argument("--clientes", type=int, default=200)
+    parser.add_argument("--duracao", type=float, default=30.0, help="segundos")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(rodar(args.url, args.clientes, args.duracao)), indent=2))
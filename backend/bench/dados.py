@@ -0,0 +1,266 @@
+# Gera uma base sintética com volume real, via COPY (asyncpg).
+#
+#     python -m migracoes                      # schema criado antes
+#     python bench/dados.py                    # escala 1: 1M pacientes, 10M aplicações, 100k lotes
+#     python bench/dados.py --escala 0.01      # versão pequena para testar
+#
+# Todas as FKs são consistentes: a aplicação usa um lote da mesma vacina da
+# dose e a unidade dona do estoque do lote, e a data cai entre a chegada e
+# a validade do lote. Os triggers de aplicacao/lote ficam desligados
+# durante a carga, e os resumos, a agenda de doses e a cobertura são
+# reconstruídos no fim de uma vez (mesmo SQL das migrações).
+#
+# Todo usuário gerado tem a senha SENHA, para o benchmark de login.
+import argparse
+import asyncio
+import datetime
+import random
+import sys
+import time
+import uuid
+
+from sqlalchemy import text
+
+import _comum  # noqa: F401  (põe backend/ no sys.path)
+import caderneta
+import cobertura
+import resumos
+from database import AsyncSessionLocal
+from senhas import gerar_hash
+
+SENHA = "senha123"
+
+PRENOMES = [
+    "Ana", "Bruno", "Carla", "Daniel", "Eduarda", "Felipe", "Gabriela", "Heitor",
+    "Isabela", "João", "Karina", "Lucas", "Mariana", "Nicolas", "Olivia", "Pedro",
+    "Rafaela", "Samuel", "Tatiane", "Vinicius", "Yasmin", "Kauã", "Erykles", "Beatriz",
+]
+SOBRENOMES = [
+    "Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira",
+    "Lima", "Gomes", "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes",
+    "Soares", "Fernandes", "Vieira", "Barbosa", "Rocha", "Dias", "Nascimento", "Andrade",
+]
+VACINAS = [
+    ("BCG", "Tuberculose", 1), ("Hepatite B", "Hepatite B", 3), ("Pentavalente", "Difteria, tétano, coqueluche", 3),
+    ("VIP", "Poliomielite", 3), ("Rotavírus", "Diarreia por rotavírus", 2), ("Pneumo 10", "Pneumonia", 2),
+    ("Meningo C", "Meningite C", 2), ("Febre Amarela", "Febre amarela", 1), ("Tríplice Viral", "Sarampo, caxumba, rubéola", 2),
+    ("Hepatite A", "Hepatite A", 1), ("Varicela", "Catapora", 1), ("HPV", "HPV", 2),
+    ("dTpa", "Difteria, tétano, coqueluche", 1), ("Influenza", "Gripe", 1), ("Covid-19", "Covid-19", 2),
+]
+CIDADES = ["João Pessoa", "Campina Grande", "Patos", "Sousa", "Cajazeiras", "Bayeux", "Santa Rita", "Cabedelo"]
+
+# Volumes com --escala 1
+VOLUMES = {
+    "pacientes": 1_000_000,
+    "profissionais": 5_000,
+    "gestores": 500,
+    "admins": 50,
+    "unidades": 500,
+    "fornecedores": 50,
+    "lotes": 100_000,
+    "aplicacoes": 10_000_000,
+    "campanhas": 200,
+}
+
+LOTE_COPY = 100_000  # linhas por chamada de COPY
+
+
+def _quantos(nome: str, escala: float) -> int:
+    return max(1, int(VOLUMES[nome] * escala))
+
+
+class Gerador:
+    def __init__(self, conexao, escala: float, semente: int):
+        self.conexao = conexao  # conexão asyncpg
+        self.escala = escala
+        self.rnd = random.Random(semente)
+        self.agora = datetime.datetime.now().replace(microsecond=0)
+        self.cpf = 10**10
+
+    async def copiar(self, tabela: str, colunas: tuple, linhas):
+        """COPY em blocos de LOTE_COPY linhas, a partir de qualquer iterável."""
+        bloco, total = [], 0
+        for linha in linhas:
+            bloco.append(linha)
+            if len(bloco) == LOTE_COPY:
+                await self.conexao.copy_records_to_table(tabela, records=bloco, columns=colunas)
+                total += len(bloco)
+                bloco = []
+        if bloco:
+            await self.conexao.copy_records_to_table(tabela, records=bloco, columns=colunas)
+            total += len(bloco)
+        print(f"  {tabela}: {total}", flush=True)
+
+    async def usuarios(self, role: str, tabela: str, n: int, hash_senha: str, extra=None) -> list:
+        ids = [uuid.uuid4() for _ in range(n)]
+        rnd = self.rnd
+
+        def linhas():
+            for i, id_ in enumerate(ids):
+                self.cpf += 1
+                yield (
+                    id_, rnd.choice(PRENOMES), rnd.choice(SOBRENOMES), hash_senha,
+                    f"{role.lower()}{i}@exemplo.com", f"839{rnd.randrange(10**8):08d}",
+                    str(self.cpf), role,
+                )
+
+        await self.copiar(
+            "usuario",
+            ("id", "pnome", "unome", "senha", "email", "telefone", "cpf_usuario", "role"),
+            linhas(),
+        )
+        if extra:
+            await self.copiar(tabela, ("id",) + tuple(extra), ((id_,) + tuple(extra.values()) for id_ in ids))
+        else:
+            await self.copiar(tabela, ("id",), ((id_,) for id_ in ids))
+        return ids
+
+    async def ids(self, sql: str) -> list:
+        return [tuple(r) for r in await self.conexao.fetch(sql)]
+
+    async def gerar(self):
+        rnd, e = self.rnd, self.escala
+        hash_senha = gerar_hash(SENHA)
+
+        print("usuários")
+        pacientes = await self.usuarios("PACIENTE", "paciente", _quantos("pacientes", e), hash_senha)
+        profissionais = await self.usuarios(
+            "PROFISSIONAL", "profissional_de_saude", _quantos("profissionais", e), hash_senha,
+            extra={"garu_formacao": "Enfermagem"},
+        )
+        gestores = await self.usuarios("GESTOR", "gestor", _quantos("gestores", e), hash_senha)
+        admins = await self.usuarios("ADMIN", "admin", _quantos("admins", e), hash_senha)
+
+        print("cadastros")
+        fabricantes = [f"{i:014d}" for i in range(1, 11)]
+        await self.copiar(
+            "fabricante", ("cnpj_fabricante", "nome", "telefone"),
+            ((cnpj, f"Laboratório {i}", "8330000000") for i, cnpj in enumerate(fabricantes, 1)),
+        )
+        fornecedores = [f"{i:014d}" for i in range(100, 100 + _quantos("fornecedores", e))]
+        await self.copiar(
+            "fornecedor", ("cnpj_fornecedor", "nome", "telefone"),
+            ((cnpj, f"Distribuidora {i}", "8330000001") for i, cnpj in enumerate(fornecedores, 1)),
+        )
+        await self.copiar(
+            "vacina", ("nome", "publico_alvo", "doenca", "quantidade_de_doses", "fabricante_cnpj"),
+            ((nome, "Geral", doenca, doses, rnd.choice(fabricantes)) for nome, doenca, doses in VACINAS),
+        )
+        vacinas = await self.ids("SELECT codigo_vacina, quantidade_de_doses FROM vacina")
+        await self.copiar(
+            "dose", ("intervalo", "numero", "vacina_id"),
+            ((0 if n == 1 else 60, n, vacina_id) for vacina_id, doses in vacinas for n in range(1, doses + 1)),
+        )
+        doses_por_vacina: dict = {}
+        for id_dose, vacina_id in await self.ids("SELECT id_dose, vacina_id FROM dose ORDER BY numero"):
+            doses_por_vacina.setdefault(vacina_id, []).append(id_dose)
+
+        unidades = [uuid.uuid4() for _ in range(_quantos("unidades", e))]
+        await self.copiar(
+            "unidade_de_saude", ("id", "nome_unidade", "tipo", "rua", "bairro", "cidade", "estado", "numero"),
+            (
+                (id_, f"UBS {rnd.choice(SOBRENOMES)} {i}", "UBS", "Rua Principal", "Centro",
+                 rnd.choice(CIDADES), "PB", rnd.randrange(1, 2000))
+                for i, id_ in enumerate(unidades, 1)
+            ),
+        )
+        await self.copiar(
+            "estoque", ("nome_unidade", "gestor_id"),
+            ((id_, rnd.choice(gestores)) for id_ in unidades),
+        )
+        estoques = await self.ids("SELECT id_estoque, nome_unidade FROM estoque")
+
+        print("lotes")
+        await self.conexao.execute("ALTER TABLE lote DISABLE TRIGGER USER")
+
+        def lotes():
+            for _ in range(_quantos("lotes", e)):
+                chegada = self.agora - datetime.timedelta(days=rnd.randrange(0, 730))
+                validade = chegada + datetime.timedelta(days=rnd.randrange(90, 540))
+                yield (
+                    validade, chegada, rnd.choice((0, rnd.randrange(1, 500))),
+                    rnd.choice(estoques)[0], rnd.choice(vacinas)[0], rnd.choice(fornecedores),
+                )
+
+        await self.copiar(
+            "lote", ("validade", "data_chegada", "quantidade", "estoque_id", "vacina_id", "fornecedor_cnpj"),
+            lotes(),
+        )
+        unidade_do_estoque = dict(estoques)
+        lotes_gerados = await self.ids("SELECT id_lote, vacina_id, estoque_id, data_chegada, validade FROM lote")
+
+        print("aplicações")
+        # aplicacao é particionada por mês: o histórico gerado precisa das suas partições
+        await self.conexao.execute(
+            "SELECT criar_particoes_aplicacao($1, $2)",
+            min(chegada for _, _, _, chegada, _ in lotes_gerados).date(), self.agora.date(),
+        )
+        await self.conexao.execute("ALTER TABLE aplicacao DISABLE TRIGGER USER")
+
+        def aplicacoes():
+            for _ in range(_quantos("aplicacoes", e)):
+                id_lote, vacina_id, estoque_id, chegada, validade = rnd.choice(lotes_gerados)
+                fim = min(validade, self.agora)
+                segundos = max(1, int((fim - chegada).total_seconds()))
+                yield (
+                    chegada + datetime.timedelta(seconds=rnd.randrange(segundos)),
+                    rnd.choice(pacientes), rnd.choice(profissionais), rnd.choice(admins),
+                    unidade_do_estoque[estoque_id], rnd.choice(doses_por_vacina[vacina_id]), id_lote,
+                )
+
+        await self.copiar(
+            "aplicacao",
+            ("data", "paciente_id", "profissional_id", "admin_id", "unidade_nome", "dose_id", "lote_id"),
+            aplicacoes(),
+        )
+
+        print("campanhas")
+        await self.copiar(
+            "campanha", ("data_inicio", "data_fim", "nome_campanha", "admin_id"),
+            (
+                (inicio, inicio + datetime.timedelta(days=rnd.randrange(7, 90)), f"Campanha {i}", rnd.choice(admins))
+                for i in range(1, _quantos("campanhas", e) + 1)
+                for inicio in [self.agora - datetime.timedelta(days=rnd.randrange(0, 730))]
+            ),
+        )
+        campanhas = await self.ids("SELECT id_campanha FROM campanha")
+        await self.copiar(
+            "publicacao_campanha", ("campanha_id", "vacina_id"),
+            {(c, rnd.choice(vacinas)[0]) for (c,) in campanhas for _ in range(2)},
+        )
+
+        await self.conexao.execute("ALTER TABLE lote ENABLE TRIGGER USER")
+        await self.conexao.execute("ALTER TABLE aplicacao ENABLE TRIGGER USER")
+
+
+async def main(args):
+    inicio = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        if not args.forcar and (await db.execute(text("SELECT count(*) FROM usuario"))).scalar():
+            sys.exit("O banco já tem dados; use um banco vazio (ou --forcar para somar a eles).")
+
+        # COPY e os scripts de várias instruções vão direto na conexão asyncpg,
+        # dentro da transação da sessão
+        conexao = (await (await db.connection()).get_raw_connection()).driver_connection
+        await Gerador(conexao, args.escala, args.semente).gerar()
+
+        print("resumos, agenda de doses e cobertura")
+        await conexao.execute(resumos._RECONSTRUIR)
+        await conexao.execute(caderneta._RECONSTRUIR)
+        await conexao.execute(cobertura._RECONSTRUIR)
+        await db.commit()
+
+    async with AsyncSessionLocal() as db:
+        # ANALYZE fora da transação da carga, para o planner já ver os volumes
+        await db.execute(text("ANALYZE"))
+        await db.commit()
+
+    print(f"pronto em {time.perf_counter() - inicio:.0f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos em volume real.")
+    parser.add_argument("--escala", type=float, default=1.0, help="multiplica os volumes padrão")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--forcar", action="store_true", help="gera mesmo com o banco já populado")
+    asyncio.run(main(parser.parse_args()))
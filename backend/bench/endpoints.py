@@ -0,0 +1,242 @@
+# Micro-benchmark por endpoint: mede cada rota (listas, gets, buscas,
+# relatórios e escritas) com a base gerada por bench/dados.py e grava o
+# resultado em JSON, com o commit atual, para comparar entre versões.
+#
+#     python bench/dados.py --escala 0.1
+#     python bench/endpoints.py                      # app em processo (ASGI), sem rede
+#     python bench/endpoints.py --url http://localhost:8000
+#     python bench/endpoints.py --comparar bench/resultados/a.json bench/resultados/b.json
+#
+# Os ids usados nas requisições são sorteados da própria base, então cada
+# repetição toca linhas diferentes (e não só o que já está em cache). As
+# rotas de escrita registram aplicações de verdade e consomem estoque: rode
+# numa base descartável.
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+from sqlalchemy import text
+
+from _comum import latencias_ms
+import seguranca
+from database import AsyncSessionLocal
+from model import RoleEnum
+
+DIR_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+SENHA = "senha123"  # a mesma de bench/dados.py
+AMOSTRA = 1000  # ids sorteados por tabela
+
+
+async def amostrar() -> dict:
+    """Ids reais de cada tabela, para montar as requisições."""
+    consultas = {
+        "pacientes": "SELECT id FROM paciente",
+        "profissionais": "SELECT id FROM profissional_de_saude",
+        "admins": "SELECT id FROM admin",
+        "unidades": "SELECT id FROM unidade_de_saude",
+        "estoques": "SELECT id_estoque FROM estoque",
+        "lotes": "SELECT id_lote FROM lote",
+        "vacinas": "SELECT codigo_vacina FROM vacina",
+        "fornecedores": "SELECT cnpj_fornecedor FROM fornecedor",
+        "emails": "SELECT email FROM usuario WHERE role = 'PACIENTE'",
+    }
+    amostra = {}
+    async with AsyncSessionLocal() as db:
+        for nome, sql in consultas.items():
+            linhas = await db.execute(text(f"{sql} ORDER BY random() LIMIT {AMOSTRA}"))
+            amostra[nome] = [str(v) for v in linhas.scalars()]
+        # (unidade, dose) com lote válido, para as aplicações por FEFO darem certo
+        linhas = await db.execute(text(f"""
+            SELECT e.nome_unidade, d.id_dose, l.vacina_id
+            FROM lote l
+            JOIN estoque e ON e.id_estoque = l.estoque_id
+            JOIN dose d ON d.vacina_id = l.vacina_id
+            WHERE l.quantidade > 0 AND l.validade >= now()
+            ORDER BY random() LIMIT {AMOSTRA}
+        """))
+        amostra["alocaveis"] = [(str(u), d, v) for u, d, v in linhas]
+
+    vazias = [nome for nome, ids in amostra.items() if not ids]
+    if vazias:
+        sys.exit(f"Base sem dados em: {', '.join(vazias)}. Rode bench/dados.py antes.")
+    return amostra
+
+
+def casos(a: dict) -> dict:
+    """nome -> função que sorteia (método, caminho, params, corpo)."""
+    c = random.choice
+    hoje = datetime.date.today()
+
+    def aplicacao():
+        unidade, dose, _ = c(a["alocaveis"])
+        return {
+            "paciente_id": c(a["pacientes"]), "profissional_id": c(a["profissionais"]),
+            "admin_id": c(a["admins"]), "unidade_nome": unidade, "dose_id": dose,
+        }
+
+    def get(caminho, **params):
+        return lambda: ("GET", caminho() if callable(caminho) else caminho,
+                        {k: v() if callable(v) else v for k, v in params.items()}, None)
+
+    return {
+        # listas
+        "users": get("/users", limit=100),
+        "users_role": get("/users", role="PROFISSIONAL", limit=100),
+        "users_roles": get("/users", role=["PROFISSIONAL", "GESTOR"], limit=100),
+        "users_desc": get("/users", ordem="desc", limit=100),
+        "pacientes": get("/users/pacientes", limit=100),
+        "profissionais": get("/users/profissionais", limit=100),
+        "unidades": get("/ubs/unidades", limit=100),
+        "estoques": get("/ubs/estoques", limit=100),
+        "lotes": get("/ubs/lotes", limit=100),
+        "fornecedores": get("/ubs/fornecedores", limit=100),
+        "vacinas": get("/vacinas", limit=100),
+        # gets
+        "paciente": get(lambda: f"/users/pacientes/{c(a['pacientes'])}"),
+        "unidade": get(lambda: f"/ubs/unidades/{c(a['unidades'])}"),
+        "estoque": get(lambda: f"/ubs/estoques/{c(a['estoques'])}"),
+        "lote": get(lambda: f"/ubs/lotes/{c(a['lotes'])}"),
+        "fornecedor": get(lambda: f"/ubs/fornecedores/{c(a['fornecedores'])}"),
+        "caderneta": get(lambda: f"/users/pacientes/{c(a['pacientes'])}/caderneta"),
+        # buscas
+        "busca_pacientes": get("/users/pacientes/busca", termo=lambda: c(("silva", "ana s", "olive", "mari"))),
+        "busca_profissionais": get("/users/profissionais/busca", termo="santos"),
+        "busca_unidades": get("/ubs/unidades/busca", termo="ubs"),
+        "busca_vacinas": get("/vacinas/buscar", termo="hepa"),
+        # estoque e relatórios
+        "lote_fefo": get("/ubs/lotes/fefo", unidade_id=lambda: c(a["alocaveis"])[0],
+                         vacina_id=lambda: c(a["alocaveis"])[2]),
+        "vencimento": get("/ubs/lotes/vencimento"),
+        "vencimento_unidade": get("/ubs/lotes/vencimento", unidade_id=lambda: c(a["unidades"])),
+        "dashboard": get("/dashboard/resumo"),
+        "relatorio_mes": get("/relatorios/aplicacoes", inicio=str(hoje - datetime.timedelta(days=365)),
+                             fim=str(hoje), granularidade="mes"),
+        "relatorio_vacina": get("/relatorios/aplicacoes", inicio=str(hoje - datetime.timedelta(days=90)),
+                                fim=str(hoje), granularidade="semana", agrupar="vacina"),
+        "proximas_doses": get("/aplicacoes/proximas-doses", limit=100),
+        "health_db": get("/health/db"),
+        # escritas
+        "aplicacao": lambda: ("POST", "/aplicacoes/", {}, aplicacao()),
+        "aplicacao_batch_100": lambda: ("POST", "/aplicacoes/batch", {}, [aplicacao() for _ in range(100)]),
+        "login": lambda: ("POST", "/auth/login", {}, {"email": c(a["emails"]), "senha": SENHA}),
+    }
+
+
+async def medir(http: httpx.AsyncClient, sortear, repeticoes: int, aquecimento: int) -> dict:
+    latencias, status = [], {}
+    for i in range(aquecimento + repeticoes):
+        metodo, caminho, params, corpo = sortear()
+        inicio = time.perf_counter()
+        resposta = await http.request(metodo, caminho, params=params, json=corpo)
+        duracao = time.perf_counter() - inicio
+        if i >= aquecimento:
+            latencias.append(duracao)
+            status[resposta.status_code] = status.get(resposta.status_code, 0) + 1
+
+    return {
+        "repeticoes": repeticoes,
+        "status": {str(k): v for k, v in sorted(status.items())},
+        **latencias_ms(latencias),
+        "media_ms": round(statistics.fmean(latencias) * 1000, 2),
+    }
+
+
+def commit_atual() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+
+
+async def rodar(args) -> dict:
+    random.seed(args.semente)
+    amostra = await amostrar()
+    todos = casos(amostra)
+    escolhidos = {n: f for n, f in todos.items() if not args.so or any(s in n for s in args.so)}
+
+    # token de admin, emitido direto (o custo do login é medido à parte)
+    admin = amostra["admins"][0]
+    token, _ = seguranca.emitir_token(admin, RoleEnum.ADMIN)
+    cabecalhos = {"Authorization": f"Bearer {token}"}
+
+    if args.url:
+        http = httpx.AsyncClient(base_url=args.url, headers=cabecalhos, timeout=120)
+    else:
+        from main import app
+        http = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench", headers=cabecalhos, timeout=120
+        )
+
+    resultados = {}
+    async with http:
+        for nome, sortear in escolhidos.items():
+            resultados[nome] = await medir(http, sortear, args.repeticoes, args.aquecimento)
+            r = resultados[nome]
+            print(f"{nome:24} p50 {r['p50_ms']:9.2f} ms  p95 {r['p95_ms']:9.2f} ms  {r['status']}", flush=True)
+    seguranca.encerrar_pool()
+
+    async with AsyncSessionLocal() as db:
+        volumes = {
+            tabela: (await db.execute(text(f"SELECT count(*) FROM {tabela}"))).scalar()
+            for tabela in ("paciente", "aplicacao", "lote")
+        }
+
+    return {
+        "commit": commit_atual(),
+        "gerado_em": datetime.datetime.now().isoformat(timespec="seconds"),
+        "alvo": args.url or "asgi",
+        "repeticoes": args.repeticoes,
+        "volumes": volumes,
+        "endpoints": resultados,
+    }
+
+
+def comparar(antes_arq: str, depois_arq: str):
+    with open(antes_arq) as f:
+        antes = json.load(f)
+    with open(depois_arq) as f:
+        depois = json.load(f)
+
+    print(f"{'endpoint':24} {antes['commit']:>12} {depois['commit']:>12}   variação (p50)")
+    for nome in sorted(set(antes["endpoints"]) | set(depois["endpoints"])):
+        a, d = antes["endpoints"].get(nome), depois["endpoints"].get(nome)
+        if not a or not d:
+            print(f"{nome:24} {'-' if not a else a['p50_ms']:>12} {'-' if not d else d['p50_ms']:>12}")
+            continue
+        variacao = (d["p50_ms"] - a["p50_ms"]) / a["p50_ms"] * 100 if a["p50_ms"] else 0.0
+        print(f"{nome:24} {a['p50_ms']:>12} {d['p50_ms']:>12}   {variacao:+7.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latência de cada endpoint, gravada em JSON.")
+    parser.add_argument("--url", help="servidor já rodando; sem isso, usa o app em processo")
+    parser.add_argument("--repeticoes", type=int, default=200)
+    parser.add_argument("--aquecimento", type=int, default=20)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--so", nargs="*", help="só os endpoints cujo nome contém um destes trechos")
+    parser.add_argument("--saida", help="arquivo JSON (padrão: bench/resultados/<commit>-<data>.json)")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DEPOIS"))
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(*args.comparar)
+        sys.exit()
+
+    resultado = asyncio.run(rodar(args))
+    saida = args.saida or os.path.join(
+        DIR_RESULTADOS, f"{resultado['commit']}-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w") as f:
+        json.dump(resultado, f, indent=2)
+    print(f"gravado em {saida}")
@@ -0,0 +1,94 @@
+# Teste de estresse da baixa de estoque (registro.registrar_aplicacao).
+#
+#     python bench/estoque.py --doses 500 --pedidos 2000 --concorrencia 20
+#
+# Cria um lote com --doses doses e dispara --pedidos registros concorrentes
+# contra ele. Confere no fim que exatamente --doses deram certo, que o lote
+# zerou e que existem exatamente --doses aplicações dele: nenhuma dose
+# vendida duas vezes e nenhuma perdida. Mostra também registros/s e p50/p95/p99.
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from _comum import latencias_ms
+from _cenario import criar_cenario
+import model
+import registro
+import schemas
+from database import AsyncSessionLocal
+
+
+async def registrar(dados: schemas.AplicacaoCreate, limite: asyncio.Semaphore, latencias: list, status: dict):
+    async with limite:
+        inicio = time.perf_counter()
+        try:
+            async with AsyncSessionLocal() as db:
+                await registro.registrar_aplicacao(db, dados)
+            chave = "ok"
+        except HTTPException as e:
+            chave = str(e.status_code)
+        except Exception as e:
+            # deadlock, timeout do pool etc. entram no resultado em vez de
+            # derrubar o gather e esconder a contagem
+            chave = type(e).__name__
+        latencias.append(time.perf_counter() - inicio)
+        status[chave] = status.get(chave, 0) + 1
+
+
+async def main(args):
+    cenario = await criar_cenario(doses=args.doses, pacientes=50, rotulo="Bench")
+    pacientes = cenario["pacientes"]
+    fixture = {
+        "lote_id": cenario["lotes"][0],
+        "dose_id": cenario["doses"][0],
+        "unidade_nome": cenario["unidade_id"],
+        "admin_id": cenario["admin_id"],
+        "profissional_id": cenario["profissional_id"],
+    }
+
+    pedidos = [
+        schemas.AplicacaoCreate(paciente_id=pacientes[i % len(pacientes)], **fixture)
+        for i in range(args.pedidos)
+    ]
+    limite = asyncio.Semaphore(args.concorrencia)
+    latencias, status = [], {}
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(registrar(p, limite, latencias, status) for p in pedidos))
+    duracao = time.perf_counter() - inicio
+
+    async with AsyncSessionLocal() as db:
+        restante = (await db.get(model.Lote, fixture["lote_id"])).quantidade
+        aplicadas = (await db.execute(
+            select(func.count()).where(model.Aplicacao.lote_id == fixture["lote_id"])
+        )).scalar()
+
+    esperado = min(args.doses, args.pedidos)
+    correto = status.get("ok", 0) == esperado and aplicadas == esperado and restante == args.doses - esperado
+
+    print(json.dumps({
+        "doses": args.doses,
+        "pedidos": args.pedidos,
+        "concorrencia": args.concorrencia,
+        "status": status,
+        "restante_no_lote": restante,
+        "aplicacoes_gravadas": aplicadas,
+        "correto": correto,
+        "registros_por_s": round(args.pedidos / duracao, 1),
+        **latencias_ms(latencias),
+    }, indent=2))
+    if not correto:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estresse da baixa concorrente de estoque.")
+    parser.add_argument("--doses", type=int, default=500, help="doses no lote")
+    parser.add_argument("--pedidos", type=int, default=2000, help="registros disparados")
+    parser.add_argument("--concorrencia", type=int, default=20, help="registros em paralelo (<= pool)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,73 @@
+# Vazão e memória da exportação de aplicações (exportacao.py).
+#
+#     python bench/exportacao.py --inicio 2024-01-01 --fim 2024-01-31
+#     python bench/exportacao.py --inicio 2024-01-01 --fim 2024-12-31 --formato parquet
+#
+# Consome o stream direto dos geradores (sem HTTP), conta linhas e bytes e
+# mostra linhas/s e o pico de memória do processo. O pico deve ficar
+# parecido para um mês ou um ano: só um bloco de EXPORTACAO_LOTE linhas
+# fica em memória por vez.
+import argparse
+import asyncio
+import datetime
+import json
+import resource
+import sys
+import time
+
+import _comum  # noqa: F401  (põe backend/ no sys.path)
+import config
+import exportacao
+
+
+async def rodar(inicio: datetime.date, fim: datetime.date, formato: str) -> dict:
+    inicio_dt = datetime.datetime.combine(inicio, datetime.time.min)
+    fim_dt = datetime.datetime.combine(fim + datetime.timedelta(days=1), datetime.time.min)
+    gerar = exportacao.gerar_csv if formato == "csv" else exportacao.gerar_parquet
+
+    # conta as linhas pelos blocos do cursor, igual para os dois formatos
+    linhas = 0
+    blocos_originais = exportacao._blocos
+
+    async def contar_blocos(*args):
+        nonlocal linhas
+        async for bloco in blocos_originais(*args):
+            linhas += len(bloco)
+            yield bloco
+
+    exportacao._blocos = contar_blocos
+    memoria_antes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    bytes_ = 0
+    comeco = time.perf_counter()
+    primeiro = None
+    async for parte in gerar(inicio_dt, fim_dt):
+        if primeiro is None:
+            primeiro = time.perf_counter() - comeco
+        bytes_ += len(parte)
+    duracao = time.perf_counter() - comeco
+
+    return {
+        "formato": formato,
+        "inicio": str(inicio),
+        "fim": str(fim),
+        "lote": config.EXPORTACAO_LOTE,
+        "linhas": linhas,
+        "mb": round(bytes_ / 2**20, 1),
+        "segundos": round(duracao, 2),
+        "linhas_por_s": round(linhas / duracao) if duracao else 0,
+        "primeiro_bloco_ms": round((primeiro or 0) * 1000, 1),
+        # ru_maxrss é em KB no Linux
+        "pico_memoria_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "memoria_antes_mb": round(memoria_antes / 1024, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vazão da exportação de aplicações.")
+    parser.add_argument("--inicio", type=datetime.date.fromisoformat, required=True)
+    parser.add_argument("--fim", type=datetime.date.fromisoformat, required=True)
+    parser.add_argument("--formato", choices=("csv", "parquet"), default="csv")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(rodar(args.inicio, args.fim, args.formato)), indent=2))
@@ -0,0 +1,90 @@
+# Confere o roteamento primária/réplica (roteamento.py) sem precisar de
+# replicação de verdade: dois bancos na mesma instância fazem o papel.
+#
+#     createdb projkaua_replica
+#     DATABASE_URL=postgresql://.../projkaua_replica python -m migracoes
+#     DATABASE_REPLICA_URL=postgresql://.../projkaua_replica python bench/replica.py
+#
+# Como a "réplica" nunca recebe as escritas, ela se comporta como uma
+# réplica infinitamente atrasada: o que foi criado só aparece quando a
+# leitura vai para a primária. O script conta em qual engine cada
+# requisição executou SQL e confere:
+#
+#   1. GET sem cookie                       -> réplica
+#   2. POST                                 -> primária, e devolve o cookie
+#   3. GET do recurso criado, com o cookie  -> primária (200)
+#   4. o mesmo GET sem o cookie             -> réplica (404: ela está "atrasada")
+#   5. GET com cookie vencido               -> réplica
+import asyncio
+import json
+import random
+import sys
+import time
+
+import httpx
+from sqlalchemy import event
+
+import _comum  # noqa: F401  (põe backend/ no sys.path)
+import config
+from database import async_engine, async_engine_leitura
+from roteamento import COOKIE_ESCRITA
+
+contagem = {"primaria": 0, "replica": 0}
+
+
+def _contador(nome):
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        contagem[nome] += 1
+    return contar
+
+
+async def requisicao(http, metodo, caminho, cookies=None, **kwargs) -> dict:
+    antes = dict(contagem)
+    http.cookies.clear()
+    resposta = await http.request(metodo, caminho, cookies=cookies, **kwargs)
+    return {
+        "requisicao": f"{metodo} {caminho}",
+        "status": resposta.status_code,
+        "primaria": contagem["primaria"] - antes["primaria"],
+        "replica": contagem["replica"] - antes["replica"],
+        "cookie": resposta.cookies.get(COOKIE_ESCRITA),
+    }
+
+
+async def main():
+    if async_engine_leitura is async_engine:
+        sys.exit("Defina DATABASE_REPLICA_URL (outro banco) para testar o roteamento.")
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", _contador("primaria"))
+    event.listen(async_engine_leitura.sync_engine, "before_cursor_execute", _contador("replica"))
+
+    from main import app
+    cnpj = f"{random.randrange(10**14):014d}"
+    passos = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+        passos.append(("réplica", await requisicao(http, "GET", "/ubs/fornecedores/00000000000000")))
+        criado = await requisicao(
+            http, "POST", "/ubs/fornecedores", json={"cnpj": cnpj, "nome": "Teste réplica", "telefone": "0"}
+        )
+        passos.append(("primária", criado))
+        cookie = {COOKIE_ESCRITA: criado["cookie"] or ""}
+        passos.append(("primária", await requisicao(http, "GET", f"/ubs/fornecedores/{cnpj}", cookies=cookie)))
+        passos.append(("réplica", await requisicao(http, "GET", f"/ubs/fornecedores/{cnpj}")))
+        vencido = {COOKIE_ESCRITA: f"{time.time() - config.LEITURA_APOS_ESCRITA_S - 1:.3f}"}
+        passos.append(("réplica", await requisicao(http, "GET", f"/ubs/fornecedores/{cnpj}", cookies=vencido)))
+        await requisicao(http, "DELETE", f"/ubs/fornecedores/{cnpj}")
+
+    ok = True
+    for esperado, passo in passos:
+        chave = "primaria" if esperado == "primária" else "replica"
+        outra = "replica" if chave == "primaria" else "primaria"
+        passo["ok"] = passo[chave] > 0 and passo[outra] == 0
+        ok &= passo["ok"]
+    ok &= passos[1][1]["cookie"] is not None and passos[3][1]["status"] == 404
+
+    print(json.dumps({"ok": ok, "passos": [p for _, p in passos]}, indent=2, ensure_ascii=False))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+# Tempo de serialização de uma página de listagem, antes e depois do
+# caminho rápido (serializacao.py), por 10k linhas.
+#
+#     python bench/serializacao.py --linhas 10000 --repeticoes 20
+#
+# "antes": objetos ORM (Paciente) -> TypeAdapter com from_attributes ->
+#          dump em modo json -> json.dumps, como o FastAPI faz com response_model.
+# "depois": dicts da projeção -> TypeAdapter precompilado -> orjson.
+# A criação dos objetos ORM entra no "antes": é o que a projeção evita.
+import argparse
+import json
+import sys
+import time
+import uuid
+
+import orjson
+
+import _comum  # noqa: F401  (põe backend/ no sys.path)
+import model
+import schemas
+import serializacao
+
+
+def gerar_linhas(n: int) -> list[dict]:
+    return [
+        {
+            "id": uuid.uuid4(),
+            "pnome": f"Nome{i}",
+            "unome": f"Sobrenome{i}",
+            "email": f"paciente{i}@exemplo.com",
+            "telefone": "83999990000",
+            "cpf_usuario": f"{i:011d}",
+            "role": "PACIENTE",
+        }
+        for i in range(n)
+    ]
+
+
+def antes(linhas: list[dict]) -> bytes:
+    objetos = [model.Paciente(**{**linha, "senha": "x", "role": model.RoleEnum.PACIENTE}) for linha in linhas]
+    tipo = serializacao.adapter(schemas.Pagina[schemas.PacienteResponse])
+    pagina = tipo.validate_python({"itens": objetos, "proximo": None}, from_attributes=True)
+    return json.dumps(tipo.dump_python(pagina, mode="json"), ensure_ascii=False).encode()
+
+
+def depois(linhas: list[dict]) -> bytes:
+    return serializacao.resposta(
+        schemas.Pagina[schemas.PacienteResponse], {"itens": linhas, "proximo": None}
+    ).body
+
+
+def medir(funcao, linhas, repeticoes) -> float:
+    funcao(linhas)  # aquece (adapter, caches)
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(linhas)
+        tempos.append(time.perf_counter() - inicio)
+    return sorted(tempos)[len(tempos) // 2]
+
+
+def main(args):
+    linhas = gerar_linhas(args.linhas)
+    assert orjson.loads(antes(linhas)) == orjson.loads(depois(linhas))
+
+    t_antes = medir(antes, linhas, args.repeticoes)
+    t_depois = medir(depois, linhas, args.repeticoes)
+    por_10k = 10_000 / args.linhas
+    print(json.dumps({
+        "linhas": args.linhas,
+        "antes_ms_por_10k": round(t_antes * 1000 * por_10k, 2),
+        "depois_ms_por_10k": round(t_depois * 1000 * por_10k, 2),
+        "ganho": round(t_antes / t_depois, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de serialização das listagens.")
+    parser.add_argument("--linhas", type=int, default=10_000)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    main(parser.parse_args())
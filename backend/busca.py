@@ -0,0 +1,83 @@
+# Busca aproximada (pg_trgm) de usuários, unidades e vacinas.
+#
+# Todas as buscas usam o mesmo formato de consulta:
+#
+#     WHERE <expressão indexada> %> :termo [AND <predicado do índice parcial>]
+#     ORDER BY word_similarity(:termo, <expressão>) DESC LIMIT n
+#
+# `expr %> termo` é o operador de word similarity com a coluna do lado
+# esquerdo, que o índice GIN gin_trgm_ops responde direto. O limiar vem de
+# pg_trgm.word_similarity_threshold, configurado uma vez por conexão em
+# database.py (config.BUSCA_LIMIAR), e não a cada chamada.
+#
+# Para os índices parciais de usuario serem usados, a expressão e o filtro
+# de role precisam ser literalmente iguais aos do índice em model.py, por
+# isso o ' ' e a role entram como literais e não como parâmetros.
+from sqlalchemy import func, literal_column, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+import model
+from model import RoleEnum
+
+# Mesma expressão dos índices idx_usuario_nome_trgm_<role>
+NOME_COMPLETO = model.Usuario.pnome + literal_column("' '") + model.Usuario.unome
+
+
+def filtro_role(role: RoleEnum):
+    # literal para casar com o WHERE do índice parcial
+    return model.Usuario.role == literal_column(f"'{role.value}'")
+
+
+def _parecido(expressao, termo: str):
+    return expressao.op("%>", is_comparison=True)(termo)
+
+
+def _pontuacao(expressao, termo: str):
+    return func.word_similarity(termo, expressao)
+
+
+async def buscar_usuarios(db: AsyncSession, role: RoleEnum, termo: str, limite: int = config.BUSCA_LIMITE):
+    stmt = (
+        select(model.Usuario.id, NOME_COMPLETO.label("nome"))
+        .where(filtro_role(role), _parecido(NOME_COMPLETO, termo))
+        .order_by(_pontuacao(NOME_COMPLETO, termo).desc())
+        .limit(limite)
+    )
+    return (await db.execute(stmt)).all()
+
+
+async def buscar_unidades(db: AsyncSession, termo: str, limite: int = config.BUSCA_LIMITE):
+    nome = model.UnidadeDeSaude.nome_unidade
+    stmt = (
+        select(model.UnidadeDeSaude.id, nome)
+        .where(_parecido(nome, termo))
+        .order_by(_pontuacao(nome, termo).desc())
+        .limit(limite)
+    )
+    return (await db.execute(stmt)).all()
+
+
+async def buscar_vacinas(db: AsyncSession, termo: str, limite: int = config.BUSCA_LIMITE):
+    # Uma consulta por índice (nome da vacina, nome do fabricante) em vez de
+    # um OR entre duas tabelas, que o planner não consegue responder por índice
+    def por(expressao):
+        return (
+            select(
+                model.Vacina.codigo_vacina.label("id"),
+                model.Vacina.nome.label("nome"),
+                model.Fabricante.nome.label("fabricante"),
+                _pontuacao(expressao, termo).label("score"),
+            )
+            .join(model.Fabricante, model.Vacina.fabricante_cnpj == model.Fabricante.cnpj_fabricante)
+            .where(_parecido(expressao, termo))
+        )
+
+    candidatos = union_all(por(model.Vacina.nome), por(model.Fabricante.nome)).subquery()
+    stmt = (
+        select(candidatos.c.id, candidatos.c.nome, candidatos.c.fabricante)
+        .group_by(candidatos.c.id, candidatos.c.nome, candidatos.c.fabricante)
+        .order_by(func.max(candidatos.c.score).desc())
+        .limit(limite)
+    )
+    return (await db.execute(stmt)).all()
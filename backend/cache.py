@@ -0,0 +1,138 @@
+# Cache de leitura para dados de referência (vacinas, unidades,
+# fornecedores), com ETag.
+#
+# A resposta já serializada (bytes do JSON) fica no cache junto com o
+# ETag. Se o cliente mandar If-None-Match igual, volta 304 sem corpo;
+# na maioria das cargas de página nem o Postgres nem o Pydantic são usados.
+#
+# Invalidação por namespace versionado: cada escrita em criar_/atualizar_/
+# deletar_ incrementa a versão do namespace, e as chaves antigas deixam de
+# ser lidas (e somem por LRU/TTL). Com o backend em memória isso vale só
+# para o worker que recebeu a escrita; os outros ficam no máximo
+# CACHE_TTL_S desatualizados. Com Redis a invalidação é compartilhada.
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from fastapi import Request, Response
+
+import config
+import serializacao
+
+
+class MemoriaLRU:
+    def __init__(self, max_itens: int, ttl: float):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._dados: OrderedDict = OrderedDict()
+        self._versoes: dict = {}
+        self._lock = threading.Lock()
+
+    async def get(self, chave: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None:
+                return None
+            expira_em, valor = item
+            if expira_em < time.monotonic():
+                del self._dados[chave]
+                return None
+            self._dados.move_to_end(chave)
+            return valor
+
+    async def set(self, chave: str, valor: bytes):
+        with self._lock:
+            self._dados[chave] = (time.monotonic() + self.ttl, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_itens:
+                self._dados.popitem(last=False)
+
+    async def versao(self, namespace: str) -> int:
+        with self._lock:
+            return self._versoes.get(namespace, 0)
+
+    async def incrementar_versao(self, namespace: str):
+        with self._lock:
+            self._versoes[namespace] = self._versoes.get(namespace, 0) + 1
+
+
+class RedisCache:
+    def __init__(self, url: str, ttl: float):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis exige o pacote 'redis' instalado") from e
+        self._redis = redis.from_url(url)
+        self.ttl = ttl
+
+    async def get(self, chave: str) -> Optional[bytes]:
+        return await self._redis.get(f"cache:{chave}")
+
+    async def set(self, chave: str, valor: bytes):
+        await self._redis.set(f"cache:{chave}", valor, ex=int(self.ttl))
+
+    async def versao(self, namespace: str) -> int:
+        return int(await self._redis.get(f"cache-versao:{namespace}") or 0)
+
+    async def incrementar_versao(self, namespace: str):
+        await self._redis.incr(f"cache-versao:{namespace}")
+
+
+def criar_backend():
+    if config.CACHE_BACKEND == "redis":
+        return RedisCache(config.REDIS_URL, config.CACHE_TTL_S)
+    return MemoriaLRU(config.CACHE_MAX_ITENS, config.CACHE_TTL_S)
+
+
+backend = criar_backend()
+
+def _serializar(schema, dados) -> bytes:
+    tipo = serializacao.adapter(schema)
+    return tipo.dump_json(tipo.validate_python(dados, from_attributes=True))
+
+
+def _etag(corpo: bytes) -> str:
+    return '"' + hashlib.blake2b(corpo, digest_size=16).hexdigest() + '"'
+
+_TAMANHO_ETAG = 34  # 32 dígitos hex + aspas
+
+
+async def invalidar(namespace: str):
+    """Chamado pelos handlers de escrita: descarta tudo do namespace."""
+    await backend.incrementar_versao(namespace)
+
+
+async def resposta_em_cache(
+    request: Request,
+    namespace: str,
+    chave: str,
+    schema,
+    produzir: Callable[[], Awaitable],
+) -> Response:
+    """
+    Read-through: devolve do cache se tiver, senão chama `produzir()`,
+    serializa com `schema` e guarda. Responde 304 quando o If-None-Match
+    do cliente bate com o ETag atual.
+    """
+    versao = await backend.versao(namespace)
+    chave_completa = f"{namespace}:v{versao}:{chave}"
+
+    # o valor guardado é ETag + corpo, para não recalcular o hash a cada hit
+    valor = await backend.get(chave_completa)
+    if valor is None:
+        corpo = _serializar(schema, await produzir())
+        etag = _etag(corpo)
+        await backend.set(chave_completa, etag.encode() + corpo)
+    else:
+        etag, corpo = valor[:_TAMANHO_ETAG].decode(), valor[_TAMANHO_ETAG:]
+
+    # no-cache: o navegador guarda, mas revalida sempre (barato, é um 304)
+    cabecalhos = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [t.strip() for t in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=cabecalhos)
+
+    return Response(content=corpo, media_type="application/json", headers=cabecalhos)
@@ -0,0 +1,118 @@
+# Caderneta de vacinação do paciente e agenda da próxima dose.
+#
+# A tabela proxima_dose guarda, por (paciente, vacina), a próxima dose do
+# esquema e a data prevista (data da última aplicação + Dose.intervalo da
+# dose seguinte). Ela é mantida por um trigger AFTER INSERT em aplicacao
+# (instalado pela migração v0003), então "quem tem dose prevista nesta
+# semana" é um range scan no índice de data_prevista e não um recálculo
+# sobre todas as aplicações.
+#
+# Esquema completo fica com dose_id/data_prevista NULL e numero = última + 1;
+# o trigger só avança (número maior, ou mesmo número com data mais nova),
+# assim um registro retroativo de dose antiga não volta a agenda para trás.
+# Só INSERT é acompanhado: correção de aplicação (UPDATE/DELETE) não
+# recalcula a agenda.
+import datetime
+import uuid
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import model
+
+# Reconstrução completa (bench/dados.py): a última dose (maior número) de
+# cada paciente/vacina
+_RECONSTRUIR = """
+LOCK TABLE aplicacao IN SHARE MODE;
+
+TRUNCATE proxima_dose;
+
+INSERT INTO proxima_dose (paciente_id, vacina_id, dose_id, numero, data_prevista)
+SELECT DISTINCT ON (a.paciente_id, d.vacina_id)
+    a.paciente_id,
+    d.vacina_id,
+    s.id_dose,
+    coalesce(s.numero, d.numero + 1),
+    (a.data + make_interval(days => s.intervalo))::date
+FROM aplicacao a
+JOIN dose d ON d.id_dose = a.dose_id AND d.numero IS NOT NULL
+LEFT JOIN LATERAL (
+    SELECT id_dose, numero, intervalo FROM dose s
+    WHERE s.vacina_id = d.vacina_id AND s.numero > d.numero
+    ORDER BY s.numero LIMIT 1
+) s ON true
+ORDER BY a.paciente_id, d.vacina_id, d.numero DESC, a.data DESC;
+"""
+
+async def caderneta(db: AsyncSession, paciente_id: uuid.UUID) -> dict:
+    """
+    Aplicações do paciente com dose, vacina, lote e unidade, e a próxima
+    dose de cada vacina, tudo numa consulta só (a próxima dose vem por
+    LEFT JOIN em cada linha e é deduplicada aqui).
+    """
+    stmt = (
+        select(
+            model.Aplicacao.id_aplicacao,
+            model.Aplicacao.data,
+            model.Vacina.codigo_vacina.label("vacina_id"),
+            model.Vacina.nome.label("vacina"),
+            model.Dose.id_dose.label("dose_id"),
+            model.Dose.numero.label("dose_numero"),
+            model.Lote.id_lote.label("lote_id"),
+            model.Lote.validade.label("lote_validade"),
+            model.UnidadeDeSaude.id.label("unidade_id"),
+            model.UnidadeDeSaude.nome_unidade.label("unidade"),
+            model.ProximaDose.dose_id.label("proxima_dose_id"),
+            model.ProximaDose.numero.label("proxima_numero"),
+            model.ProximaDose.data_prevista.label("proxima_data_prevista"),
+        )
+        .join(model.Dose, model.Dose.id_dose == model.Aplicacao.dose_id)
+        .join(model.Vacina, model.Vacina.codigo_vacina == model.Dose.vacina_id)
+        .outerjoin(model.Lote, model.Lote.id_lote == model.Aplicacao.lote_id)
+        .outerjoin(model.UnidadeDeSaude, model.UnidadeDeSaude.id == model.Aplicacao.unidade_nome)
+        .outerjoin(
+            model.ProximaDose,
+            (model.ProximaDose.paciente_id == model.Aplicacao.paciente_id)
+            & (model.ProximaDose.vacina_id == model.Dose.vacina_id),
+        )
+        .where(model.Aplicacao.paciente_id == paciente_id)
+        .order_by(model.Aplicacao.data, model.Aplicacao.id_aplicacao)
+    )
+    linhas = (await db.execute(stmt)).mappings().all()
+
+    # sem aplicações: só aí vale a pena conferir se o paciente existe
+    if not linhas and await db.get(model.Paciente, paciente_id) is None:
+        raise HTTPException(status_code=404, detail="Paciente não encontrado")
+
+    proximas = {}
+    for linha in linhas:
+        if linha["proxima_dose_id"] is not None:
+            proximas[linha["vacina_id"]] = {
+                "vacina_id": linha["vacina_id"],
+                "vacina": linha["vacina"],
+                "dose_id": linha["proxima_dose_id"],
+                "numero": linha["proxima_numero"],
+                "data_prevista": linha["proxima_data_prevista"],
+            }
+
+    return {
+        "paciente_id": paciente_id,
+        "aplicacoes": [dict(linha) for linha in linhas],
+        "proximas_doses": sorted(proximas.values(), key=lambda p: p["data_prevista"]),
+    }
+
+
+async def doses_previstas(
+    db: AsyncSession, inicio: datetime.date, fim: datetime.date, vacina_id=None, limite: int = 1000
+):
+    """Pacientes com dose prevista em [inicio, fim], pelo índice de data_prevista."""
+    stmt = (
+        select(model.ProximaDose)
+        .where(model.ProximaDose.data_prevista >= inicio, model.ProximaDose.data_prevista <= fim)
+        .order_by(model.ProximaDose.data_prevista, model.ProximaDose.paciente_id)
+        .limit(limite)
+    )
+    if vacina_id is not None:
+        stmt = stmt.where(model.ProximaDose.vacina_id == vacina_id)
+    return (await db.execute(stmt)).scalars().all()
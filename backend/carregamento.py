@@ -0,0 +1,75 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, selectinload
+
+import model
+from database import async_engine, async_engine_leitura
+
+# Estratégias de carregamento por endpoint.
+#
+# Todos os relationship() do model são lazy; quem monta um Response com
+# objetos aninhados precisa passar essas options na query, senão cada
+# objeto da lista dispara um SELECT por relacionamento (N+1).
+# Na AsyncSession o lazy load nem é permitido (MissingGreenlet), então
+# essas options também são obrigatórias para o response não quebrar.
+#
+# joinedload: muitos-para-um com tabela pequena (vacina, fabricante,
+#   unidade, dose) -> entra no mesmo SELECT via LEFT JOIN.
+# selectinload: usuários (joined inheritance, muitas linhas distintas)
+#   -> um SELECT ... WHERE id IN (...) por relacionamento, por lote.
+
+VACINA = (
+    joinedload(model.Vacina.fabricante),
+)
+
+LOTE = (
+    joinedload(model.Lote.vacina).joinedload(model.Vacina.fabricante),
+)
+
+ESTOQUE = (
+    joinedload(model.Estoque.unidade),
+    selectinload(model.Estoque.gestor),
+)
+
+APLICACAO = (
+    selectinload(model.Aplicacao.paciente),
+    selectinload(model.Aplicacao.profissional),
+    selectinload(model.Aplicacao.admin),
+    joinedload(model.Aplicacao.dose),
+    joinedload(model.Aplicacao.unidade),
+)
+
+
+@contextmanager
+def max_queries(maximo: int, binds=None):
+    """
+    Helper de teste: falha se o bloco executar mais de `maximo` comandos SQL.
+
+        with max_queries(3):
+            await client.get("/ubs/lotes")
+
+    Conta nas duas engines assíncronas (primária e réplica, ver
+    roteamento.py), já que os GETs podem ir para qualquer uma. Serve para
+    pegar regressões de N+1 no CI (tests/test_carregamento.py).
+    """
+    if binds is None:
+        binds = {async_engine.sync_engine, async_engine_leitura.sync_engine}
+    comandos = []
+
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        comandos.append(statement)
+
+    for bind in binds:
+        event.listen(bind, "before_cursor_execute", contar)
+    try:
+        yield comandos
+    finally:
+        for bind in binds:
+            event.remove(bind, "before_cursor_execute", contar)
+
+    if len(comandos) > maximo:
+        raise AssertionError(
+            f"{len(comandos)} comandos SQL executados (máximo {maximo}):\n"
+            + "\n---\n".join(comandos)
+        )
@@ -0,0 +1,256 @@
+# Cobertura vacinal por unidade, vacina e campanha.
+#
+# Para cada (paciente, vacina) a tabela cobertura_paciente guarda quantas
+# doses distintas ele já tomou, a unidade da primeira aplicação e a data
+# dela. Em cima disso ficam dois agregados pequenos:
+#
+#   cobertura_unidade   (unidade, vacina)           iniciados, completos
+#   cobertura_campanha  (campanha, vacina, unidade) iniciados, completos
+#
+# "Iniciado" é quem tomou ao menos uma dose; "completo" é quem chegou a
+# Vacina.quantidade_doses doses distintas. A taxa é completos / iniciados.
+# O paciente conta para a unidade onde começou o esquema e para as
+# campanhas da vacina cuja janela contém a primeira dose.
+#
+# Manutenção incremental no mesmo molde de resumos.py: o trigger em
+# aplicacao só grava (paciente, vacina) em cobertura_pendente, e o job
+# recalcula esses pares a partir das aplicações deles (consulta por
+# idx_aplicacao_paciente_data), aplicando nos agregados a diferença entre
+# a linha antiga e a nova. Recalcular é idempotente, então um par
+# repetido ou já coberto por uma reconstrução não conta duas vezes.
+#
+# Mudanças que mexem em muitos pacientes de uma vez (doses de uma vacina,
+# janela ou vacinas de uma campanha) não passam por cobertura_paciente:
+# os triggers só anotam a vacina ou a campanha em cobertura_reconstruir e
+# o job refaz, a partir de cobertura_paciente, apenas as linhas dos
+# agregados daquela vacina/campanha. É DELETE + INSERT na mesma transação,
+# então quem consulta continua vendo os números antigos até o commit.
+#
+# Triggers e preenchimento inicial: migração v0005.
+import asyncio
+import logging
+import uuid
+from typing import Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+import model
+
+logger = logging.getLogger(__name__)
+
+# Reconstrução completa (bench/dados.py, depois de uma carga sem triggers).
+# Sem travar aplicacao: cobertura_pendente não é apagada, então o que for
+# gravado durante a reconstrução é recalculado no ciclo seguinte.
+_RECONSTRUIR = """
+TRUNCATE cobertura_paciente, cobertura_unidade, cobertura_campanha, cobertura_reconstruir;
+
+INSERT INTO cobertura_paciente (paciente_id, vacina_id, doses, unidade_id, primeira_data)
+SELECT a.paciente_id, d.vacina_id, count(DISTINCT a.dose_id),
+       (array_agg(a.unidade_nome ORDER BY a.data, a."id_aplicação"))[1], min(a.data)
+FROM aplicacao a JOIN dose d ON d.id_dose = a.dose_id
+GROUP BY a.paciente_id, d.vacina_id;
+
+INSERT INTO cobertura_unidade (unidade_id, vacina_id, iniciados, completos)
+SELECT c.unidade_id, c.vacina_id, count(*), count(*) FILTER (WHERE c.doses >= v.quantidade_de_doses)
+FROM cobertura_paciente c JOIN vacina v ON v.codigo_vacina = c.vacina_id
+GROUP BY c.unidade_id, c.vacina_id;
+
+INSERT INTO cobertura_campanha (campanha_id, vacina_id, unidade_id, iniciados, completos)
+SELECT pc.campanha_id, c.vacina_id, c.unidade_id,
+       count(*), count(*) FILTER (WHERE c.doses >= v.quantidade_de_doses)
+FROM cobertura_paciente c
+JOIN vacina v ON v.codigo_vacina = c.vacina_id
+JOIN publicacao_campanha pc ON pc.vacina_id = c.vacina_id
+JOIN campanha ca ON ca.id_campanha = pc.campanha_id
+ AND c.primeira_data BETWEEN ca.data_inicio AND ca.data_fim
+GROUP BY pc.campanha_id, c.vacina_id, c.unidade_id;
+"""
+
+# Um comando só: todas as CTEs enxergam a mesma foto, então `antigo` é o
+# estado de antes do INSERT/DELETE em cobertura_paciente e a contribuição
+# de cada par nos agregados é (novo - antigo).
+_CONSOLIDAR = """
+WITH d AS (
+    DELETE FROM cobertura_pendente RETURNING paciente_id, vacina_id
+), alvos AS (
+    SELECT DISTINCT paciente_id, vacina_id FROM d
+), novo AS (
+    SELECT t.paciente_id, t.vacina_id, count(DISTINCT a.dose_id) AS doses,
+           (array_agg(a.unidade_nome ORDER BY a.data, a."id_aplicação"))[1] AS unidade_id,
+           min(a.data) AS primeira_data
+    FROM alvos t
+    JOIN aplicacao a ON a.paciente_id = t.paciente_id
+    JOIN dose dd ON dd.id_dose = a.dose_id AND dd.vacina_id = t.vacina_id
+    GROUP BY t.paciente_id, t.vacina_id
+), antigo AS (
+    SELECT c.paciente_id, c.vacina_id, c.doses, c.unidade_id, c.primeira_data
+    FROM cobertura_paciente c JOIN alvos t USING (paciente_id, vacina_id)
+), removidos AS (
+    -- pares que ficaram sem nenhuma aplicação (correção/exclusão)
+    DELETE FROM cobertura_paciente c USING alvos t
+    WHERE c.paciente_id = t.paciente_id AND c.vacina_id = t.vacina_id
+      AND NOT EXISTS (SELECT 1 FROM novo n WHERE n.paciente_id = t.paciente_id AND n.vacina_id = t.vacina_id)
+), gravados AS (
+    INSERT INTO cobertura_paciente AS c (paciente_id, vacina_id, doses, unidade_id, primeira_data)
+    SELECT paciente_id, vacina_id, doses, unidade_id, primeira_data FROM novo
+    ON CONFLICT (paciente_id, vacina_id) DO UPDATE
+    SET doses = excluded.doses, unidade_id = excluded.unidade_id, primeira_data = excluded.primeira_data
+), contribuicao AS (
+    SELECT x.unidade_id, x.vacina_id, x.primeira_data, x.sinal, x.doses >= v.quantidade_de_doses AS completo
+    FROM (
+        SELECT unidade_id, vacina_id, primeira_data, doses, -1 AS sinal FROM antigo
+        UNION ALL
+        SELECT unidade_id, vacina_id, primeira_data, doses, 1 FROM novo
+    ) x
+    JOIN vacina v ON v.codigo_vacina = x.vacina_id
+), por_unidade AS (
+    INSERT INTO cobertura_unidade AS r (unidade_id, vacina_id, iniciados, completos)
+    SELECT unidade_id, vacina_id, sum(sinal), coalesce(sum(sinal) FILTER (WHERE completo), 0)
+    FROM contribuicao GROUP BY unidade_id, vacina_id
+    ON CONFLICT (unidade_id, vacina_id) DO UPDATE
+    SET iniciados = r.iniciados + excluded.iniciados, completos = r.completos + excluded.completos
+)
+INSERT INTO cobertura_campanha AS r (campanha_id, vacina_id, unidade_id, iniciados, completos)
+SELECT pc.campanha_id, x.vacina_id, x.unidade_id,
+       sum(x.sinal), coalesce(sum(x.sinal) FILTER (WHERE x.completo), 0)
+FROM contribuicao x
+JOIN publicacao_campanha pc ON pc.vacina_id = x.vacina_id
+JOIN campanha ca ON ca.id_campanha = pc.campanha_id
+ AND x.primeira_data BETWEEN ca.data_inicio AND ca.data_fim
+GROUP BY pc.campanha_id, x.vacina_id, x.unidade_id
+ON CONFLICT (campanha_id, vacina_id, unidade_id) DO UPDATE
+SET iniciados = r.iniciados + excluded.iniciados, completos = r.completos + excluded.completos
+"""
+
+# Recalculo dos agregados de algumas vacinas/campanhas, lendo só
+# cobertura_paciente (idx_cobertura_paciente_vacina_data)
+_RECALCULAR_UNIDADE = """
+INSERT INTO cobertura_unidade (unidade_id, vacina_id, iniciados, completos)
+SELECT c.unidade_id, c.vacina_id, count(*), count(*) FILTER (WHERE c.doses >= v.quantidade_de_doses)
+FROM cobertura_paciente c JOIN vacina v ON v.codigo_vacina = c.vacina_id
+WHERE c.vacina_id = ANY(:vacinas)
+GROUP BY c.unidade_id, c.vacina_id
+"""
+
+_RECALCULAR_CAMPANHA = """
+INSERT INTO cobertura_campanha (campanha_id, vacina_id, unidade_id, iniciados, completos)
+SELECT pc.campanha_id, c.vacina_id, c.unidade_id,
+       count(*), count(*) FILTER (WHERE c.doses >= v.quantidade_de_doses)
+FROM publicacao_campanha pc
+JOIN campanha ca ON ca.id_campanha = pc.campanha_id
+JOIN cobertura_paciente c ON c.vacina_id = pc.vacina_id
+ AND c.primeira_data BETWEEN ca.data_inicio AND ca.data_fim
+JOIN vacina v ON v.codigo_vacina = c.vacina_id
+WHERE pc.vacina_id = ANY(:vacinas) OR pc.campanha_id = ANY(:campanhas)
+GROUP BY pc.campanha_id, c.vacina_id, c.unidade_id
+"""
+
+# Chave do advisory lock: com vários workers só um consolida por vez
+_LOCK_COBERTURA = 7_420_004
+
+
+async def consolidar(db: AsyncSession) -> bool:
+    """Aplica as mudanças pendentes. Devolve False se outro worker já está fazendo isso."""
+    conseguiu = (
+        await db.execute(text("SELECT pg_try_advisory_xact_lock(:k)"), {"k": _LOCK_COBERTURA})
+    ).scalar()
+    if not conseguiu:
+        return False
+    # job fora do caminho das requisições: depois de um período parado (ou
+    # ao recalcular uma vacina inteira) o comando passa dos 30s da API
+    await db.execute(text("SET LOCAL statement_timeout = 0"))
+
+    invalidadas = (
+        await db.execute(text("DELETE FROM cobertura_reconstruir RETURNING vacina_id, campanha_id"))
+    ).all()
+    if invalidadas:
+        await recalcular(
+            db,
+            {v for v, _ in invalidadas if v is not None},
+            {c for _, c in invalidadas if c is not None},
+        )
+    await db.execute(text(_CONSOLIDAR))
+    return True
+
+
+async def recalcular(db: AsyncSession, vacinas: set, campanhas: set):
+    """Refaz as linhas dos agregados dessas vacinas (nos dois) e campanhas (em cobertura_campanha)."""
+    parametros = {"vacinas": list(vacinas), "campanhas": list(campanhas)}
+    await db.execute(text("DELETE FROM cobertura_unidade WHERE vacina_id = ANY(:vacinas)"), parametros)
+    await db.execute(text(_RECALCULAR_UNIDADE), parametros)
+    await db.execute(
+        text("DELETE FROM cobertura_campanha WHERE vacina_id = ANY(:vacinas) OR campanha_id = ANY(:campanhas)"),
+        parametros,
+    )
+    await db.execute(text(_RECALCULAR_CAMPANHA), parametros)
+    logger.info("Cobertura recalculada: vacinas %s, campanhas %s", sorted(vacinas), sorted(campanhas))
+
+
+async def loop_cobertura(session_factory, intervalo: float = config.COBERTURA_INTERVALO_S):
+    """Tarefa de fundo iniciada no lifespan do app."""
+    while True:
+        await asyncio.sleep(intervalo)
+        try:
+            async with session_factory() as db:
+                await consolidar(db)
+                await db.commit()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Falha ao consolidar cobertura vacinal")
+
+
+async def cobertura(
+    db: AsyncSession,
+    agrupar: str,
+    vacina_id: Optional[int] = None,
+    unidade_id: Optional[uuid.UUID] = None,
+    campanha_id: Optional[int] = None,
+) -> dict:
+    """
+    Cobertura por vacina e, conforme `agrupar`, por unidade ou campanha.
+    Lê só os agregados; filtrar por campanha usa cobertura_campanha mesmo
+    quando o agrupamento é outro.
+    """
+    usa_campanha = agrupar == "campanha" or campanha_id is not None
+    fonte = model.CoberturaCampanha if usa_campanha else model.CoberturaUnidade
+
+    chaves = [fonte.vacina_id, model.Vacina.nome.label("vacina")]
+    if agrupar == "unidade":
+        chaves += [fonte.unidade_id, model.UnidadeDeSaude.nome_unidade.label("unidade")]
+    elif agrupar == "campanha":
+        chaves += [fonte.campanha_id, model.Campanha.nome.label("campanha")]
+
+    iniciados = func.sum(fonte.iniciados)
+    stmt = (
+        select(*chaves, iniciados.label("iniciados"), func.sum(fonte.completos).label("completos"))
+        .join(model.Vacina, model.Vacina.codigo_vacina == fonte.vacina_id)
+        .group_by(*chaves)
+        .having(iniciados > 0)
+    )
+    if agrupar == "unidade":
+        stmt = stmt.join(model.UnidadeDeSaude, model.UnidadeDeSaude.id == fonte.unidade_id)
+        stmt = stmt.order_by(model.UnidadeDeSaude.nome_unidade, model.Vacina.nome)
+    elif agrupar == "campanha":
+        stmt = stmt.join(model.Campanha, model.Campanha.id_campanha == fonte.campanha_id)
+        stmt = stmt.order_by(model.Campanha.nome, model.Vacina.nome)
+    else:
+        stmt = stmt.order_by(model.Vacina.nome)
+
+    if vacina_id is not None:
+        stmt = stmt.where(fonte.vacina_id == vacina_id)
+    if unidade_id is not None:
+        stmt = stmt.where(fonte.unidade_id == unidade_id)
+    if campanha_id is not None:
+        stmt = stmt.where(fonte.campanha_id == campanha_id)
+
+    linhas = []
+    for linha in (await db.execute(stmt)).mappings():
+        item = dict(linha)
+        item["taxa"] = round(item["completos"] / item["iniciados"], 4)
+        linhas.append(item)
+
+    pendentes = (await db.execute(select(func.count()).select_from(model.CoberturaPendente))).scalar()
+    return {"agrupar": agrupar, "pendentes": pendentes, "linhas": linhas}
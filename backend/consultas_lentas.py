@@ -0,0 +1,163 @@
+# Captura de consultas lentas.
+#
+# O after_cursor_execute de database.py chama `registrar` para todo comando
+# que passou de SQL_LENTO_MS. As ocorrências são agrupadas pelo texto do
+# SQL (que já vem parametrizado, então a mesma consulta com outros valores
+# cai na mesma entrada) com rota, formato dos parâmetros (tipos, nunca os
+# valores) e durações.
+#
+# Com SQL_LENTO_AMOSTRAGEM > 0, essa fração das ocorrências também ganha
+# um EXPLAIN (ANALYZE, BUFFERS) rodado numa conexão à parte, com os mesmos
+# parâmetros, dentro de uma transação que sempre volta atrás. É o plano que
+# mostra quando uma busca por similaridade saiu do índice GIN e foi para
+# Seq Scan. Só leituras da engine assíncrona entram na amostra: SELECT sem
+# FOR UPDATE/SHARE e WITH sem INSERT/UPDATE/DELETE (o ANALYZE pegaria os
+# mesmos locks de linha da consulta original, disputando com ela). A
+# transação do EXPLAIN é READ ONLY, então o que escapar do filtro falha em
+# vez de executar. No máximo um EXPLAIN por consulta roda de cada vez.
+#
+# Como as métricas, o registro é por processo e fica só em memória.
+import asyncio
+import contextvars
+import datetime
+import json
+import random
+import re
+import threading
+
+import config
+
+_lock = threading.Lock()
+_entradas: dict = {}  # sql -> dict
+_tarefas: set = set()  # EXPLAINs em andamento (referência forte para o GC)
+
+
+def formato_parametros(parameters, executemany: bool) -> str:
+    """Tipos dos parâmetros, sem os valores: '(str, int)' ou '500 x (UUID, int)'."""
+    if executemany:
+        linhas = list(parameters or ())
+        return f"{len(linhas)} x {formato_parametros(linhas[0], False)}" if linhas else "0 x ()"
+    if isinstance(parameters, dict):
+        return "(" + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items()) + ")"
+    return "(" + ", ".join(type(v).__name__ for v in parameters or ()) + ")"
+
+
+_TRAVA_LINHAS = re.compile(r"\bFOR\s+(NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b", re.IGNORECASE)
+_ESCRITA = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE)\b", re.IGNORECASE)
+
+
+def _eh_leitura(statement: str) -> bool:
+    partes = statement.lstrip().split(None, 1)
+    if not partes or _TRAVA_LINHAS.search(statement):
+        return False
+    inicio = partes[0].upper()
+    # CTE que escreve (DELETE ... RETURNING dos deltas, baixa de estoque)
+    return inicio == "SELECT" or (inicio == "WITH" and not _ESCRITA.search(statement))
+
+
+def registrar(statement: str, parameters, executemany: bool, duracao: float, rota: str, engine=None):
+    """
+    Guarda a ocorrência e, se sorteada, agenda o EXPLAIN em `engine`
+    (a AsyncEngine; None quando o comando veio da engine síncrona).
+    """
+    if statement.lstrip()[:7].upper() == "EXPLAIN":
+        return  # o próprio EXPLAIN ANALYZE também é lento
+
+    agora = datetime.datetime.now()
+    with _lock:
+        entrada = _entradas.get(statement)
+        if entrada is None:
+            if len(_entradas) >= config.SQL_LENTO_MAX:
+                # descarta a de menor tempo total para abrir espaço
+                del _entradas[min(_entradas, key=lambda s: _entradas[s]["total_s"])]
+            entrada = _entradas[statement] = {
+                "sql": statement,
+                "rotas": {},
+                "parametros": formato_parametros(parameters, executemany),
+                "execucoes": 0,
+                "total_s": 0.0,
+                "max_s": 0.0,
+                "ultima_em": agora,
+                "plano": None,
+                "plano_em": None,
+                "explicando": False,
+            }
+        entrada["execucoes"] += 1
+        entrada["total_s"] += duracao
+        entrada["max_s"] = max(entrada["max_s"], duracao)
+        entrada["ultima_em"] = agora
+        entrada["rotas"][rota] = entrada["rotas"].get(rota, 0) + 1
+
+        amostrar = (
+            engine is not None
+            and not executemany
+            and not entrada["explicando"]
+            and _eh_leitura(statement)
+            and random.random() < config.SQL_LENTO_AMOSTRAGEM
+        )
+        if not amostrar:
+            return
+        entrada["explicando"] = True
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        entrada["explicando"] = False
+        return
+    # contexto vazio: o tempo do EXPLAIN não entra na MedicaoSQL da requisição
+    tarefa = contextvars.Context().run(loop.create_task, _explicar(engine, statement, parameters))
+    _tarefas.add(tarefa)
+    tarefa.add_done_callback(_tarefas.discard)
+
+
+async def _explicar(engine, statement: str, parameters):
+    plano = None
+    try:
+        async with engine.connect() as conexao:
+            transacao = await conexao.begin()
+            try:
+                await conexao.exec_driver_sql("SET TRANSACTION READ ONLY")
+                plano = (
+                    await conexao.exec_driver_sql(
+                        f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", parameters
+                    )
+                ).scalar()
+            finally:
+                # ANALYZE executa de fato; nada do que a consulta fizer fica
+                await transacao.rollback()
+        if isinstance(plano, str):
+            plano = json.loads(plano)
+    except Exception as e:
+        plano = {"erro": f"{type(e).__name__}: {e}"}
+    finally:
+        with _lock:
+            entrada = _entradas.get(statement)
+            if entrada is not None:
+                entrada["explicando"] = False
+                if plano is not None:
+                    entrada["plano"], entrada["plano_em"] = plano, datetime.datetime.now()
+
+
+def listar(ordem: str = "max", limite: int = 20) -> list:
+    """As piores consultas, pela duração máxima, total, média ou número de execuções."""
+    chaves = {
+        "max": lambda e: e["max_s"],
+        "total": lambda e: e["total_s"],
+        "media": lambda e: e["total_s"] / e["execucoes"],
+        "execucoes": lambda e: e["execucoes"],
+    }
+    with _lock:
+        entradas = sorted(_entradas.values(), key=chaves[ordem], reverse=True)[:limite]
+        return [
+            {
+                **{k: v for k, v in e.items() if k not in ("explicando", "rotas")},
+                "rotas": dict(e["rotas"]),
+                "media_s": e["total_s"] / e["execucoes"],
+            }
+            for e in entradas
+        ]
+
+
+def limpar():
+    with _lock:
+        _entradas.clear()
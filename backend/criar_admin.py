@@ -0,0 +1,39 @@
+# Cria um admin direto no banco. POST /users/admins exige um token de
+# admin, então o primeiro de cada ambiente sai daqui:
+#
+#     python criar_admin.py --pnome Ana --unome Souza --email ana@exemplo.com \
+#         --telefone 11999990000 --cpf 12345678900
+#
+# A senha é pedida no terminal (não fica no histórico do shell).
+import argparse
+import asyncio
+import getpass
+
+import model
+from database import AsyncSessionLocal
+from senhas import gerar_hash
+
+
+async def criar(args, senha: str) -> model.Admin:
+    async with AsyncSessionLocal() as db:
+        admin = model.Admin(
+            pnome=args.pnome, unome=args.unome, email=args.email, telefone=args.telefone,
+            cpf_usuario=args.cpf, senha=gerar_hash(senha),
+        )
+        db.add(admin)
+        await db.commit()
+        return admin
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cria um usuário admin.")
+    for campo in ("pnome", "unome", "email", "telefone", "cpf"):
+        parser.add_argument(f"--{campo}", required=True)
+    args = parser.parse_args()
+
+    senha = getpass.getpass("Senha: ")
+    if not senha or senha != getpass.getpass("Repita a senha: "):
+        raise SystemExit("Senhas vazias ou diferentes")
+
+    admin = asyncio.run(criar(args, senha))
+    print(f"Admin criado: {admin.id}")
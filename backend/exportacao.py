@@ -0,0 +1,146 @@
+# Exportação de aplicações (CSV ou Parquet) em streaming.
+#
+# Uma linha por aplicação, já com paciente, vacina, dose, lote e unidade,
+# saindo de um cursor no servidor (asyncpg, dentro de uma transação
+# REPEATABLE READ, então o arquivo todo vem da mesma foto do banco). O
+# cursor é lido em blocos de EXPORTACAO_LOTE linhas e cada bloco vira um
+# pedaço da resposta: a memória fica no tamanho de um bloco, não do mês.
+#
+# A consulta vai direto no driver, sem ORM nem Row do SQLAlchemy: num
+# extrato de milhões de linhas o custo por linha é o que manda. O filtro
+# por data abre só as partições do período (particoes.py).
+#
+# Parquet usa pyarrow (opcional, só para este formato): cada bloco vira um
+# row group escrito assim que fica pronto, e o rodapé sai no fim.
+import csv
+import datetime
+import io
+
+import config
+from database import async_engine_leitura
+
+_CONSULTA = """
+SELECT a."id_aplicação", a.data,
+       a.paciente_id, p.pnome || ' ' || p.unome, p.cpf_usuario,
+       v.codigo_vacina, v.nome, d.id_dose, d.numero,
+       l.id_lote, l.validade,
+       u.id, u.nome_unidade,
+       a.profissional_id, pr.pnome || ' ' || pr.unome
+FROM aplicacao a
+JOIN usuario p ON p.id = a.paciente_id
+JOIN usuario pr ON pr.id = a.profissional_id
+JOIN dose d ON d.id_dose = a.dose_id
+JOIN vacina v ON v.codigo_vacina = d.vacina_id
+JOIN lote l ON l.id_lote = a.lote_id
+JOIN unidade_de_saude u ON u.id = a.unidade_nome
+WHERE a.data >= $1 AND a.data < $2
+ORDER BY a.data, a."id_aplicação"
+"""
+
+# (nome da coluna no arquivo, tipo no Parquet); mesma ordem do SELECT
+COLUNAS = (
+    ("id_aplicacao", "int64"),
+    ("data", "timestamp"),
+    ("paciente_id", "uuid"),
+    ("paciente", "string"),
+    ("paciente_cpf", "string"),
+    ("vacina_id", "int32"),
+    ("vacina", "string"),
+    ("dose_id", "int64"),
+    ("dose_numero", "int32"),
+    ("lote_id", "int64"),
+    ("lote_validade", "timestamp"),
+    ("unidade_id", "uuid"),
+    ("unidade", "string"),
+    ("profissional_id", "uuid"),
+    ("profissional", "string"),
+)
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+async def _blocos(inicio: datetime.datetime, fim: datetime.datetime):
+    """Blocos de até EXPORTACAO_LOTE tuplas, lidos do cursor no servidor."""
+    async with async_engine_leitura.connect() as conn:
+        conexao = (await conn.get_raw_connection()).driver_connection
+        async with conexao.transaction(isolation="repeatable_read", readonly=True):
+            cursor = await conexao.cursor(_CONSULTA, inicio, fim)
+            while True:
+                linhas = await cursor.fetch(config.EXPORTACAO_LOTE)
+                if not linhas:
+                    break
+                yield linhas
+
+
+async def gerar_csv(inicio: datetime.datetime, fim: datetime.datetime):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator="\n")
+    escritor.writerow(nome for nome, _ in COLUNAS)
+    async for linhas in _blocos(inicio, fim):
+        escritor.writerows(linhas)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()  # só o cabeçalho, período sem aplicações
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("Exportar em Parquet exige o pacote 'pyarrow' instalado") from e
+    return pyarrow, pyarrow.parquet
+
+
+class _Pedacos(io.RawIOBase):
+    """Arquivo só de escrita que acumula os bytes até alguém pegá-los."""
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def retirar(self) -> bytes:
+        dados, self._partes = b"".join(self._partes), []
+        return dados
+
+
+async def gerar_parquet(inicio: datetime.datetime, fim: datetime.datetime):
+    pa, pq = _pyarrow()
+    tipos = {
+        "int64": pa.int64(), "int32": pa.int32(), "string": pa.string(),
+        "uuid": pa.string(), "timestamp": pa.timestamp("us"),
+    }
+    schema = pa.schema([(nome, tipos[tipo]) for nome, tipo in COLUNAS])
+    uuids = [i for i, (_, tipo) in enumerate(COLUNAS) if tipo == "uuid"]
+
+    saida = _Pedacos()
+    escritor = pq.ParquetWriter(saida, schema, compression="zstd")
+    try:
+        async for linhas in _blocos(inicio, fim):
+            colunas = [list(c) for c in zip(*linhas)]
+            for i in uuids:
+                colunas[i] = [str(v) for v in colunas[i]]
+            escritor.write_table(pa.Table.from_arrays(
+                [pa.array(c, type=campo.type) for c, campo in zip(colunas, schema)], schema=schema
+            ))
+            yield saida.retirar()
+    finally:
+        escritor.close()
+    yield saida.retirar()  # rodapé
+
+
+def verificar_formato(formato: str):
+    """Falha antes de abrir o stream (depois dele não dá mais para mudar o status)."""
+    if formato == "parquet":
+        _pyarrow()
@@ -0,0 +1,304 @@
+# Importação em massa de pacientes a partir de CSV.
+#
+# O arquivo vai direto para uma tabela temporária via COPY, é validado com
+# UPDATEs em conjunto (nada linha a linha em Python) e depois entra em
+# usuario/paciente com INSERT ... SELECT, tudo em uma única transação.
+#
+# A importação não calcula hash: scrypt custa ~12ms por senha, e fazer isso
+# linha a linha dentro da transação do COPY a deixaria aberta por horas num
+# arquivo grande. As senhas entram como vieram e `loop_senhas` (iniciado no
+# lifespan) as troca pelo hash depois do commit, em transações curtas. Até
+# lá o login aceita a senha pelo caminho legado (routes/auth.py).
+#
+# Uso pela linha de comando:
+#
+#     python importacao.py pacientes.csv
+import asyncio
+import csv
+import io
+import logging
+from typing import BinaryIO
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+import seguranca
+
+logger = logging.getLogger(__name__)
+
+# Colunas aceitas no cabeçalho do CSV (a ordem é livre)
+COLUNAS = ("pnome", "unome", "senha", "email", "telefone", "cpf_usuario")
+
+# Quantos erros voltam detalhados na resposta (o total vem sempre)
+MAX_ERROS_RELATORIO = 1000
+
+# Senhas em texto puro trocadas pelo hash por transação do job
+LOTE_HASH = 256
+
+# Chave do advisory lock: com vários workers só um calcula hashes por vez
+_LOCK_SENHAS = 7_420_005
+
+_CRIAR_STAGING = """
+CREATE TEMP TABLE staging_paciente (
+    linha BIGSERIAL,
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
+    pnome TEXT,
+    unome TEXT,
+    senha TEXT,
+    email TEXT,
+    telefone TEXT,
+    cpf_usuario TEXT,
+    erro TEXT
+) ON COMMIT DROP
+"""
+
+# Cada regra marca só as linhas que ainda estão válidas, então a linha
+# recebe o primeiro erro encontrado, na ordem abaixo.
+_VALIDACOES = (
+    (
+        "campo obrigatório vazio",
+        """
+        coalesce(pnome, '') = '' OR coalesce(unome, '') = ''
+        OR coalesce(senha, '') = '' OR coalesce(email, '') = ''
+        OR coalesce(telefone, '') = '' OR coalesce(cpf_usuario, '') = ''
+        """,
+    ),
+    (
+        "campo maior que o permitido",
+        """
+        length(pnome) > 20 OR length(unome) > 20
+        OR length(telefone) > 30 OR length(cpf_usuario) > 13
+        """,
+    ),
+    (
+        "email inválido",
+        r"email !~ '^[^@\s]+@[^@\s]+\.[^@\s]+$'",
+    ),
+    (
+        "CPF repetido no arquivo",
+        """
+        linha IN (
+            SELECT linha FROM (
+                SELECT linha, row_number() OVER (PARTITION BY cpf_usuario ORDER BY linha) AS n
+                FROM staging_paciente WHERE erro IS NULL
+            ) r WHERE n > 1
+        )
+        """,
+    ),
+    (
+        "email repetido no arquivo",
+        """
+        linha IN (
+            SELECT linha FROM (
+                SELECT linha, row_number() OVER (PARTITION BY email ORDER BY linha) AS n
+                FROM staging_paciente WHERE erro IS NULL
+            ) r WHERE n > 1
+        )
+        """,
+    ),
+    (
+        "CPF já cadastrado",
+        "EXISTS (SELECT 1 FROM usuario u WHERE u.cpf_usuario = staging_paciente.cpf_usuario)",
+    ),
+    (
+        "email já cadastrado",
+        "EXISTS (SELECT 1 FROM usuario u WHERE u.email = staging_paciente.email)",
+    ),
+)
+
+# ON CONFLICT cobre quem for cadastrado por outra requisição no meio da
+# importação; essas linhas são marcadas logo depois.
+_INSERIR = """
+WITH novos AS (
+    INSERT INTO usuario (id, pnome, unome, senha, email, telefone, cpf_usuario, role)
+    SELECT id, pnome, unome, senha, email, telefone, cpf_usuario, 'PACIENTE'::roleenum
+    FROM staging_paciente
+    WHERE erro IS NULL
+    ORDER BY linha
+    ON CONFLICT DO NOTHING
+    RETURNING id
+)
+INSERT INTO paciente (id) SELECT id FROM novos
+"""
+
+_MARCAR_CONFLITOS = """
+UPDATE staging_paciente s SET erro = 'CPF ou email cadastrado durante a importação'
+WHERE s.erro IS NULL AND NOT EXISTS (SELECT 1 FROM paciente p WHERE p.id = s.id)
+"""
+
+
+def _ler_cabecalho(arquivo: BinaryIO) -> list[str]:
+    primeira = arquivo.readline().decode("utf-8-sig").strip()
+    cabecalho = [c.strip() for c in next(csv.reader(io.StringIO(primeira)))]
+
+    faltando = set(COLUNAS) - set(cabecalho)
+    sobrando = set(cabecalho) - set(COLUNAS)
+    if faltando or sobrando:
+        raise ValueError(
+            f"Cabeçalho inválido. Faltando: {sorted(faltando)}; desconhecidas: {sorted(sobrando)}"
+        )
+    return cabecalho
+
+
+def _contagem(status: str) -> int:
+    # asyncpg devolve o status do comando, ex.: "COPY 1000", "INSERT 0 1000"
+    return int(status.rsplit(" ", 1)[-1])
+
+
+async def importar_pacientes(db: AsyncSession, arquivo: BinaryIO) -> dict:
+    """
+    Importa o CSV (binário, UTF-8, com cabeçalho) e devolve quantos
+    pacientes entraram e os erros por linha. Linhas inválidas são puladas;
+    as válidas são gravadas mesmo assim. Não faz commit.
+
+    A linha informada nos erros é a do arquivo (o cabeçalho é a linha 1).
+    """
+    cabecalho = _ler_cabecalho(arquivo)
+
+    # conexão asyncpg da própria sessão, dentro da transação dela
+    conexao = await db.connection()
+    pg = (await conexao.get_raw_connection()).driver_connection
+
+    await pg.execute(_CRIAR_STAGING)
+    lidas = _contagem(await pg.copy_to_table(
+        "staging_paciente",
+        source=arquivo,
+        columns=cabecalho,
+        format="csv",
+        encoding="utf8",
+    ))
+    # tabela temporária não passa pelo autovacuum; sem estatísticas o
+    # planner erra o tamanho dos joins das validações
+    await pg.execute("ANALYZE staging_paciente")
+
+    for motivo, condicao in _VALIDACOES:
+        await pg.execute(
+            f"UPDATE staging_paciente SET erro = $1 WHERE erro IS NULL AND ({condicao})",
+            motivo,
+        )
+
+    inseridos = _contagem(await pg.execute(_INSERIR))
+    await pg.execute(_MARCAR_CONFLITOS)
+
+    total_erros = await pg.fetchval(
+        "SELECT count(*) FROM staging_paciente WHERE erro IS NOT NULL"
+    )
+    linhas = await pg.fetch(
+        "SELECT linha + 1 AS linha, erro FROM staging_paciente WHERE erro IS NOT NULL "
+        "ORDER BY linha LIMIT $1",
+        MAX_ERROS_RELATORIO,
+    )
+    erros = [{"linha": r["linha"], "motivo": r["erro"]} for r in linhas]
+
+    return {
+        "lidas": lidas,
+        "inseridos": inseridos,
+        "total_erros": total_erros,
+        "erros": erros,
+    }
+
+
+# --- Hash das senhas importadas ---
+
+# mesmo predicado do índice parcial idx_usuario_senha_pendente (migração v0006)
+_PENDENTES = """
+SELECT id, senha FROM usuario WHERE left(senha, 7) <> 'scrypt$' LIMIT :limite
+"""
+
+# só troca se a senha não mudou enquanto o hash era calculado (login, edição)
+_GRAVAR_HASHES = """
+UPDATE usuario u SET senha = h.hash
+FROM unnest(CAST(:ids AS uuid[]), CAST(:antigas AS text[]), CAST(:hashes AS text[])) AS h (id, antiga, hash)
+WHERE u.id = h.id AND u.senha = h.antiga
+"""
+
+
+async def hash_pendentes(db: AsyncSession) -> int:
+    """
+    Troca até LOTE_HASH senhas em texto puro pelo hash. Devolve quantas
+    foram lidas (0 se não há pendentes ou outro worker já está nisso).
+    Não faz commit.
+    """
+    conseguiu = (
+        await db.execute(text("SELECT pg_try_advisory_xact_lock(:k)"), {"k": _LOCK_SENHAS})
+    ).scalar()
+    if not conseguiu:
+        return 0
+
+    linhas = (await db.execute(text(_PENDENTES), {"limite": LOTE_HASH})).all()
+    if not linhas:
+        return 0
+    hashes = await seguranca.hash_senhas([senha for _, senha in linhas])
+    await db.execute(text(_GRAVAR_HASHES), {
+        "ids": [id_ for id_, _ in linhas],
+        "antigas": [senha for _, senha in linhas],
+        "hashes": hashes,
+    })
+    return len(linhas)
+
+
+async def hash_todas_pendentes(session_factory) -> int:
+    """Roda hash_pendentes até esvaziar, um commit por bloco."""
+    total = 0
+    while True:
+        async with session_factory() as db:
+            lidas = await hash_pendentes(db)
+            await db.commit()
+        total += lidas
+        if lidas < LOTE_HASH:
+            return total
+
+
+async def loop_senhas(session_factory, intervalo: float = config.SENHAS_INTERVALO_S):
+    """Tarefa de fundo iniciada no lifespan do app."""
+    while True:
+        await asyncio.sleep(intervalo)
+        try:
+            trocadas = await hash_todas_pendentes(session_factory)
+            if trocadas:
+                logger.info("%s senhas importadas trocadas pelo hash", trocadas)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Falha ao calcular o hash das senhas importadas")
+
+
+async def _main(caminho: str):
+    import time
+
+    from database import AsyncSessionLocal
+
+    inicio = time.perf_counter()
+    try:
+        async with AsyncSessionLocal() as db:
+            with open(caminho, "rb") as f:
+                resultado = await importar_pacientes(db, f)
+            await db.commit()
+        duracao = time.perf_counter() - inicio
+
+        for erro in resultado["erros"]:
+            print(f"linha {erro['linha']}: {erro['motivo']}")
+        print(
+            f"{resultado['inseridos']} de {resultado['lidas']} pacientes importados, "
+            f"{resultado['total_erros']} erros, {duracao:.1f}s "
+            f"({resultado['lidas'] / max(duracao, 1e-9):,.0f} linhas/s)"
+        )
+
+        # o job do lifespan faz isso com a API no ar; aqui não há garantia dela
+        inicio = time.perf_counter()
+        trocadas = await hash_todas_pendentes(AsyncSessionLocal)
+        print(f"hash de {trocadas} senhas em {time.perf_counter() - inicio:.1f}s")
+    finally:
+        seguranca.encerrar_pool()
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Importa pacientes de um CSV via COPY.")
+    parser.add_argument("arquivo", help="CSV com cabeçalho: " + ",".join(COLUNAS))
+    args = parser.parse_args()
+
+    asyncio.run(_main(args.arquivo))
@@ -1,13 +1,48 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-import model
-from database import engine 
-from routes import users, ubs
+import config
+import metricas
+import migracoes
+import roteamento
+from database import AsyncSessionLocal, async_engine, async_engine_leitura, engine
+from routes import users, ubs, vacinas, aplicacoes, campanhas, auth, health, dashboard, relatorios, metricas as rotas_metricas
 from fastapi.middleware.cors import CORSMiddleware
-from database import Base
+from cobertura import loop_cobertura
+from importacao import loop_senhas
+from particoes import loop_particoes
+from resumos import loop_consolidacao
+from seguranca import conferir_segredo, encerrar_pool
+from vencimentos import loop_vencimentos
+
+# Importar este módulo não toca no banco: o schema é criado/atualizado por
+# `python -m migracoes`, e a subida só confere a versão (ver migracoes/).
 
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    conferir_segredo()
+    if config.MIGRAR_AO_SUBIR:
+        await asyncio.to_thread(migracoes.migrar, engine)
+    await migracoes.conferir_versao(async_engine)
+    if async_engine_leitura is not async_engine:
+        await migracoes.conferir_versao(async_engine_leitura)
 
-app = FastAPI()
+    # jobs em segundo plano deste worker
+    tarefas = [
+        asyncio.create_task(loop_consolidacao(AsyncSessionLocal)),
+        asyncio.create_task(loop_vencimentos(AsyncSessionLocal)),
+        asyncio.create_task(loop_particoes(AsyncSessionLocal)),
+        asyncio.create_task(loop_cobertura(AsyncSessionLocal)),
+        asyncio.create_task(loop_senhas(AsyncSessionLocal)),
+    ]
+    yield
+    for tarefa in tarefas:
+        tarefa.cancel()
+    await asyncio.gather(*tarefas, return_exceptions=True)
+    encerrar_pool()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,9 +52,23 @@ app.add_middleware(
     allow_headers=["*"],  # Permite qualquer header
 )
 
+if config.DATABASE_REPLICA_URL:
+    app.middleware("http")(roteamento.marcar_escrita)
+if config.METRICAS_ATIVAS:
+    app.middleware("http")(metricas.medir_requisicao)
+
 @app.get("/")
 def teste():
     return {"bora pro racha hoje à noite?"}
 
 app.include_router(users.router)
-app.include_router(ubs.router)
\ No newline at end of file
+app.include_router(ubs.router)
+app.include_router(vacinas.router)
+app.include_router(aplicacoes.router)
+app.include_router(campanhas.router)
+app.include_router(auth.router)
+app.include_router(health.router)
+app.include_router(dashboard.router)
+app.include_router(relatorios.router)
+if config.METRICAS_ATIVAS:
+    app.include_router(rotas_metricas.router)
@@ -0,0 +1,171 @@
+# Métricas por rota no formato texto do Prometheus (GET /metrics).
+#
+# O middleware `medir_requisicao` cronometra cada requisição e, com a
+# MedicaoSQL de database.py, sabe quantos comandos SQL ela fez e quanto
+# tempo passou no banco. Por rota (o template, ex.: /ubs/lotes/{lote_id},
+# para não criar uma série por id) ficam:
+#
+#   - requisições por método/rota/status;
+#   - histograma de latência;
+#   - histograma de comandos SQL por requisição (onde um N+1 aparece);
+#   - tempo total no banco.
+#
+# Com METRICAS_SERVER_TIMING o mesmo número vai no header Server-Timing
+# (app;dur=..., db;dur=...;desc="N comandos"), visível no DevTools.
+#
+# Como o status_pool, os números são por processo: com vários workers o
+# Prometheus vê cada um numa raspagem diferente (ou use um worker por
+# alvo). Sem dependência nova: o formato de texto é simples.
+import threading
+import time
+
+from fastapi import Request
+
+import config
+from database import MedicaoSQL, medicao_sql, status_pools, total_sql
+
+# Limites dos buckets (segundos e comandos)
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_COMANDOS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histograma:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.contagens = [0] * (len(buckets) + 1)  # o último é o +Inf
+        self.soma = 0.0
+
+    def observar(self, valor: float):
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                break
+        else:
+            i = len(self.buckets)
+        self.contagens[i] += 1
+        self.soma += valor
+
+    def linhas(self, nome: str, rotulos: str) -> list:
+        saida, acumulado = [], 0
+        for limite, contagem in zip(self.buckets + ("+Inf",), self.contagens):
+            acumulado += contagem
+            saida.append(f'{nome}_bucket{{{rotulos},le="{limite}"}} {acumulado}')
+        saida.append(f"{nome}_sum{{{rotulos}}} {self.soma}")
+        saida.append(f"{nome}_count{{{rotulos}}} {acumulado}")
+        return saida
+
+
+class Registro:
+    """Todas as séries do processo, indexadas por (método, rota)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requisicoes: dict = {}  # (metodo, rota, status) -> total
+        self.latencia: dict = {}     # (metodo, rota) -> Histograma
+        self.comandos: dict = {}     # (metodo, rota) -> Histograma
+        self.tempo_sql: dict = {}    # (metodo, rota) -> segundos
+
+    def registrar(self, metodo: str, rota: str, status: int, duracao: float, sql: MedicaoSQL):
+        chave = (metodo, rota)
+        with self._lock:
+            self.requisicoes[chave + (status,)] = self.requisicoes.get(chave + (status,), 0) + 1
+            if chave not in self.latencia:
+                self.latencia[chave] = Histograma(BUCKETS_LATENCIA)
+                self.comandos[chave] = Histograma(BUCKETS_COMANDOS)
+                self.tempo_sql[chave] = 0.0
+            self.latencia[chave].observar(duracao)
+            self.comandos[chave].observar(sql.comandos)
+            self.tempo_sql[chave] += sql.tempo
+
+    def exportar(self) -> str:
+        linhas = []
+        with self._lock:
+            linhas += [
+                "# HELP http_requisicoes_total Requisições atendidas, por método, rota e status.",
+                "# TYPE http_requisicoes_total counter",
+            ]
+            for (metodo, rota, status), total in sorted(self.requisicoes.items()):
+                linhas.append(f'http_requisicoes_total{{{_rotulos(metodo, rota)},status="{status}"}} {total}')
+
+            linhas += [
+                "# HELP http_requisicao_duracao_segundos Latência das requisições.",
+                "# TYPE http_requisicao_duracao_segundos histogram",
+            ]
+            for (metodo, rota), hist in sorted(self.latencia.items()):
+                linhas += hist.linhas("http_requisicao_duracao_segundos", _rotulos(metodo, rota))
+
+            linhas += [
+                "# HELP http_requisicao_comandos_sql Comandos SQL executados por requisição.",
+                "# TYPE http_requisicao_comandos_sql histogram",
+            ]
+            for (metodo, rota), hist in sorted(self.comandos.items()):
+                linhas += hist.linhas("http_requisicao_comandos_sql", _rotulos(metodo, rota))
+
+            linhas += [
+                "# HELP http_requisicao_sql_segundos_total Tempo gasto no banco, por rota.",
+                "# TYPE http_requisicao_sql_segundos_total counter",
+            ]
+            for (metodo, rota), segundos in sorted(self.tempo_sql.items()):
+                linhas.append(f"http_requisicao_sql_segundos_total{{{_rotulos(metodo, rota)}}} {segundos}")
+
+        pools = status_pools()
+        linhas += [
+            "# HELP db_comandos_total Comandos SQL do processo (inclui jobs em segundo plano).",
+            "# TYPE db_comandos_total counter",
+            f"db_comandos_total {total_sql.comandos}",
+            "# HELP db_comandos_segundos_total Tempo total dos comandos SQL do processo.",
+            "# TYPE db_comandos_segundos_total counter",
+            f"db_comandos_segundos_total {total_sql.tempo}",
+        ]
+        # uma série por pool: engine="primaria" e, com réplica, engine="replica"
+        linhas += [
+            "# HELP db_pool_conexoes_em_uso Conexões emprestadas pelo pool agora.",
+            "# TYPE db_pool_conexoes_em_uso gauge",
+        ]
+        linhas += [f'db_pool_conexoes_em_uso{{engine="{e}"}} {p["checked_out"]}' for e, p in pools.items()]
+        linhas += [
+            "# HELP db_pool_espera_segundos_total Tempo esperando conexão livre no pool.",
+            "# TYPE db_pool_espera_segundos_total counter",
+        ]
+        linhas += [
+            f'db_pool_espera_segundos_total{{engine="{e}"}} {p["espera_total_ms"] / 1000}' for e, p in pools.items()
+        ]
+        linhas += [
+            "# HELP db_pool_timeouts_total Esperas pelo pool que estouraram DB_POOL_TIMEOUT.",
+            "# TYPE db_pool_timeouts_total counter",
+        ]
+        linhas += [f'db_pool_timeouts_total{{engine="{e}"}} {p["timeouts"]}' for e, p in pools.items()]
+        return "\n".join(linhas) + "\n"
+
+
+def _rotulos(metodo: str, rota: str) -> str:
+    return f'metodo="{metodo}",rota="{rota}"'
+
+
+registro = Registro()
+
+
+async def medir_requisicao(request: Request, call_next):
+    """Middleware HTTP (ver main.py)."""
+    medicao = MedicaoSQL(request.scope)
+    token = medicao_sql.set(medicao)
+    inicio = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        # em StreamingResponse isto mede até o início do corpo, não o fim
+        duracao = time.perf_counter() - inicio
+        medicao_sql.reset(token)
+        # 404 sem rota cai numa série única em vez de uma por caminho
+        rota = medicao.rota() if request.scope.get("route") is not None else "desconhecida"
+        registro.registrar(request.method, rota, status, duracao, medicao)
+
+    if config.METRICAS_SERVER_TIMING:
+        response.headers["Server-Timing"] = (
+            f"app;dur={duracao * 1000:.1f}, "
+            f'db;dur={medicao.tempo * 1000:.1f};desc="{medicao.comandos} comandos"'
+        )
+    return response
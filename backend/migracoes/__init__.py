@@ -0,0 +1,105 @@
+# Migrações versionadas do schema.
+#
+# Cada arquivo vNNNN_nome.py deste pacote tem uma função
+# `aplicar(connection)` que recebe uma conexão síncrona já dentro de uma
+# transação. A tabela schema_version guarda as versões aplicadas.
+#
+#     python -m migracoes            # aplica as pendentes
+#     python -m migracoes --status   # versão do banco x versão do código
+#
+# A API não cria nem altera nada ao subir: o lifespan só confere, com um
+# SELECT na PK de schema_version, se o banco está na versão que o código
+# espera (MIGRAR_AO_SUBIR=1 aplica as pendentes antes, útil em desenvolvimento).
+#
+# A engine síncrona abre as conexões com o statement_timeout da API
+# (DB_STATEMENT_TIMEOUT_MS); os preenchimentos das migrações levam minutos,
+# então cada transação de migração desliga esse limite para si.
+#
+# Uma migração não importa SQL dos módulos da aplicação: triggers, funções
+# e preenchimentos ficam copiados no próprio arquivo, para que rodar a
+# v0002 hoje ou daqui a um ano execute exatamente o mesmo SQL.
+import importlib
+import logging
+import pkgutil
+import re
+
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_PADRAO = re.compile(r"^v(\d{4})_\w+$")
+
+# Só um processo migra por vez (vários workers/deploys subindo juntos)
+_LOCK_MIGRACAO = 7_420_000
+
+_CRIAR_TABELA_VERSAO = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    versao INTEGER PRIMARY KEY,
+    nome VARCHAR NOT NULL,
+    aplicada_em TIMESTAMP NOT NULL DEFAULT now()
+)
+"""
+
+
+def listar() -> list[tuple[int, str]]:
+    """(versão, nome do módulo) de todas as migrações, em ordem. Não toca o banco."""
+    encontradas = []
+    for info in pkgutil.iter_modules(__path__):
+        casamento = _PADRAO.match(info.name)
+        if casamento:
+            encontradas.append((int(casamento.group(1)), info.name))
+    return sorted(encontradas)
+
+
+VERSAO_CODIGO = listar()[-1][0]
+
+
+def versao_banco(connection) -> int:
+    existe = connection.execute(text("SELECT to_regclass('schema_version') IS NOT NULL")).scalar()
+    if not existe:
+        return 0
+    return connection.execute(text("SELECT coalesce(max(versao), 0) FROM schema_version")).scalar()
+
+
+def migrar(engine) -> list[int]:
+    """Aplica as migrações pendentes, uma transação por migração. Devolve as versões aplicadas."""
+    aplicadas = []
+    for versao, nome in listar():
+        with engine.begin() as connection:
+            connection.execute(text("SET LOCAL statement_timeout = 0"))
+            # sem lock_timeout ainda: os outros processos esperam aqui a
+            # migração em andamento terminar, por mais que ela demore
+            connection.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _LOCK_MIGRACAO})
+            connection.execute(text(f"SET LOCAL lock_timeout = {int(config.MIGRACAO_LOCK_TIMEOUT_MS)}"))
+            connection.execute(text(_CRIAR_TABELA_VERSAO))
+            if versao <= versao_banco(connection):
+                continue
+
+            logger.info("Aplicando migração %s", nome)
+            importlib.import_module(f"{__name__}.{nome}").aplicar(connection)
+            connection.execute(
+                text("INSERT INTO schema_version (versao, nome) VALUES (:v, :n)"),
+                {"v": versao, "n": nome},
+            )
+            aplicadas.append(versao)
+    return aplicadas
+
+
+async def conferir_versao(async_engine):
+    """Checagem da subida: um SELECT só. RuntimeError se faltar migração."""
+    async with async_engine.connect() as connection:
+        try:
+            versao = (await connection.execute(text("SELECT max(versao) FROM schema_version"))).scalar() or 0
+        except ProgrammingError:
+            versao = 0
+
+    if versao < VERSAO_CODIGO:
+        raise RuntimeError(
+            f"Banco na versão {versao}, o código precisa da {VERSAO_CODIGO}: rode `python -m migracoes`"
+        )
+    if versao > VERSAO_CODIGO:
+        # deploy gradual: banco já migrado por uma versão mais nova do código
+        logger.warning("Banco na versão %s, mais nova que a do código (%s)", versao, VERSAO_CODIGO)
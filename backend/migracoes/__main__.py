@@ -0,0 +1,21 @@
+import argparse
+import logging
+
+from database import engine
+from migracoes import VERSAO_CODIGO, listar, migrar, versao_banco
+
+parser = argparse.ArgumentParser(prog="python -m migracoes", description="Migrações do schema.")
+parser.add_argument("--status", action="store_true", help="só mostra as versões, sem migrar")
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+if args.status:
+    with engine.connect() as connection:
+        atual = versao_banco(connection)
+    print(f"banco: {atual}  código: {VERSAO_CODIGO}")
+    for versao, nome in listar():
+        print(f"  {'x' if versao <= atual else ' '} {nome}")
+else:
+    aplicadas = migrar(engine)
+    print(f"aplicadas: {aplicadas or 'nenhuma'}")
@@ -0,0 +1,190 @@
+# Schema base: extensão, tabelas e índices de model.py.
+#
+# Tudo com IF NOT EXISTS: bancos criados antes pelo create_all só ganham o
+# que faltava (os índices novos que o create_all não adiciona em tabela
+# já existente).
+_EXTENSOES = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+DO $$ BEGIN
+    CREATE TYPE roleenum AS ENUM ('ADMIN', 'GESTOR', 'PACIENTE', 'PROFISSIONAL');
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+"""
+
+_TABELAS = """
+CREATE TABLE IF NOT EXISTS usuario (
+    id UUID PRIMARY KEY,
+    pnome VARCHAR(20) NOT NULL,
+    unome VARCHAR(20) NOT NULL,
+    senha VARCHAR NOT NULL,
+    email VARCHAR NOT NULL UNIQUE,
+    telefone VARCHAR(30) NOT NULL,
+    cpf_usuario VARCHAR(13) NOT NULL UNIQUE,
+    role roleenum NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS paciente (id UUID PRIMARY KEY REFERENCES usuario (id));
+CREATE TABLE IF NOT EXISTS gestor (id UUID PRIMARY KEY REFERENCES usuario (id));
+CREATE TABLE IF NOT EXISTS admin (id UUID PRIMARY KEY REFERENCES usuario (id));
+CREATE TABLE IF NOT EXISTS profissional_de_saude (
+    id UUID PRIMARY KEY REFERENCES usuario (id),
+    garu_formacao VARCHAR(20) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS fabricante (
+    cnpj_fabricante VARCHAR(14) PRIMARY KEY,
+    nome VARCHAR(40) NOT NULL,
+    telefone VARCHAR(20) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS fornecedor (
+    cnpj_fornecedor VARCHAR(14) PRIMARY KEY,
+    nome VARCHAR(40) NOT NULL,
+    telefone VARCHAR(20) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS unidade_de_saude (
+    id UUID PRIMARY KEY,
+    nome_unidade VARCHAR NOT NULL UNIQUE,
+    tipo VARCHAR(100) NOT NULL,
+    rua VARCHAR(40) NOT NULL,
+    bairro VARCHAR(30) NOT NULL,
+    cidade VARCHAR(30) NOT NULL,
+    estado VARCHAR(30) NOT NULL,
+    numero INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS vacina (
+    codigo_vacina SERIAL PRIMARY KEY,
+    nome VARCHAR(30) NOT NULL,
+    publico_alvo VARCHAR(40) NOT NULL,
+    doenca VARCHAR(50) NOT NULL,
+    quantidade_de_doses INTEGER NOT NULL,
+    fabricante_cnpj VARCHAR(14) NOT NULL REFERENCES fabricante (cnpj_fabricante)
+);
+
+CREATE TABLE IF NOT EXISTS estoque (
+    id_estoque SERIAL PRIMARY KEY,
+    nome_unidade UUID NOT NULL REFERENCES unidade_de_saude (id),
+    gestor_id UUID NOT NULL REFERENCES gestor (id)
+);
+
+CREATE TABLE IF NOT EXISTS lote (
+    id_lote BIGSERIAL PRIMARY KEY,
+    validade TIMESTAMP NOT NULL,
+    data_chegada TIMESTAMP NOT NULL,
+    quantidade INTEGER NOT NULL,
+    estoque_id INTEGER NOT NULL REFERENCES estoque (id_estoque),
+    vacina_id INTEGER NOT NULL REFERENCES vacina (codigo_vacina),
+    fornecedor_cnpj VARCHAR(14) NOT NULL REFERENCES fornecedor (cnpj_fornecedor)
+);
+
+CREATE TABLE IF NOT EXISTS dose (
+    id_dose BIGSERIAL PRIMARY KEY,
+    intervalo INTEGER NOT NULL,
+    numero INTEGER NOT NULL,
+    vacina_id INTEGER NOT NULL REFERENCES vacina (codigo_vacina)
+);
+
+CREATE TABLE IF NOT EXISTS aplicacao (
+    "id_aplicação" BIGSERIAL PRIMARY KEY,
+    data TIMESTAMP NOT NULL,
+    paciente_id UUID NOT NULL REFERENCES paciente (id),
+    profissional_id UUID NOT NULL REFERENCES profissional_de_saude (id),
+    admin_id UUID NOT NULL REFERENCES admin (id),
+    unidade_nome UUID NOT NULL REFERENCES unidade_de_saude (id),
+    dose_id BIGINT NOT NULL REFERENCES dose (id_dose),
+    lote_id BIGINT NOT NULL REFERENCES lote (id_lote)
+);
+
+CREATE TABLE IF NOT EXISTS campanha (
+    id_campanha SERIAL PRIMARY KEY,
+    data_inicio TIMESTAMP NOT NULL,
+    data_fim TIMESTAMP NOT NULL,
+    nome_campanha VARCHAR(100) NOT NULL,
+    admin_id UUID NOT NULL REFERENCES admin (id)
+);
+
+CREATE TABLE IF NOT EXISTS publicacao_campanha (
+    campanha_id INTEGER REFERENCES campanha (id_campanha),
+    vacina_id INTEGER REFERENCES vacina (codigo_vacina),
+    PRIMARY KEY (campanha_id, vacina_id)
+);
+
+CREATE TABLE IF NOT EXISTS resumo_aplicacao_dia (
+    dia DATE,
+    vacina_id INTEGER,
+    total BIGINT NOT NULL,
+    PRIMARY KEY (dia, vacina_id)
+);
+
+CREATE TABLE IF NOT EXISTS resumo_aplicacao_vacina (
+    vacina_id INTEGER PRIMARY KEY,
+    total BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS resumo_aplicacao_delta (
+    id BIGSERIAL PRIMARY KEY,
+    dia DATE NOT NULL,
+    vacina_id INTEGER NOT NULL,
+    qtd INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS resumo_estoque_vacina (
+    vacina_id INTEGER PRIMARY KEY,
+    doses BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS resumo_estoque_delta (
+    id BIGSERIAL PRIMARY KEY,
+    vacina_id INTEGER NOT NULL,
+    doses BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS proxima_dose (
+    paciente_id UUID REFERENCES paciente (id),
+    vacina_id INTEGER REFERENCES vacina (codigo_vacina),
+    dose_id BIGINT REFERENCES dose (id_dose),
+    numero INTEGER NOT NULL,
+    data_prevista DATE,
+    PRIMARY KEY (paciente_id, vacina_id)
+);
+"""
+
+_INDICES = """
+-- substituídos por versões parciais
+DROP INDEX IF EXISTS idx_usuario_nome_completo_trgm;
+DO $$ BEGIN
+    IF EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'idx_lote_validade' AND position('WHERE' IN indexdef) = 0) THEN
+        DROP INDEX idx_lote_validade;
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS idx_usuario_nome_trgm_admin ON usuario USING gin ((pnome || ' ' || unome) gin_trgm_ops) WHERE role = 'ADMIN';
+CREATE INDEX IF NOT EXISTS idx_usuario_nome_trgm_gestor ON usuario USING gin ((pnome || ' ' || unome) gin_trgm_ops) WHERE role = 'GESTOR';
+CREATE INDEX IF NOT EXISTS idx_usuario_nome_trgm_paciente ON usuario USING gin ((pnome || ' ' || unome) gin_trgm_ops) WHERE role = 'PACIENTE';
+CREATE INDEX IF NOT EXISTS idx_usuario_nome_trgm_profissional ON usuario USING gin ((pnome || ' ' || unome) gin_trgm_ops) WHERE role = 'PROFISSIONAL';
+CREATE INDEX IF NOT EXISTS idx_usuario_role_nome ON usuario (role, unome, pnome, id) INCLUDE (email, telefone, cpf_usuario);
+
+CREATE INDEX IF NOT EXISTS idx_fabricante_nome_trgm ON fabricante USING gin (nome gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_nome_unidade ON unidade_de_saude USING gin (nome_unidade gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_nome_vacina ON vacina USING gin (nome gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_vacina_doenca_trgm ON vacina USING gin (doenca gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_lote_validade ON lote (validade) WHERE quantidade > 0;
+CREATE INDEX IF NOT EXISTS idx_lote_fefo ON lote (estoque_id, vacina_id, validade) WHERE quantidade > 0;
+
+CREATE INDEX IF NOT EXISTS idx_aplicacao_data ON aplicacao (data);
+CREATE INDEX IF NOT EXISTS idx_aplicacao_unidade_data ON aplicacao (unidade_nome, data);
+CREATE INDEX IF NOT EXISTS idx_aplicacao_dose_data ON aplicacao (dose_id, data);
+CREATE INDEX IF NOT EXISTS idx_aplicacao_paciente_data ON aplicacao (paciente_id, data);
+
+CREATE INDEX IF NOT EXISTS idx_proxima_dose_data ON proxima_dose (data_prevista) WHERE data_prevista IS NOT NULL;
+"""
+
+
+def aplicar(connection):
+    connection.exec_driver_sql(_EXTENSOES)
+    connection.exec_driver_sql(_TABELAS)
+    connection.exec_driver_sql(_INDICES)
@@ -0,0 +1,70 @@
+# Triggers dos resumos do dashboard e preenchimento inicial (ver resumos.py).
+#
+# SQL copiado de resumos.py na época desta versão; mudanças nos triggers
+# entram numa migração nova, não aqui.
+from sqlalchemy import text
+
+_GATILHOS = """
+CREATE OR REPLACE FUNCTION resumo_aplicacao_delta_fn() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO resumo_aplicacao_delta (dia, vacina_id, qtd)
+        SELECT OLD.data::date, d.vacina_id, -1 FROM dose d WHERE d.id_dose = OLD.dose_id;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'INSERT') THEN
+        INSERT INTO resumo_aplicacao_delta (dia, vacina_id, qtd)
+        SELECT NEW.data::date, d.vacina_id, 1 FROM dose d WHERE d.id_dose = NEW.dose_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_resumo_aplicacao
+AFTER INSERT OR DELETE OR UPDATE OF data, dose_id ON aplicacao
+FOR EACH ROW EXECUTE FUNCTION resumo_aplicacao_delta_fn();
+
+CREATE OR REPLACE FUNCTION resumo_estoque_delta_fn() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO resumo_estoque_delta (vacina_id, doses) VALUES (OLD.vacina_id, -OLD.quantidade);
+    END IF;
+    IF TG_OP IN ('UPDATE', 'INSERT') THEN
+        INSERT INTO resumo_estoque_delta (vacina_id, doses) VALUES (NEW.vacina_id, NEW.quantidade);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_resumo_estoque
+AFTER INSERT OR DELETE OR UPDATE OF quantidade, vacina_id ON lote
+FOR EACH ROW EXECUTE FUNCTION resumo_estoque_delta_fn();
+"""
+
+_RECONSTRUIR = """
+LOCK TABLE aplicacao, lote IN SHARE MODE;
+
+TRUNCATE resumo_aplicacao_dia, resumo_aplicacao_vacina, resumo_aplicacao_delta,
+         resumo_estoque_vacina, resumo_estoque_delta;
+
+INSERT INTO resumo_aplicacao_dia (dia, vacina_id, total)
+SELECT a.data::date, d.vacina_id, count(*)
+FROM aplicacao a JOIN dose d ON d.id_dose = a.dose_id
+GROUP BY 1, 2;
+
+INSERT INTO resumo_aplicacao_vacina (vacina_id, total)
+SELECT vacina_id, sum(total) FROM resumo_aplicacao_dia GROUP BY vacina_id;
+
+INSERT INTO resumo_estoque_vacina (vacina_id, doses)
+SELECT vacina_id, sum(quantidade) FROM lote GROUP BY vacina_id;
+"""
+
+
+def aplicar(connection):
+    ja_instalado = connection.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_resumo_aplicacao')")
+    ).scalar()
+
+    connection.exec_driver_sql(_GATILHOS)
+    # bancos que já tinham os triggers (instalados antes das migrações) mantêm os resumos
+    if not ja_instalado:
+        connection.exec_driver_sql(_RECONSTRUIR)
@@ -0,0 +1,73 @@
+# Trigger da tabela proxima_dose e preenchimento inicial (ver caderneta.py).
+#
+# SQL copiado de caderneta.py na época desta versão; mudanças no trigger
+# entram numa migração nova, não aqui.
+from sqlalchemy import text
+
+_GATILHO = """
+CREATE OR REPLACE FUNCTION proxima_dose_fn() RETURNS trigger AS $$
+DECLARE
+    atual dose%ROWTYPE;
+    seguinte dose%ROWTYPE;
+BEGIN
+    SELECT * INTO atual FROM dose WHERE id_dose = NEW.dose_id;
+    IF atual.numero IS NULL THEN
+        RETURN NULL;  -- dose sem número: fora de esquema
+    END IF;
+    SELECT * INTO seguinte FROM dose
+    WHERE vacina_id = atual.vacina_id AND numero > atual.numero
+    ORDER BY numero LIMIT 1;
+
+    INSERT INTO proxima_dose AS p (paciente_id, vacina_id, dose_id, numero, data_prevista)
+    VALUES (
+        NEW.paciente_id,
+        atual.vacina_id,
+        seguinte.id_dose,
+        coalesce(seguinte.numero, atual.numero + 1),
+        (NEW.data + make_interval(days => seguinte.intervalo))::date
+    )
+    ON CONFLICT (paciente_id, vacina_id) DO UPDATE
+    SET dose_id = excluded.dose_id, numero = excluded.numero, data_prevista = excluded.data_prevista
+    WHERE p.numero < excluded.numero
+       OR (p.numero = excluded.numero AND p.data_prevista < excluded.data_prevista);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_proxima_dose
+AFTER INSERT ON aplicacao
+FOR EACH ROW EXECUTE FUNCTION proxima_dose_fn();
+"""
+
+# Preenchimento inicial: a última dose (maior número) de cada paciente/vacina
+_RECONSTRUIR = """
+LOCK TABLE aplicacao IN SHARE MODE;
+
+TRUNCATE proxima_dose;
+
+INSERT INTO proxima_dose (paciente_id, vacina_id, dose_id, numero, data_prevista)
+SELECT DISTINCT ON (a.paciente_id, d.vacina_id)
+    a.paciente_id,
+    d.vacina_id,
+    s.id_dose,
+    coalesce(s.numero, d.numero + 1),
+    (a.data + make_interval(days => s.intervalo))::date
+FROM aplicacao a
+JOIN dose d ON d.id_dose = a.dose_id AND d.numero IS NOT NULL
+LEFT JOIN LATERAL (
+    SELECT id_dose, numero, intervalo FROM dose s
+    WHERE s.vacina_id = d.vacina_id AND s.numero > d.numero
+    ORDER BY s.numero LIMIT 1
+) s ON true
+ORDER BY a.paciente_id, d.vacina_id, d.numero DESC, a.data DESC;
+"""
+
+
+def aplicar(connection):
+    ja_instalado = connection.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_proxima_dose')")
+    ).scalar()
+
+    connection.exec_driver_sql(_GATILHO)
+    if not ja_instalado:
+        connection.exec_driver_sql(_RECONSTRUIR)
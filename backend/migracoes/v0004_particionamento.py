@@ -0,0 +1,114 @@
+# aplicacao passa a ser particionada por mês em data (ver particoes.py).
+#
+# O Postgres não converte uma tabela comum em particionada: a migração cria
+# a nova, copia as linhas e troca os nomes, com a tabela antiga travada
+# (ACCESS EXCLUSIVE) do começo ao fim. Rode com a API parada ou fora do
+# horário de atendimento; com ~10M aplicações leva alguns minutos (o
+# runner desliga o statement_timeout da transação; se o LOCK não sair em
+# MIGRACAO_LOCK_TIMEOUT_MS, a migração falha sem ter mexido em nada).
+#
+# A PK vira (id_aplicação, data), porque numa tabela particionada toda
+# chave única precisa conter a coluna de partição. O id continua vindo da
+# mesma sequência, então segue único e o ORM continua usando só ele.
+# Nenhuma tabela tem FK apontando para aplicacao.
+#
+# Os triggers de resumos e caderneta somem com a tabela antiga; as
+# migrações v0002 e v0003 rodam de novo e, como na primeira instalação, os
+# recriam na nova e reconstroem os resumos e proxima_dose a partir das
+# linhas copiadas.
+from sqlalchemy import text
+
+import config
+from migracoes import v0002_resumos, v0003_caderneta
+
+# Cria (se faltar) uma partição por mês entre os dois meses, inclusive.
+# Usada por particoes.py e pelo bench/dados.py.
+_FUNCAO_CRIAR = """
+CREATE OR REPLACE FUNCTION criar_particoes_aplicacao(inicio date, fim date) RETURNS integer AS $$
+DECLARE
+    mes date := date_trunc('month', inicio);
+    nome text;
+    criadas integer := 0;
+BEGIN
+    WHILE mes <= fim LOOP
+        nome := 'aplicacao_' || to_char(mes, 'YYYY_MM');
+        IF to_regclass(nome) IS NULL THEN
+            -- concatenação em vez de format(): sem '%' no texto, que passa por exec_driver_sql
+            EXECUTE 'CREATE TABLE ' || quote_ident(nome) || ' PARTITION OF aplicacao FOR VALUES FROM ('
+                || quote_literal(mes) || ') TO (' || quote_literal(mes + interval '1 month') || ')';
+            criadas := criadas + 1;
+        END IF;
+        mes := mes + interval '1 month';
+    END LOOP;
+    RETURN criadas;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+_COLUNAS = '"id_aplicação", data, paciente_id, profissional_id, admin_id, unidade_nome, dose_id, lote_id'
+
+
+def aplicar(connection):
+    ja_particionada = connection.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = 'aplicacao'::regclass")
+    ).scalar()
+    connection.exec_driver_sql(_FUNCAO_CRIAR)
+    if ja_particionada:
+        return
+
+    connection.exec_driver_sql("LOCK TABLE aplicacao IN ACCESS EXCLUSIVE MODE")
+    sequencia = connection.execute(text("SELECT pg_get_serial_sequence('aplicacao', 'id_aplicação')")).scalar()
+
+    connection.exec_driver_sql("ALTER TABLE aplicacao RENAME TO aplicacao_antiga")
+    # a sequência é do BIGSERIAL antigo; sem isto o DROP da tabela levaria junto
+    connection.exec_driver_sql(f"ALTER SEQUENCE {sequencia} OWNED BY NONE")
+    connection.exec_driver_sql(f"""
+        CREATE TABLE aplicacao (
+            "id_aplicação" BIGINT NOT NULL DEFAULT nextval('{sequencia}'),
+            data TIMESTAMP NOT NULL,
+            paciente_id UUID NOT NULL,
+            profissional_id UUID NOT NULL,
+            admin_id UUID NOT NULL,
+            unidade_nome UUID NOT NULL,
+            dose_id BIGINT NOT NULL,
+            lote_id BIGINT NOT NULL
+        ) PARTITION BY RANGE (data)
+    """)
+    connection.exec_driver_sql(f'ALTER SEQUENCE {sequencia} OWNED BY aplicacao."id_aplicação"')
+
+    # um mês por partição, do histórico mais antigo até PARTICOES_MESES_FRENTE à frente
+    connection.execute(
+        text("""
+            SELECT criar_particoes_aplicacao(
+                least(min(data)::date, current_date),
+                greatest(max(data)::date, (current_date + make_interval(months => :meses))::date)
+            )
+            FROM aplicacao_antiga
+        """),
+        {"meses": config.PARTICOES_MESES_FRENTE},
+    )
+    connection.exec_driver_sql(f"INSERT INTO aplicacao ({_COLUNAS}) SELECT {_COLUNAS} FROM aplicacao_antiga")
+    connection.exec_driver_sql("DROP TABLE aplicacao_antiga")
+
+    # chaves e índices depois da cópia: construir de uma vez é mais rápido
+    # que manter linha a linha (e os nomes da tabela antiga já estão livres)
+    connection.exec_driver_sql("""
+        ALTER TABLE aplicacao
+            ADD CONSTRAINT aplicacao_pkey PRIMARY KEY ("id_aplicação", data),
+            ADD FOREIGN KEY (paciente_id) REFERENCES paciente (id),
+            ADD FOREIGN KEY (profissional_id) REFERENCES profissional_de_saude (id),
+            ADD FOREIGN KEY (admin_id) REFERENCES admin (id),
+            ADD FOREIGN KEY (unidade_nome) REFERENCES unidade_de_saude (id),
+            ADD FOREIGN KEY (dose_id) REFERENCES dose (id_dose),
+            ADD FOREIGN KEY (lote_id) REFERENCES lote (id_lote)
+    """)
+    connection.exec_driver_sql("""
+        CREATE INDEX idx_aplicacao_data ON aplicacao (data);
+        CREATE INDEX idx_aplicacao_unidade_data ON aplicacao (unidade_nome, data);
+        CREATE INDEX idx_aplicacao_dose_data ON aplicacao (dose_id, data);
+        CREATE INDEX idx_aplicacao_paciente_data ON aplicacao (paciente_id, data);
+    """)
+
+    v0002_resumos.aplicar(connection)
+    v0003_caderneta.aplicar(connection)
+    connection.exec_driver_sql("ANALYZE aplicacao")
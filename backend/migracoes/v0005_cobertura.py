@@ -0,0 +1,146 @@
+# Tabelas da cobertura vacinal, triggers e preenchimento inicial (ver cobertura.py).
+#
+# O preenchimento percorre todas as aplicações uma vez (um GROUP BY por
+# paciente e vacina); com ~10M aplicações leva alguns minutos. Triggers e
+# preenchimento copiados de cobertura.py na época desta versão.
+from sqlalchemy import text
+
+_TABELAS = """
+CREATE TABLE IF NOT EXISTS cobertura_paciente (
+    paciente_id UUID REFERENCES paciente (id),
+    vacina_id INTEGER REFERENCES vacina (codigo_vacina),
+    doses INTEGER NOT NULL,
+    unidade_id UUID NOT NULL REFERENCES unidade_de_saude (id),
+    primeira_data TIMESTAMP NOT NULL,
+    PRIMARY KEY (paciente_id, vacina_id)
+);
+-- recalcular os agregados de uma vacina/campanha sem ler a tabela toda
+CREATE INDEX IF NOT EXISTS idx_cobertura_paciente_vacina_data
+    ON cobertura_paciente (vacina_id, primeira_data) INCLUDE (unidade_id, doses);
+
+CREATE TABLE IF NOT EXISTS cobertura_unidade (
+    unidade_id UUID,
+    vacina_id INTEGER,
+    iniciados BIGINT NOT NULL,
+    completos BIGINT NOT NULL,
+    PRIMARY KEY (unidade_id, vacina_id)
+);
+
+CREATE TABLE IF NOT EXISTS cobertura_campanha (
+    campanha_id INTEGER,
+    vacina_id INTEGER,
+    unidade_id UUID,
+    iniciados BIGINT NOT NULL,
+    completos BIGINT NOT NULL,
+    PRIMARY KEY (campanha_id, vacina_id, unidade_id)
+);
+
+CREATE TABLE IF NOT EXISTS cobertura_pendente (
+    id BIGSERIAL PRIMARY KEY,
+    paciente_id UUID NOT NULL,
+    vacina_id INTEGER NOT NULL
+);
+
+-- vacina ou campanha cujas linhas nos agregados precisam ser refeitas
+CREATE TABLE IF NOT EXISTS cobertura_reconstruir (
+    id BIGSERIAL PRIMARY KEY,
+    vacina_id INTEGER,
+    campanha_id INTEGER,
+    pedido_em TIMESTAMP NOT NULL DEFAULT now()
+);
+"""
+
+_GATILHOS = """
+CREATE OR REPLACE FUNCTION cobertura_pendente_fn() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO cobertura_pendente (paciente_id, vacina_id)
+        SELECT OLD.paciente_id, d.vacina_id FROM dose d WHERE d.id_dose = OLD.dose_id;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'INSERT') THEN
+        INSERT INTO cobertura_pendente (paciente_id, vacina_id)
+        SELECT NEW.paciente_id, d.vacina_id FROM dose d WHERE d.id_dose = NEW.dose_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_cobertura_aplicacao
+AFTER INSERT OR DELETE OR UPDATE OF paciente_id, dose_id, data, unidade_nome ON aplicacao
+FOR EACH ROW EXECUTE FUNCTION cobertura_pendente_fn();
+
+CREATE OR REPLACE FUNCTION cobertura_vacina_fn() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO cobertura_reconstruir (vacina_id) VALUES (NEW.codigo_vacina);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_cobertura_vacina
+AFTER UPDATE OF quantidade_de_doses ON vacina
+FOR EACH ROW WHEN (OLD.quantidade_de_doses IS DISTINCT FROM NEW.quantidade_de_doses)
+EXECUTE FUNCTION cobertura_vacina_fn();
+
+-- campanha nova ainda não tem vacinas: só a publicação interessa
+CREATE OR REPLACE FUNCTION cobertura_campanha_fn() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'campanha' THEN
+        INSERT INTO cobertura_reconstruir (campanha_id) VALUES (OLD.id_campanha);
+    ELSE
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            INSERT INTO cobertura_reconstruir (campanha_id) VALUES (OLD.campanha_id);
+        END IF;
+        IF TG_OP IN ('UPDATE', 'INSERT') THEN
+            INSERT INTO cobertura_reconstruir (campanha_id) VALUES (NEW.campanha_id);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_cobertura_campanha
+AFTER DELETE OR UPDATE OF data_inicio, data_fim ON campanha
+FOR EACH ROW EXECUTE FUNCTION cobertura_campanha_fn();
+
+CREATE OR REPLACE TRIGGER trg_cobertura_publicacao
+AFTER INSERT OR DELETE OR UPDATE ON publicacao_campanha
+FOR EACH ROW EXECUTE FUNCTION cobertura_campanha_fn();
+"""
+
+_RECONSTRUIR = """
+TRUNCATE cobertura_paciente, cobertura_unidade, cobertura_campanha, cobertura_reconstruir;
+
+INSERT INTO cobertura_paciente (paciente_id, vacina_id, doses, unidade_id, primeira_data)
+SELECT a.paciente_id, d.vacina_id, count(DISTINCT a.dose_id),
+       (array_agg(a.unidade_nome ORDER BY a.data, a."id_aplicação"))[1], min(a.data)
+FROM aplicacao a JOIN dose d ON d.id_dose = a.dose_id
+GROUP BY a.paciente_id, d.vacina_id;
+
+INSERT INTO cobertura_unidade (unidade_id, vacina_id, iniciados, completos)
+SELECT c.unidade_id, c.vacina_id, count(*), count(*) FILTER (WHERE c.doses >= v.quantidade_de_doses)
+FROM cobertura_paciente c JOIN vacina v ON v.codigo_vacina = c.vacina_id
+GROUP BY c.unidade_id, c.vacina_id;
+
+INSERT INTO cobertura_campanha (campanha_id, vacina_id, unidade_id, iniciados, completos)
+SELECT pc.campanha_id, c.vacina_id, c.unidade_id,
+       count(*), count(*) FILTER (WHERE c.doses >= v.quantidade_de_doses)
+FROM cobertura_paciente c
+JOIN vacina v ON v.codigo_vacina = c.vacina_id
+JOIN publicacao_campanha pc ON pc.vacina_id = c.vacina_id
+JOIN campanha ca ON ca.id_campanha = pc.campanha_id
+ AND c.primeira_data BETWEEN ca.data_inicio AND ca.data_fim
+GROUP BY pc.campanha_id, c.vacina_id, c.unidade_id;
+"""
+
+
+
+def aplicar(connection):
+    connection.exec_driver_sql(_TABELAS)
+    ja_instalado = connection.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_cobertura_aplicacao')")
+    ).scalar()
+
+    connection.exec_driver_sql(_GATILHOS)
+    if not ja_instalado:
+        connection.exec_driver_sql(_RECONSTRUIR)
+    connection.exec_driver_sql("ANALYZE cobertura_paciente, cobertura_unidade, cobertura_campanha")
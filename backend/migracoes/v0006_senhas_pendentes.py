@@ -0,0 +1,14 @@
+# Índice parcial das senhas ainda em texto puro (ver importacao.py): o job
+# que troca as senhas da importação em massa pelo hash acha as pendentes
+# sem percorrer usuario. Em regime o índice fica vazio.
+#
+# O CREATE INDEX roda na transação da migração e trava escritas em usuario
+# enquanto percorre a tabela (segundos, mesmo com milhões de linhas).
+_INDICE = """
+CREATE INDEX IF NOT EXISTS idx_usuario_senha_pendente
+    ON usuario (id) WHERE left(senha, 7) <> 'scrypt$'
+"""
+
+
+def aplicar(connection):
+    connection.exec_driver_sql(_INDICE)
@@ -0,0 +1,13 @@
+# Índice (unome, pnome, id) sem role na frente, para GET /users sem filtro
+# de role ou com várias roles (ver routes/users.py). O idx_usuario_role_nome
+# da v0001 só dá a ordem pronta quando uma única role é filtrada.
+#
+# Roda na transação da migração: trava escritas em usuario durante o build.
+_INDICE = """
+CREATE INDEX IF NOT EXISTS idx_usuario_nome
+    ON usuario (unome, pnome, id) INCLUDE (role, email, telefone, cpf_usuario)
+"""
+
+
+def aplicar(connection):
+    connection.exec_driver_sql(_INDICE)
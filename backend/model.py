@@ -5,7 +5,7 @@ from typing import List
 
 from database import Base
 
-from sqlalchemy import Index, String, Integer, BigInteger, ForeignKey, DateTime, Enum, text
+from sqlalchemy import Index, String, Integer, BigInteger, ForeignKey, Date, DateTime, Enum, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -20,12 +20,36 @@ class RoleEnum(enum.Enum):
 class Usuario(Base):
     __tablename__ = "usuario"
 
-    __table_args__ = (
-        # Cria um índice para busca rápida na concatenação dos nomes
+    __table_args__ = tuple(
+        # Um índice trigram parcial por role para a busca por nome (ver
+        # busca.py): cada busca só percorre os usuários daquele papel
         Index(
-            'idx_usuario_nome_completo_trgm',
+            f"idx_usuario_nome_trgm_{role.value.lower()}",
             text("(pnome || ' ' || unome) gin_trgm_ops"),
-            postgresql_using='gin'
+            postgresql_using='gin',
+            postgresql_where=text(f"role = '{role.value}'"),
+        )
+        for role in RoleEnum
+    ) + (
+        # Diretório GET /users: filtro por role, ordem por nome e cursor
+        # (unome, pnome, id) saem do índice; o INCLUDE cobre o resto do
+        # response, então a página é um index-only scan
+        Index(
+            "idx_usuario_role_nome", "role", "unome", "pnome", "id",
+            postgresql_include=["email", "telefone", "cpf_usuario"],
+        ),
+        # o mesmo sem role na frente: GET /users sem filtro ou com várias
+        # roles percorre este em ordem (filtrando a role no INCLUDE) em vez
+        # de ordenar a tabela toda
+        Index(
+            "idx_usuario_nome", "unome", "pnome", "id",
+            postgresql_include=["role", "email", "telefone", "cpf_usuario"],
+        ),
+        # senhas ainda em texto puro (importação em massa), que o job de
+        # importacao.py troca pelo hash; vazio quase sempre
+        Index(
+            "idx_usuario_senha_pendente", "id",
+            postgresql_where=text("left(senha, 7) <> 'scrypt$'"),
         ),
     )
     
@@ -90,6 +114,15 @@ class Profissional(Usuario):
 
 class Fabricante(Base):
     __tablename__ = "fabricante"
+
+    __table_args__ = (
+        Index(
+            "idx_fabricante_nome_trgm",
+            text("nome gin_trgm_ops"),
+            postgresql_using='gin'
+        ),
+    )
+
     cnpj_fabricante: Mapped[str] = mapped_column("cnpj_fabricante", String(14), primary_key=True)
     nome: Mapped[str] = mapped_column(String(40), nullable=False)
     telefone: Mapped[str] = mapped_column(String(20), nullable=False)
@@ -162,6 +195,18 @@ class Estoque(Base):
 
 class Lote(Base): 
     __tablename__ = "lote"
+
+    __table_args__ = (
+        # lotes vencidos/a vencer (vencimentos.py, dashboard): faixa de
+        # validade só entre os lotes que ainda têm doses
+        Index("idx_lote_validade", "validade", postgresql_where=text("quantidade > 0")),
+        # alocação FEFO (alocacao.py): só lotes com doses entram no índice
+        Index(
+            "idx_lote_fefo", "estoque_id", "vacina_id", "validade",
+            postgresql_where=text("quantidade > 0"),
+        ),
+    )
+
     id_lote: Mapped[int] = mapped_column("id_lote", BigInteger, primary_key=True, autoincrement=True)
     validade: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
     data_chegada: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
@@ -189,8 +234,21 @@ class Dose(Base):
 
 class Aplicacao(Base): 
     __tablename__ = "aplicacao"
+
+    __table_args__ = (
+        # relatórios: sempre filtram por período, às vezes por unidade ou dose
+        Index("idx_aplicacao_data", "data"),
+        Index("idx_aplicacao_unidade_data", "unidade_nome", "data"),
+        Index("idx_aplicacao_dose_data", "dose_id", "data"),
+        # caderneta do paciente (caderneta.py)
+        Index("idx_aplicacao_paciente_data", "paciente_id", "data"),
+        # partição por mês (particoes.py); no banco a PK é (id_aplicação, data),
+        # mas o id sozinho já é único e é o que o ORM usa como identidade
+        {"postgresql_partition_by": "RANGE (data)"},
+    )
+
     id_aplicacao: Mapped[int] = mapped_column("id_aplicação", BigInteger, primary_key=True, autoincrement=True)
-    data: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.now)
+    data: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, default=datetime.datetime.now)
     
     # Todas as FKs corrigidas para apontar para Tabela.Coluna
     paciente_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("paciente.id"))
@@ -227,4 +285,113 @@ class Publicacao(Base):
     __tablename__ = "publicacao_campanha"
     # Correção: As FKs devem apontar para 'tabela.coluna_pk'
     campanha_id: Mapped[int] = mapped_column(ForeignKey("campanha.id_campanha"), primary_key=True)
-    vacina_id: Mapped[int] = mapped_column(ForeignKey("vacina.codigo_vacina"), primary_key=True)
\ No newline at end of file
+    vacina_id: Mapped[int] = mapped_column(ForeignKey("vacina.codigo_vacina"), primary_key=True)
+
+# --- Resumos (dashboard) ---
+#
+# Mantidos por triggers (ver resumos.py): cada escrita em aplicacao/lote
+# só faz INSERT em uma tabela *_delta, sem disputar lock com as outras.
+# Um job periódico soma os deltas nas tabelas de resumo.
+
+class ResumoAplicacaoDia(Base):
+    __tablename__ = "resumo_aplicacao_dia"
+    dia: Mapped[datetime.date] = mapped_column(Date, primary_key=True)
+    vacina_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    total: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+class ResumoAplicacaoVacina(Base):
+    __tablename__ = "resumo_aplicacao_vacina"
+    vacina_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    total: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+class ResumoAplicacaoDelta(Base):
+    __tablename__ = "resumo_aplicacao_delta"
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    dia: Mapped[datetime.date] = mapped_column(Date, nullable=False)
+    vacina_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    qtd: Mapped[int] = mapped_column(Integer, nullable=False)
+
+class ResumoEstoqueVacina(Base):
+    __tablename__ = "resumo_estoque_vacina"
+    vacina_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    doses: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+class ResumoEstoqueDelta(Base):
+    __tablename__ = "resumo_estoque_delta"
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    vacina_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    doses: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+# --- Agenda de doses ---
+#
+# Próxima dose de cada vacina por paciente, mantida pelo trigger
+# trg_proxima_dose (ver caderneta.py). Esquema completo: dose_id e
+# data_prevista NULL.
+
+class ProximaDose(Base):
+    __tablename__ = "proxima_dose"
+
+    __table_args__ = (
+        # "quem tem dose prevista nesta semana"
+        Index(
+            "idx_proxima_dose_data", "data_prevista",
+            postgresql_where=text("data_prevista IS NOT NULL"),
+        ),
+    )
+
+    paciente_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("paciente.id"), primary_key=True)
+    vacina_id: Mapped[int] = mapped_column(ForeignKey("vacina.codigo_vacina"), primary_key=True)
+    dose_id: Mapped[int] = mapped_column(ForeignKey("dose.id_dose"), nullable=True)
+    numero: Mapped[int] = mapped_column(Integer, nullable=False)
+    data_prevista: Mapped[datetime.date] = mapped_column(Date, nullable=True)
+
+# --- Cobertura vacinal ---
+#
+# Mantida pelo trigger trg_cobertura_aplicacao e pelo job de cobertura.py:
+# cobertura_paciente por (paciente, vacina) e os agregados pequenos por
+# unidade e por campanha, que é o que as consultas leem.
+
+class CoberturaPaciente(Base):
+    __tablename__ = "cobertura_paciente"
+
+    __table_args__ = (
+        # recalcular os agregados de uma vacina/campanha (ver cobertura.recalcular)
+        Index(
+            "idx_cobertura_paciente_vacina_data", "vacina_id", "primeira_data",
+            postgresql_include=["unidade_id", "doses"],
+        ),
+    )
+
+    paciente_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("paciente.id"), primary_key=True)
+    vacina_id: Mapped[int] = mapped_column(ForeignKey("vacina.codigo_vacina"), primary_key=True)
+    doses: Mapped[int] = mapped_column(Integer, nullable=False)  # doses distintas tomadas
+    unidade_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("unidade_de_saude.id"), nullable=False)  # da primeira dose
+    primeira_data: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
+
+class CoberturaUnidade(Base):
+    __tablename__ = "cobertura_unidade"
+    unidade_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    vacina_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    iniciados: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    completos: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+class CoberturaCampanha(Base):
+    __tablename__ = "cobertura_campanha"
+    campanha_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    vacina_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    unidade_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    iniciados: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    completos: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+class CoberturaPendente(Base):
+    __tablename__ = "cobertura_pendente"
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    paciente_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    vacina_id: Mapped[int] = mapped_column(Integer, nullable=False)
+
+class CoberturaReconstruir(Base):
+    __tablename__ = "cobertura_reconstruir"
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    vacina_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    campanha_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    pedido_em: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False, server_default=text("now()"))
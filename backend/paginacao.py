@@ -0,0 +1,160 @@
+import base64
+import json
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+import serializacao
+from database import AsyncSessionLocal
+from schemas import Pagina
+
+# Limites da paginação por cursor (keyset)
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 1000
+
+# Quantas linhas o cursor do servidor traz por vez no modo streaming
+LOTE_STREAMING = 1000
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def eh_projecao(stmt: Select) -> bool:
+    """True para select(colunas...) (ver serializacao.projecao), False para select(Entidade)."""
+    return not isinstance(stmt.column_descriptions[0]["expr"], type)
+
+
+async def _buscar(db: AsyncSession, stmt: Select) -> list:
+    # projeção vira lista de dicts; entidade, lista de objetos ORM
+    if eh_projecao(stmt):
+        return [dict(linha) for linha in (await db.execute(stmt)).mappings()]
+    return (await db.scalars(stmt)).all()
+
+
+def _com_chaves(stmt: Select, chaves) -> Select:
+    # o cursor sai da última linha, então a projeção precisa trazer as chaves
+    # mesmo quando o schema não as tem (ex.: UnidadeResponse sem id)
+    if eh_projecao(stmt):
+        faltando = [c.label(c.key) for c in chaves if c.key not in stmt.selected_columns.keys()]
+        if faltando:
+            stmt = stmt.add_columns(*faltando)
+    return stmt
+
+
+def _valor(item, chave):
+    return item[chave.key] if isinstance(item, dict) else getattr(item, chave.key)
+
+
+async def paginar(db: AsyncSession, stmt: Select, chave, limit: int, after=None) -> dict:
+    """
+    Paginação keyset: ordena pela chave (única e estável) e continua
+    a partir do último valor visto, sem OFFSET.
+
+    Busca limit + 1 linhas só para saber se existe próxima página.
+    """
+    if after is not None:
+        stmt = stmt.where(chave > after)
+
+    itens = await _buscar(db, _com_chaves(stmt, [chave]).order_by(chave).limit(limit + 1))
+
+    proximo = None
+    if len(itens) > limit:
+        itens = itens[:limit]
+        proximo = str(_valor(itens[-1], chave))
+
+    return {"itens": itens, "proximo": proximo}
+
+
+def _cursor(valores) -> str:
+    return base64.urlsafe_b64encode(json.dumps([str(v) for v in valores]).encode()).decode()
+
+
+def _ler_cursor(cursor: str, chaves) -> list:
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(valores) != len(chaves):
+            raise ValueError
+        return [chave.type.python_type(v) for chave, v in zip(chaves, valores)]
+    except (ValueError, TypeError):
+        raise ValueError("Cursor inválido")
+
+
+async def paginar_composto(
+    db: AsyncSession, stmt: Select, chaves: tuple, limit: int, after: str = None, desc: bool = False
+) -> dict:
+    """
+    Como `paginar`, mas ordenando por várias colunas (ex.: sobrenome, nome,
+    id). O cursor é opaco (base64 dos valores da última linha) e a
+    continuação é uma comparação de tupla, que o Postgres resolve no mesmo
+    índice da ordenação. ValueError se o cursor não for válido.
+    """
+    if after is not None:
+        tupla, ultimo = tuple_(*chaves), tuple_(*_ler_cursor(after, chaves))
+        stmt = stmt.where(tupla < ultimo if desc else tupla > ultimo)
+
+    ordem = [chave.desc() if desc else chave for chave in chaves]
+    itens = await _buscar(db, _com_chaves(stmt, chaves).order_by(*ordem).limit(limit + 1))
+
+    proximo = None
+    if len(itens) > limit:
+        itens = itens[:limit]
+        proximo = _cursor(_valor(itens[-1], chave) for chave in chaves)
+
+    return {"itens": itens, "proximo": proximo}
+
+
+def stream_ndjson(
+    stmt: Select,
+    schema: type[BaseModel],
+    chave,
+    after=None,
+    bind: AsyncEngine = None,
+) -> StreamingResponse:
+    """
+    Devolve a tabela inteira (a partir de `after`) como NDJSON, uma linha
+    por registro. Usa yield_per com cursor no servidor, então só
+    LOTE_STREAMING objetos ficam em memória por vez.
+
+    A sessão é aberta dentro do gerador porque ele roda depois que o
+    handler (e o get_db dele) já terminou. `bind` é a engine da sessão do
+    handler (db.bind), para o stream ler do mesmo lugar (réplica ou
+    primária, ver roteamento.py); sem ele, usa a primária.
+    """
+    if after is not None:
+        stmt = stmt.where(chave > after)
+    stmt = stmt.order_by(chave).execution_options(yield_per=LOTE_STREAMING)
+
+    projecao = eh_projecao(stmt)
+
+    async def gerar():
+        async with (AsyncSession(bind, autoflush=False) if bind is not None else AsyncSessionLocal()) as db:
+            if projecao:
+                result = (await db.stream(stmt)).mappings()
+            else:
+                result = await db.stream_scalars(stmt)
+            async for parte in result.partitions():
+                yield b"".join(
+                    serializacao.linha_json(schema, item, from_attributes=not projecao) for item in parte
+                )
+
+    return StreamingResponse(gerar(), media_type=NDJSON_MEDIA_TYPE)
+
+
+async def listar(
+    db: AsyncSession,
+    stmt: Select,
+    schema: type[BaseModel],
+    chave,
+    limit: int,
+    after=None,
+    formato: str = "json",
+):
+    """
+    Ponto único usado pelos endpoints listar_*: página JSON ou stream NDJSON.
+    Com `stmt` vindo de serializacao.projecao, nenhum objeto ORM é criado.
+    """
+    if formato == "ndjson":
+        return stream_ndjson(stmt, schema, chave, after, bind=db.bind)
+    pagina = await paginar(db, stmt, chave, limit, after)
+    return serializacao.resposta(Pagina[schema], pagina, from_attributes=not eh_projecao(stmt))
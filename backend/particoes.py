@@ -0,0 +1,202 @@
+# Partições mensais de aplicacao.
+#
+# aplicacao é particionada por RANGE (data), uma partição por mês
+# (aplicacao_AAAA_MM). Toda consulta que filtra por período (relatórios,
+# exportação, dashboard) só abre as partições do intervalo, e índices e
+# VACUUM trabalham em tabelas do tamanho de um mês.
+#
+# Não há partição DEFAULT, de propósito: com ela, criar uma partição nova
+# precisa varrer a DEFAULT e o DETACH ... CONCURRENTLY fica proibido. Em
+# troca, uma aplicação com data fora das partições existentes é recusada
+# (vira 400 no registro). O job `loop_particoes` mantém
+# PARTICOES_MESES_FRENTE meses futuros criados; datas antigas (registro
+# offline, carga de histórico) pedem `python -m particoes --criar AAAA-MM`.
+# Todos passam pela função criar_particoes_aplicacao(inicio, fim), instalada
+# pela migração v0004.
+#
+# Arquivamento: `python -m particoes --desanexar AAAA-MM` faz
+# DETACH PARTITION CONCURRENTLY, que não bloqueia leituras nem escritas
+# nas outras partições. A tabela desanexada continua no banco como tabela
+# comum (para pg_dump ou consulta) até `--apagar`. Desanexar não dispara os
+# triggers de DELETE, então os resumos do dashboard continuam contando
+# aquele histórico.
+import asyncio
+import datetime
+import json
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Partições atuais com o intervalo de cada uma
+_LISTAR = """
+SELECT c.relname AS nome, pg_get_expr(c.relpartbound, c.oid) AS limites,
+       pg_total_relation_size(c.oid) AS bytes
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'aplicacao'::regclass
+ORDER BY c.relname
+"""
+
+# Com vários workers só um cria partições por vez
+_LOCK_PARTICOES = 7_420_003
+
+
+def nome_particao(mes: datetime.date) -> str:
+    return f"aplicacao_{mes:%Y_%m}"
+
+
+def _mais_meses(dia: datetime.date, meses: int) -> datetime.date:
+    total = dia.year * 12 + dia.month - 1 + meses
+    return datetime.date(total // 12, total % 12 + 1, 1)
+
+
+async def garantir_futuras(db: AsyncSession, meses: int = None) -> int:
+    """
+    Cria as partições do mês atual até `meses` à frente. Devolve quantas
+    criou (0 se outro worker já está nisso ou se o lock não saiu a tempo).
+    """
+    meses = config.PARTICOES_MESES_FRENTE if meses is None else meses
+    if not (await db.execute(text("SELECT pg_try_advisory_xact_lock(:k)"), {"k": _LOCK_PARTICOES})).scalar():
+        return 0
+    # CREATE ... PARTITION OF pega lock exclusivo no pai; com lock_timeout
+    # curto, se houver uma consulta longa na frente a criação desiste e
+    # tenta de novo no próximo ciclo em vez de enfileirar todo mundo atrás
+    await db.execute(text("SET LOCAL lock_timeout = '2s'"))
+    hoje = datetime.date.today()
+    criadas = (
+        await db.execute(
+            text("SELECT criar_particoes_aplicacao(:inicio, :fim)"),
+            {"inicio": hoje, "fim": _mais_meses(hoje, meses)},
+        )
+    ).scalar()
+    await db.commit()
+    return criadas
+
+
+async def loop_particoes(session_factory, intervalo: float = None):
+    """Job em segundo plano: mantém as partições futuras criadas."""
+    intervalo = config.PARTICOES_INTERVALO_S if intervalo is None else intervalo
+    while True:
+        try:
+            async with session_factory() as db:
+                criadas = await garantir_futuras(db)
+            if criadas:
+                logger.info("%s partições novas de aplicacao", criadas)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Falha ao criar partições de aplicacao")
+        await asyncio.sleep(intervalo)
+
+
+# --- Operação (síncrona, via `python -m particoes`) ---
+
+def listar(connection) -> list[dict]:
+    return [dict(linha) for linha in connection.execute(text(_LISTAR)).mappings()]
+
+
+def criar(connection, inicio: datetime.date, fim: datetime.date) -> int:
+    return connection.execute(
+        text("SELECT criar_particoes_aplicacao(:inicio, :fim)"), {"inicio": inicio, "fim": fim}
+    ).scalar()
+
+
+def desanexar(engine, mes: datetime.date):
+    """
+    DETACH PARTITION CONCURRENTLY: não pode rodar dentro de transação,
+    por isso usa uma conexão em autocommit.
+    """
+    nome = nome_particao(mes)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.exec_driver_sql(f'ALTER TABLE aplicacao DETACH PARTITION "{nome}" CONCURRENTLY')
+    return nome
+
+
+def apagar(connection, mes: datetime.date):
+    """Só apaga partições já desanexadas (nunca uma ainda ligada a aplicacao)."""
+    nome = nome_particao(mes)
+    ligada = connection.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(:n))"), {"n": nome}
+    ).scalar()
+    if ligada:
+        raise ValueError(f"{nome} ainda é partição de aplicacao; desanexe antes")
+    connection.exec_driver_sql(f'DROP TABLE IF EXISTS "{nome}"')
+    return nome
+
+
+def verificar_poda(connection, inicio: datetime.date, fim: datetime.date) -> dict:
+    """
+    EXPLAIN de uma consulta limitada por data (como as dos relatórios) e as
+    partições que o plano abre. Com a poda funcionando, são só as do intervalo.
+    """
+    plano = connection.execute(
+        text(
+            "EXPLAIN (FORMAT JSON) SELECT count(*) FROM aplicacao "
+            "WHERE data >= :inicio AND data < :fim"
+        ),
+        {"inicio": inicio, "fim": fim},
+    ).scalar()
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+
+    abertas = set()
+
+    def visitar(no):
+        if no.get("Relation Name", "").startswith("aplicacao_"):
+            abertas.add(no["Relation Name"])
+        for filho in no.get("Plans", ()):
+            visitar(filho)
+
+    visitar(plano[0]["Plan"])
+
+    esperadas, mes = set(), inicio.replace(day=1)
+    while mes < fim:
+        esperadas.add(nome_particao(mes))
+        mes = _mais_meses(mes, 1)
+    existentes = {p["nome"] for p in listar(connection)}
+    return {
+        "abertas": sorted(abertas),
+        "esperadas": sorted(esperadas & existentes),
+        "ok": abertas <= esperadas,
+    }
+
+
+def _mes(texto: str) -> datetime.date:
+    return datetime.datetime.strptime(texto, "%Y-%m").date()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from database import engine
+
+    parser = argparse.ArgumentParser(prog="python -m particoes", description="Partições mensais de aplicacao.")
+    parser.add_argument("--criar", nargs="+", metavar="AAAA-MM", help="cria o mês (ou o intervalo INICIO FIM)")
+    parser.add_argument("--desanexar", metavar="AAAA-MM", help="DETACH CONCURRENTLY da partição do mês")
+    parser.add_argument("--apagar", metavar="AAAA-MM", help="DROP de uma partição já desanexada")
+    parser.add_argument("--verificar", nargs=2, metavar=("INICIO", "FIM"), help="confere a poda (datas AAAA-MM-DD)")
+    args = parser.parse_args()
+
+    if args.desanexar:
+        print(f"desanexada: {desanexar(engine, _mes(args.desanexar))}")
+    elif args.criar:
+        with engine.begin() as connection:
+            print(f"criadas: {criar(connection, _mes(args.criar[0]), _mes(args.criar[-1]))}")
+    elif args.apagar:
+        with engine.begin() as connection:
+            print(f"apagada: {apagar(connection, _mes(args.apagar))}")
+    elif args.verificar:
+        inicio, fim = (datetime.date.fromisoformat(d) for d in args.verificar)
+        with engine.connect() as connection:
+            resultado = verificar_poda(connection, inicio, fim)
+        print(json.dumps(resultado, indent=2))
+        raise SystemExit(0 if resultado["ok"] else 1)
+    else:
+        with engine.connect() as connection:
+            for p in listar(connection):
+                print(f"{p['nome']:20} {p['limites']:70} {p['bytes'] / 2**20:10.1f} MB")
@@ -0,0 +1,310 @@
+# Registro de aplicação com baixa no estoque do lote.
+#
+# A baixa é um único UPDATE condicional:
+#
+#     UPDATE lote SET quantidade = quantidade - 1
+#     WHERE id_lote = :lote AND quantidade > 0 AND validade >= now() AND vacina_id = <vacina da dose>
+#     RETURNING quantidade
+#
+# O Postgres reavalia o WHERE depois de esperar pelo lock da linha, então
+# duas requisições nunca vendem a mesma última dose. O lock é só da linha
+# daquele lote (outros lotes seguem em paralelo) e dura o mínimo: o INSERT
+# da aplicação vem antes e o commit logo depois do UPDATE.
+#
+# Sem lote_id, o lote é escolhido no próprio UPDATE pelo critério FEFO
+# (alocacao.py), entre os lotes dos estoques da unidade.
+import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import insert, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import alocacao
+import model
+import relatorios
+import schemas
+from particoes import nome_particao
+
+_SEM_PARTICAO = "Data da aplicação fora do período aceito (sem partição para o mês)"
+
+
+async def _motivo_falha_baixa(db: AsyncSession, lote_id: int, dose_id: int) -> HTTPException:
+    # só roda no caminho de erro, para dizer por que o UPDATE não pegou nada
+    lote = await db.get(model.Lote, lote_id)
+    if lote is None:
+        return HTTPException(status_code=404, detail="Lote não encontrado")
+
+    vacina_da_dose = (await db.execute(
+        select(model.Dose.vacina_id).where(model.Dose.id_dose == dose_id)
+    )).scalar()
+    if vacina_da_dose is None:
+        return HTTPException(status_code=404, detail="Dose não encontrada")
+    if lote.vacina_id != vacina_da_dose:
+        return HTTPException(status_code=400, detail="O lote não é da vacina desta dose")
+    if lote.validade < datetime.datetime.now():
+        return HTTPException(status_code=409, detail="Lote vencido")
+    return HTTPException(status_code=409, detail="Lote sem doses disponíveis")
+
+
+async def _motivo_falha_fefo(db: AsyncSession, dose_id: int) -> HTTPException:
+    # mesmos códigos do caminho com lote_id: dose inexistente é 404, falta de lote é 409
+    if await db.get(model.Dose, dose_id) is None:
+        return HTTPException(status_code=404, detail="Dose não encontrada")
+    return HTTPException(status_code=409, detail="Nenhum lote válido com doses desta vacina na unidade")
+
+
+def baixa_lote(lote_id: int, dose_id: int, quantidade: int = 1):
+    """UPDATE condicional que tira `quantidade` doses do lote, ou nada."""
+    vacina_da_dose = select(model.Dose.vacina_id)\
+        .where(model.Dose.id_dose == dose_id)\
+        .scalar_subquery()
+
+    return (
+        update(model.Lote)
+        .where(
+            model.Lote.id_lote == lote_id,
+            model.Lote.quantidade >= quantidade,
+            model.Lote.validade >= datetime.datetime.now(),
+            model.Lote.vacina_id == vacina_da_dose,
+        )
+        .values(quantidade=model.Lote.quantidade - quantidade)
+        .returning(model.Lote.quantidade)
+    )
+
+
+def baixa_fefo(unidade_id, dose_id: int, pular_travados: bool = True):
+    """Tira uma dose do lote FEFO da unidade (ver alocacao.py) e devolve o id dele."""
+    vacina_da_dose = select(model.Dose.vacina_id)\
+        .where(model.Dose.id_dose == dose_id)\
+        .scalar_subquery()
+
+    # SKIP LOCKED: se o lote que vence primeiro está com outra baixa em
+    # andamento, usa o seguinte em vez de esperar pelo lock. Se todos estão
+    # travados, o chamador repete com pular_travados=False e espera.
+    escolhido = alocacao.consulta_fefo(vacina_da_dose, unidade_id=unidade_id)\
+        .with_only_columns(model.Lote.id_lote)\
+        .with_for_update(skip_locked=pular_travados)\
+        .scalar_subquery()
+
+    return (
+        update(model.Lote)
+        .where(model.Lote.id_lote == escolhido, model.Lote.quantidade > 0)
+        .values(quantidade=model.Lote.quantidade - 1)
+        .returning(model.Lote.id_lote)
+    )
+
+
+async def _inserir(db: AsyncSession, obj: model.Aplicacao):
+    dose_id, lote_id = obj.dose_id, obj.lote_id
+    db.add(obj)
+    try:
+        await db.flush()
+    except IntegrityError as e:
+        await db.rollback()
+        if getattr(e.orig, "sqlstate", None) == "23514":
+            # aplicacao é particionada por mês e não há partição para esta data
+            raise HTTPException(status_code=400, detail=_SEM_PARTICAO)
+        # dose/lote inexistentes: mesmo 404 de _motivo_falha_baixa e do FEFO
+        if await db.get(model.Dose, dose_id) is None:
+            raise HTTPException(status_code=404, detail="Dose não encontrada")
+        if lote_id is not None and await db.get(model.Lote, lote_id) is None:
+            raise HTTPException(status_code=404, detail="Lote não encontrado")
+        raise HTTPException(
+            status_code=400,
+            detail="Paciente, profissional, admin, unidade, dose ou lote inexistente",
+        )
+
+
+async def registrar_aplicacao(db: AsyncSession, dados: schemas.AplicacaoCreate) -> model.Aplicacao:
+    """
+    Grava a aplicação e dá baixa de uma dose no lote, na mesma transação
+    (faz commit). Sem lote_id, usa o lote FEFO da unidade.
+    """
+    obj = model.Aplicacao(**dados.model_dump(exclude_none=True))
+
+    if dados.lote_id is None:
+        obj.lote_id = (await db.execute(baixa_fefo(dados.unidade_nome, dados.dose_id))).scalar()
+        if obj.lote_id is None:
+            # pode ser só o único lote da unidade travado por outra baixa
+            obj.lote_id = (await db.execute(
+                baixa_fefo(dados.unidade_nome, dados.dose_id, pular_travados=False)
+            )).scalar()
+        if obj.lote_id is None:
+            await db.rollback()
+            raise await _motivo_falha_fefo(db, dados.dose_id)
+        await _inserir(db, obj)
+    else:
+        await _inserir(db, obj)
+        restante = (await db.execute(baixa_lote(dados.lote_id, dados.dose_id))).scalar()
+        if restante is None:
+            await db.rollback()
+            raise await _motivo_falha_baixa(db, dados.lote_id, dados.dose_id)
+
+    await db.commit()
+
+    # registro retroativo pode cair num período de relatório já em cache
+    await relatorios.invalidar(obj.data)
+    return obj
+
+
+# --- Registro em lote (sincronização das equipes móveis) ---
+#
+# Um lote de N aplicações custa um número fixo de comandos, não N:
+#   1. uma consulta (UNION ALL) com todos os pacientes, profissionais,
+#      admins, unidades, doses e lotes referenciados;
+#   2. validação item a item em memória (inclusive se o mês da data tem
+#      partição ligada a aplicacao: uma desanexada por `particoes.py
+#      --desanexar` ainda existe como tabela, mas o INSERT falharia);
+#   3. um UPDATE com a baixa somada por lote, que trava os lotes em ordem
+#      de id (sem deadlock entre lotes concorrentes) e tira o que houver:
+#      se um lote só tem 3 das 5 doses pedidas, os 3 primeiros itens dele
+#      entram e os outros voltam com erro;
+#   4. um INSERT multi-row ... RETURNING com os itens aceitos.
+# Itens com erro não abortam os outros; cada um volta com status e motivo.
+
+_REFERENCIAS = """
+SELECT 'paciente' AS tipo, id::text AS chave, NULL::int AS vacina_id, NULL::timestamp AS validade
+FROM paciente WHERE id = ANY(CAST(:pacientes AS uuid[]))
+UNION ALL
+SELECT 'profissional', id::text, NULL, NULL
+FROM profissional_de_saude WHERE id = ANY(CAST(:profissionais AS uuid[]))
+UNION ALL
+SELECT 'admin', id::text, NULL, NULL
+FROM admin WHERE id = ANY(CAST(:admins AS uuid[]))
+UNION ALL
+SELECT 'unidade', id::text, NULL, NULL
+FROM unidade_de_saude WHERE id = ANY(CAST(:unidades AS uuid[]))
+UNION ALL
+SELECT 'dose', id_dose::text, vacina_id, NULL
+FROM dose WHERE id_dose = ANY(CAST(:doses AS bigint[]))
+UNION ALL
+SELECT 'lote', id_lote::text, vacina_id, validade
+FROM lote WHERE id_lote = ANY(CAST(:lotes AS bigint[]))
+UNION ALL
+SELECT 'mes', c.relname::text, NULL, NULL
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'aplicacao'::regclass AND NOT i.inhdetachpending
+  AND c.relname = ANY(CAST(:meses AS text[]))
+"""
+
+_BAIXA_AGREGADA = """
+WITH pedido AS (
+    SELECT * FROM unnest(CAST(:lotes AS bigint[]), CAST(:qtds AS int[])) AS p(id_lote, qtd)
+), alvo AS (
+    SELECT l.id_lote, LEAST(l.quantidade, p.qtd) AS tirar
+    FROM lote l JOIN pedido p ON p.id_lote = l.id_lote
+    WHERE l.quantidade > 0
+    ORDER BY l.id_lote
+    FOR UPDATE OF l
+)
+UPDATE lote l SET quantidade = l.quantidade - a.tirar
+FROM alvo a
+WHERE l.id_lote = a.id_lote
+RETURNING l.id_lote, a.tirar
+"""
+
+
+def _validar_item(item: schemas.AplicacaoCreate, refs: dict, agora: datetime.datetime):
+    if item.lote_id is None:
+        return 400, "lote_id é obrigatório no registro em lote"
+    for tipo, chave in (
+        ("paciente", item.paciente_id),
+        ("profissional", item.profissional_id),
+        ("admin", item.admin_id),
+        ("unidade", item.unidade_nome),
+        ("dose", item.dose_id),
+        ("lote", item.lote_id),
+    ):
+        if str(chave) not in refs[tipo]:
+            return 404, f"{tipo.capitalize()} não encontrado"
+
+    vacina_lote, validade = refs["lote"][str(item.lote_id)]
+    vacina_dose, _ = refs["dose"][str(item.dose_id)]
+    if vacina_lote != vacina_dose:
+        return 400, "O lote não é da vacina desta dose"
+    if validade < agora:
+        return 409, "Lote vencido"
+    if nome_particao(item.data or agora) not in refs["mes"]:
+        return 400, _SEM_PARTICAO
+    return None
+
+
+async def registrar_lote(db: AsyncSession, itens: list[schemas.AplicacaoCreate]) -> dict:
+    """Registra várias aplicações de uma vez (faz commit). Ver o comentário acima."""
+    agora = datetime.datetime.now()
+    resultados = [{"indice": i, "id_aplicacao": None, "status": 201, "motivo": None} for i in range(len(itens))]
+
+    def _distintos(campo):
+        return list({getattr(item, campo) for item in itens if getattr(item, campo) is not None})
+
+    refs = {tipo: {} for tipo in ("paciente", "profissional", "admin", "unidade", "dose", "lote", "mes")}
+    linhas = await db.execute(text(_REFERENCIAS), {
+        "pacientes": _distintos("paciente_id"),
+        "profissionais": _distintos("profissional_id"),
+        "admins": _distintos("admin_id"),
+        "unidades": _distintos("unidade_nome"),
+        "doses": _distintos("dose_id"),
+        "lotes": _distintos("lote_id"),
+        "meses": list({nome_particao(item.data or agora) for item in itens}),
+    })
+    for tipo, chave, vacina_id, validade in linhas:
+        refs[tipo][chave] = (vacina_id, validade)
+
+    validos = []
+    for i, item in enumerate(itens):
+        erro = _validar_item(item, refs, agora)
+        if erro:
+            resultados[i]["status"], resultados[i]["motivo"] = erro
+        else:
+            validos.append(i)
+
+    pedidos: dict = {}
+    for i in validos:
+        pedidos[itens[i].lote_id] = pedidos.get(itens[i].lote_id, 0) + 1
+
+    disponivel = {}
+    if pedidos:
+        baixa = await db.execute(text(_BAIXA_AGREGADA), {
+            "lotes": list(pedidos), "qtds": list(pedidos.values()),
+        })
+        disponivel = dict(baixa.all())
+
+    # os primeiros itens de cada lote (na ordem do payload) ficam com as doses
+    aceitos = []
+    for i in validos:
+        lote_id = itens[i].lote_id
+        if disponivel.get(lote_id, 0) > 0:
+            disponivel[lote_id] -= 1
+            aceitos.append(i)
+        else:
+            resultados[i]["status"], resultados[i]["motivo"] = 409, "Lote sem doses disponíveis"
+
+    dias = set()
+    if aceitos:
+        valores = [
+            {**itens[i].model_dump(), "data": itens[i].data or agora}
+            for i in aceitos
+        ]
+        ids = await db.scalars(
+            insert(model.Aplicacao).returning(model.Aplicacao.id_aplicacao, sort_by_parameter_order=True),
+            valores,
+        )
+        for i, id_aplicacao in zip(aceitos, ids):
+            resultados[i]["id_aplicacao"] = id_aplicacao
+        dias = {v["data"].replace(hour=0, minute=0, second=0, microsecond=0) for v in valores}
+
+    await db.commit()
+
+    # registros offline costumam ser retroativos
+    if dias:
+        await relatorios.invalidar(min(dias))
+
+    erros = [r for r in resultados if r["motivo"] is not None]
+    return {
+        "recebidos": len(itens),
+        "inseridos": len(aceitos),
+        "total_erros": len(erros),
+        "resultados": resultados,
+    }
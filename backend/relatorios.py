@@ -0,0 +1,195 @@
+# Relatórios de aplicações agregados no banco (date_trunc + GROUP BY).
+#
+# O intervalo pedido é quebrado em períodos (dia/semana/mês/ano). Períodos
+# já fechados quase não mudam, então o resultado deles fica em cache; só o
+# período corrente (e os que ainda estão na carência para registros
+# offline) é recalculado a cada chamada.
+#
+# O cache é por processo, mas a chave leva a versão do namespace
+# "relatorios" de cache.py: um registro retroativo (registro.py) muda a
+# versão e, com CACHE_BACKEND=redis, todos os workers deixam de usar o que
+# guardaram. Escritas que não passam por registro.py (importação, SQL
+# direto, manutenção de partições) e o backend em memória ficam cobertos
+# pelo TTL: nenhum período fica em cache mais que RELATORIOS_CACHE_TTL_S.
+import datetime
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import String, cast, func, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import cache
+import config
+import model
+
+NAMESPACE_CACHE = "relatorios"
+
+GRANULARIDADES = {
+    "dia": "day",
+    "semana": "week",
+    "mes": "month",
+    "ano": "year",
+}
+
+def inicio_periodo(data: datetime.datetime, granularidade: str) -> datetime.datetime:
+    """Equivalente em Python do date_trunc do Postgres."""
+    data = data.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularidade == "semana":
+        return data - datetime.timedelta(days=data.weekday())
+    if granularidade == "mes":
+        return data.replace(day=1)
+    if granularidade == "ano":
+        return data.replace(month=1, day=1)
+    return data
+
+
+def proximo_periodo(inicio: datetime.datetime, granularidade: str) -> datetime.datetime:
+    if granularidade == "dia":
+        return inicio + datetime.timedelta(days=1)
+    if granularidade == "semana":
+        return inicio + datetime.timedelta(weeks=1)
+    if granularidade == "mes":
+        return inicio.replace(year=inicio.year + inicio.month // 12, month=inicio.month % 12 + 1)
+    return inicio.replace(year=inicio.year + 1)
+
+
+class CachePeriodos:
+    """LRU em memória com TTL para os períodos fechados (por processo)."""
+
+    def __init__(self, tamanho_maximo: int, ttl: float):
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl = ttl
+        self._dados: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None:
+                return None
+            expira_em, linhas = item
+            if expira_em < time.monotonic():
+                del self._dados[chave]
+                return None
+            self._dados.move_to_end(chave)
+            return linhas
+
+    def guardar(self, chave, linhas: list):
+        with self._lock:
+            self._dados[chave] = (time.monotonic() + self.ttl, linhas)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.tamanho_maximo:
+                self._dados.popitem(last=False)
+
+
+periodos_em_cache = CachePeriodos(config.RELATORIOS_CACHE_MAX, config.RELATORIOS_CACHE_TTL_S)
+
+
+async def invalidar(data: datetime.datetime):
+    """
+    Chamado depois de gravar uma aplicação com esta data. Só muda a versão
+    se a data já pode estar num período fechado (registro retroativo).
+    """
+    if data < datetime.datetime.now() - datetime.timedelta(hours=config.RELATORIOS_CARENCIA_H):
+        await cache.invalidar(NAMESPACE_CACHE)
+
+
+def _consulta(granularidade: str, agrupar: str, inicio, fim, vacina_id, unidade_id):
+    # literal e não parâmetro: com bind params o SELECT e o GROUP BY viram
+    # $1 e $2 e o Postgres não reconhece como a mesma expressão
+    unidade_tempo = literal_column(f"'{GRANULARIDADES[granularidade]}'")
+    periodo = func.date_trunc(unidade_tempo, model.Aplicacao.data).label("periodo")
+
+    if agrupar == "vacina":
+        dimensao = [
+            cast(model.Vacina.codigo_vacina, String).label("chave"),
+            model.Vacina.nome.label("nome"),
+        ]
+    elif agrupar == "unidade":
+        dimensao = [
+            cast(model.UnidadeDeSaude.id, String).label("chave"),
+            model.UnidadeDeSaude.nome_unidade.label("nome"),
+        ]
+    else:
+        dimensao = []
+
+    stmt = select(periodo, *dimensao, func.count().label("total"))\
+        .select_from(model.Aplicacao)\
+        .where(model.Aplicacao.data >= inicio, model.Aplicacao.data < fim)
+
+    if agrupar == "vacina":
+        stmt = stmt.join(model.Dose, model.Dose.id_dose == model.Aplicacao.dose_id)\
+            .join(model.Vacina, model.Vacina.codigo_vacina == model.Dose.vacina_id)
+    elif agrupar == "unidade":
+        stmt = stmt.join(model.UnidadeDeSaude, model.UnidadeDeSaude.id == model.Aplicacao.unidade_nome)
+
+    if vacina_id is not None:
+        # IN (doses da vacina) deixa o planner usar o índice (dose_id, data)
+        doses = select(model.Dose.id_dose).where(model.Dose.vacina_id == vacina_id)
+        stmt = stmt.where(model.Aplicacao.dose_id.in_(doses.scalar_subquery()))
+    if unidade_id is not None:
+        stmt = stmt.where(model.Aplicacao.unidade_nome == unidade_id)
+
+    return stmt.group_by(periodo, *dimensao).order_by(periodo)
+
+
+async def relatorio_aplicacoes(
+    db: AsyncSession,
+    inicio: datetime.datetime,
+    fim: datetime.datetime,
+    granularidade: str = "mes",
+    agrupar: str = "total",
+    vacina_id=None,
+    unidade_id=None,
+) -> list[dict]:
+    """
+    Aplicações no intervalo [inicio, fim) por período, opcionalmente
+    quebradas por vacina ou unidade. Devolve linhas
+    {periodo, chave, nome, total} ordenadas por período.
+    """
+    fechado_ate = inicio_periodo(
+        datetime.datetime.now() - datetime.timedelta(hours=config.RELATORIOS_CARENCIA_H),
+        granularidade,
+    )
+
+    # (inicio, fim) de cada período, recortado pelo intervalo pedido
+    periodos = []
+    atual = inicio_periodo(inicio, granularidade)
+    while atual < fim:
+        proximo = proximo_periodo(atual, granularidade)
+        periodos.append((max(atual, inicio), min(proximo, fim), proximo <= fechado_ate))
+        atual = proximo
+
+    versao = await cache.backend.versao(NAMESPACE_CACHE)
+    filtros = (versao, granularidade, agrupar, vacina_id, unidade_id)
+    resultado = {}
+    faltando = []
+    for p_inicio, p_fim, fechado in periodos:
+        linhas = periodos_em_cache.obter(filtros + (p_inicio, p_fim)) if fechado else None
+        if linhas is None:
+            faltando.append((p_inicio, p_fim, fechado))
+        else:
+            resultado[p_inicio] = linhas
+
+    if faltando:
+        # uma consulta só, cobrindo do primeiro ao último período que faltou
+        stmt = _consulta(
+            granularidade, agrupar, faltando[0][0], faltando[-1][1], vacina_id, unidade_id
+        )
+        por_periodo: dict = {}
+        for linha in (await db.execute(stmt)).mappings():
+            por_periodo.setdefault(linha["periodo"], []).append({
+                "periodo": linha["periodo"],
+                "chave": linha.get("chave"),
+                "nome": linha.get("nome"),
+                "total": linha["total"],
+            })
+
+        for p_inicio, p_fim, fechado in faltando:
+            linhas = por_periodo.get(inicio_periodo(p_inicio, granularidade), [])
+            resultado[p_inicio] = linhas
+            if fechado:
+                periodos_em_cache.guardar(filtros + (p_inicio, p_fim), linhas)
+
+    return [linha for p_inicio, _, _ in periodos for linha in resultado[p_inicio]]
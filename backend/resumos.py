@@ -0,0 +1,165 @@
+# Agregados do dashboard mantidos de forma incremental.
+#
+# Triggers em aplicacao e lote (instalados pela migração v0002) gravam
+# cada mudança como uma linha nas tabelas *_delta (só INSERT, então
+# escritas concorrentes não brigam pela mesma linha de contador). O job
+# periódico `consolidar` move os deltas para as tabelas de resumo com um
+# DELETE ... RETURNING agregado.
+#
+# As leituras somam resumo + deltas pendentes, então os números são
+# exatos mesmo entre duas consolidações; o job só mantém os deltas pequenos.
+import asyncio
+import datetime
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Lotes que vencem dentro desse número de dias contam como "a vencer"
+DIAS_PROXIMO_VENCIMENTO = 30
+
+# Quantos dias entram no gráfico de aplicações por dia
+DIAS_HISTORICO = 7
+
+# Reconstrução completa (bench/dados.py, depois de uma carga sem triggers)
+_RECONSTRUIR = """
+LOCK TABLE aplicacao, lote IN SHARE MODE;
+
+TRUNCATE resumo_aplicacao_dia, resumo_aplicacao_vacina, resumo_aplicacao_delta,
+         resumo_estoque_vacina, resumo_estoque_delta;
+
+INSERT INTO resumo_aplicacao_dia (dia, vacina_id, total)
+SELECT a.data::date, d.vacina_id, count(*)
+FROM aplicacao a JOIN dose d ON d.id_dose = a.dose_id
+GROUP BY 1, 2;
+
+INSERT INTO resumo_aplicacao_vacina (vacina_id, total)
+SELECT vacina_id, sum(total) FROM resumo_aplicacao_dia GROUP BY vacina_id;
+
+INSERT INTO resumo_estoque_vacina (vacina_id, doses)
+SELECT vacina_id, sum(quantidade) FROM lote GROUP BY vacina_id;
+"""
+
+# Um único comando por tabela: o DELETE ... RETURNING só enxerga deltas
+# já commitados, e os que chegarem durante a consolidação ficam para a próxima.
+_CONSOLIDAR_APLICACOES = """
+WITH d AS (
+    DELETE FROM resumo_aplicacao_delta RETURNING dia, vacina_id, qtd
+), por_dia AS (
+    INSERT INTO resumo_aplicacao_dia AS r (dia, vacina_id, total)
+    SELECT dia, vacina_id, sum(qtd) FROM d GROUP BY dia, vacina_id
+    ON CONFLICT (dia, vacina_id) DO UPDATE SET total = r.total + excluded.total
+)
+INSERT INTO resumo_aplicacao_vacina AS r (vacina_id, total)
+SELECT vacina_id, sum(qtd) FROM d GROUP BY vacina_id
+ON CONFLICT (vacina_id) DO UPDATE SET total = r.total + excluded.total
+"""
+
+_CONSOLIDAR_ESTOQUE = """
+WITH d AS (
+    DELETE FROM resumo_estoque_delta RETURNING vacina_id, doses
+)
+INSERT INTO resumo_estoque_vacina AS r (vacina_id, doses)
+SELECT vacina_id, sum(doses) FROM d GROUP BY vacina_id
+ON CONFLICT (vacina_id) DO UPDATE SET doses = r.doses + excluded.doses
+"""
+
+# Chave do advisory lock: com vários workers só um consolida por vez
+_LOCK_CONSOLIDACAO = 7_420_001
+
+
+async def consolidar(db: AsyncSession) -> bool:
+    """Soma os deltas pendentes nos resumos. Devolve False se outro worker já está fazendo isso."""
+    conseguiu = (
+        await db.execute(text("SELECT pg_try_advisory_xact_lock(:k)"), {"k": _LOCK_CONSOLIDACAO})
+    ).scalar()
+    if not conseguiu:
+        return False
+
+    await db.execute(text(_CONSOLIDAR_APLICACOES))
+    await db.execute(text(_CONSOLIDAR_ESTOQUE))
+    return True
+
+
+async def loop_consolidacao(session_factory, intervalo: float = config.RESUMOS_INTERVALO_S):
+    """Tarefa de fundo iniciada no lifespan do app."""
+    while True:
+        await asyncio.sleep(intervalo)
+        try:
+            async with session_factory() as db:
+                await consolidar(db)
+                await db.commit()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Falha ao consolidar resumos do dashboard")
+
+
+async def resumo_dashboard(db: AsyncSession) -> dict:
+    hoje = datetime.date.today()
+    agora = datetime.datetime.now()
+    inicio_historico = hoje - datetime.timedelta(days=DIAS_HISTORICO - 1)
+
+    estoque = (await db.execute(text("""
+        SELECT e.vacina_id, v.nome, e.doses
+        FROM (
+            SELECT vacina_id, sum(doses) AS doses FROM (
+                SELECT vacina_id, doses FROM resumo_estoque_vacina
+                UNION ALL
+                SELECT vacina_id, doses FROM resumo_estoque_delta
+            ) t GROUP BY vacina_id
+        ) e
+        JOIN vacina v ON v.codigo_vacina = e.vacina_id
+        WHERE e.doses > 0
+        ORDER BY e.doses DESC
+    """))).mappings().all()
+
+    por_vacina = (await db.execute(text("""
+        SELECT a.vacina_id, v.nome, a.total
+        FROM (
+            SELECT vacina_id, sum(total) AS total FROM (
+                SELECT vacina_id, total FROM resumo_aplicacao_vacina
+                UNION ALL
+                SELECT vacina_id, qtd FROM resumo_aplicacao_delta
+            ) t GROUP BY vacina_id
+        ) a
+        JOIN vacina v ON v.codigo_vacina = a.vacina_id
+        WHERE a.total > 0
+        ORDER BY a.total DESC
+    """))).mappings().all()
+
+    por_dia = (await db.execute(text("""
+        SELECT dia, sum(total) AS total FROM (
+            SELECT dia, total FROM resumo_aplicacao_dia WHERE dia >= :inicio
+            UNION ALL
+            SELECT dia, qtd FROM resumo_aplicacao_delta WHERE dia >= :inicio
+        ) t GROUP BY dia
+    """), {"inicio": inicio_historico})).all()
+    totais_dia = {dia: total for dia, total in por_dia}
+
+    contagens = (await db.execute(text("""
+        SELECT
+            (SELECT count(*) FROM campanha
+              WHERE data_inicio <= :agora AND data_fim >= :agora) AS campanhas_ativas,
+            (SELECT count(*) FROM lote
+              WHERE validade > :agora AND validade <= :limite AND quantidade > 0) AS lotes_a_vencer
+    """), {
+        "agora": agora,
+        "limite": agora + datetime.timedelta(days=DIAS_PROXIMO_VENCIMENTO),
+    })).one()
+
+    dias = [inicio_historico + datetime.timedelta(days=i) for i in range(DIAS_HISTORICO)]
+
+    return {
+        "doses_disponiveis": sum(e["doses"] for e in estoque),
+        "campanhas_ativas": contagens.campanhas_ativas,
+        "aplicacoes_hoje": totais_dia.get(hoje, 0),
+        "lotes_proximos_vencimento": contagens.lotes_a_vencer,
+        "aplicacoes_por_vacina": por_vacina,
+        "estoque_por_vacina": estoque,
+        "aplicacoes_por_dia": [{"dia": dia, "total": totais_dia.get(dia, 0)} for dia in dias],
+    }
@@ -0,0 +1,56 @@
+# Roteamento de sessões entre primária e réplica de leitura.
+#
+# Os GETs de users, ubs e vacinas pedem `get_db_leitura` em vez de
+# `get_db`: a sessão vem da réplica (DATABASE_REPLICA_URL) e as rotas que
+# escrevem continuam na primária. Sem réplica configurada as duas
+# dependências dão a mesma sessão.
+#
+# Ler o que acabou de escrever: toda resposta de sucesso a um método que
+# escreve (POST, PUT, PATCH, DELETE) leva o cookie `ultima_escrita` com o
+# horário, valendo LEITURA_APOS_ESCRITA_S segundos. Enquanto ele vale, os
+# GETs daquele cliente também vão para a primária, então quem cria um
+# paciente e abre a ficha em seguida não esbarra no atraso da réplica. O
+# estado fica no cliente, então vale com qualquer número de workers.
+#
+# Os outros clientes podem ver a réplica alguns instantes atrasada. Vale
+# lembrar nas listas com cache (cache.py): uma leitura da réplica logo
+# depois da invalidação pode guardar a página antiga por até CACHE_TTL_S.
+import math
+import time
+
+from fastapi import Request
+
+import config
+from database import AsyncSessionLeitura, AsyncSessionLocal
+
+COOKIE_ESCRITA = "ultima_escrita"
+_METODOS_LEITURA = {"GET", "HEAD", "OPTIONS"}
+
+
+def ler_da_primaria(request: Request) -> bool:
+    """True se o cliente escreveu há menos de LEITURA_APOS_ESCRITA_S segundos."""
+    try:
+        ultima = float(request.cookies.get(COOKIE_ESCRITA, ""))
+    except ValueError:
+        return False
+    return time.time() - ultima < config.LEITURA_APOS_ESCRITA_S
+
+
+async def get_db_leitura(request: Request):
+    fabrica = AsyncSessionLocal if ler_da_primaria(request) else AsyncSessionLeitura
+    async with fabrica() as db:
+        yield db
+
+
+async def marcar_escrita(request: Request, call_next):
+    """Middleware HTTP (ver main.py): grava o cookie depois de uma escrita bem-sucedida."""
+    response = await call_next(request)
+    if request.method not in _METODOS_LEITURA and response.status_code < 400:
+        response.set_cookie(
+            COOKIE_ESCRITA,
+            f"{time.time():.3f}",
+            max_age=math.ceil(config.LEITURA_APOS_ESCRITA_S),
+            httponly=True,
+            samesite="lax",
+        )
+    return response
@@ -1,18 +1,83 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import SessionLocal
+import datetime
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db
+import caderneta
+import carregamento
+import exportacao
+import registro
+import seguranca
 import schemas 
 import model 
+from model import RoleEnum
+from paginacao import LIMITE_MAXIMO, LIMITE_PADRAO
 
 router = APIRouter(
     prefix="/aplicacoes",
     tags=["Aplicacoes"]
 )
 
-def get_db():
-    db = SessionLocal()
-    try: 
-        yield db
-    finally:
-        db.close()
+# registrar e consultar aplicações é coisa da equipe de saúde; a checagem
+# só lê o token, sem ir ao banco
+equipe = seguranca.exigir_role(RoleEnum.PROFISSIONAL, RoleEnum.ADMIN, RoleEnum.GESTOR)
+
+
+@router.post("/", response_model=schemas.AplicacaoResponse, status_code=201, dependencies=[Depends(equipe)])
+async def registrar_aplicacao(aplicacao: schemas.AplicacaoCreate, db: AsyncSession = Depends(get_db)):
+    obj = await registro.registrar_aplicacao(db, aplicacao)
+    return await db.get(model.Aplicacao, obj.id_aplicacao, options=carregamento.APLICACAO, populate_existing=True)
+
+
+@router.post("/batch", response_model=schemas.AplicacaoLoteResponse, dependencies=[Depends(equipe)])
+async def registrar_aplicacoes_em_lote(
+    aplicacoes: list[schemas.AplicacaoCreate], db: AsyncSession = Depends(get_db)
+):
+    if not aplicacoes:
+        raise HTTPException(status_code=400, detail="Lote vazio")
+    if len(aplicacoes) > LIMITE_MAXIMO:
+        raise HTTPException(status_code=413, detail=f"Máximo de {LIMITE_MAXIMO} aplicações por lote")
+    return await registro.registrar_lote(db, aplicacoes)
+
+
+@router.get("/proximas-doses", response_model=list[schemas.ProximaDoseResponse], dependencies=[Depends(equipe)])
+async def listar_proximas_doses(
+    inicio: Optional[datetime.date] = None,
+    fim: Optional[datetime.date] = None,
+    vacina_id: Optional[int] = None,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    db: AsyncSession = Depends(get_db)
+):
+    # padrão: de hoje até daqui a 7 dias
+    inicio = inicio or datetime.date.today()
+    fim = fim or inicio + datetime.timedelta(days=7)
+    if fim < inicio:
+        raise HTTPException(status_code=400, detail="fim deve ser depois de inicio")
+    return await caderneta.doses_previstas(db, inicio, fim, vacina_id, limit)
+
+
+# extrato com dados pessoais dos pacientes: só gestão
+@router.get("/export", dependencies=[Depends(seguranca.exigir_role(RoleEnum.ADMIN, RoleEnum.GESTOR))])
+async def exportar_aplicacoes(
+    inicio: datetime.date,
+    fim: datetime.date,
+    formato: Literal["csv", "parquet"] = "csv",
+):
+    # fim inclusivo, como nos relatórios
+    if fim < inicio:
+        raise HTTPException(status_code=400, detail="fim deve ser igual ou posterior a inicio")
+    try:
+        exportacao.verificar_formato(formato)
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
 
+    inicio_dt = datetime.datetime.combine(inicio, datetime.time.min)
+    fim_dt = datetime.datetime.combine(fim + datetime.timedelta(days=1), datetime.time.min)
+    gerar = exportacao.gerar_csv if formato == "csv" else exportacao.gerar_parquet
+    return StreamingResponse(
+        gerar(inicio_dt, fim_dt),
+        media_type=exportacao.MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f'attachment; filename="aplicacoes_{inicio}_{fim}.{formato}"'},
+    )
@@ -1,14 +1,52 @@
+import datetime
+
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import SessionLocal
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db
+import model
+import schemas
+import seguranca
+from senhas import eh_hash
+
+router = APIRouter(
+    prefix="/auth",
+    tags=["Auth"]
+)
+
+
+@router.post("/login", response_model=schemas.TokenResponse)
+async def login(credenciais: schemas.LoginRequest, db: AsyncSession = Depends(get_db)):
+    usuario = (await db.execute(
+        select(model.Usuario.id, model.Usuario.senha, model.Usuario.role)
+        .where(model.Usuario.email == credenciais.email)
+    )).first()
+
+    # a conexão volta para o pool antes do hash, que é a parte demorada
+    await db.rollback()
+
+    guardado = usuario.senha if usuario else None
+    if not await seguranca.verificar_senha(credenciais.senha, guardado):
+        raise HTTPException(status_code=401, detail="E-mail ou senha inválidos")
 
-router = APIRouter()
+    if not eh_hash(guardado):
+        # senha legada em texto puro: grava o hash no primeiro login
+        await db.execute(
+            update(model.Usuario)
+            .where(model.Usuario.id == usuario.id)
+            .values(senha=await seguranca.hash_senha(credenciais.senha))
+        )
+        await db.commit()
 
-def get_db():
-    db = SessionLocal()
-    try: 
-        yield db
-    finally:
-        db.close()
+    token, expira = seguranca.emitir_token(usuario.id, usuario.role)
+    return {
+        "access_token": token,
+        "expira_em": datetime.datetime.fromtimestamp(expira),
+        "usuario_id": usuario.id,
+        "role": usuario.role.value,
+    }
 
 
+@router.get("/me", response_model=schemas.TokenUsuario)
+async def quem_sou_eu(usuario: seguranca.UsuarioToken = Depends(seguranca.usuario_atual)):
+    return usuario
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_db
+from resumos import resumo_dashboard
+import schemas
+
+router = APIRouter(
+    prefix="/dashboard",
+    tags=["Dashboard"]
+)
+
+@router.get("/resumo", response_model=schemas.DashboardResumo)
+async def obter_resumo(db: AsyncSession = Depends(get_db)):
+    return await resumo_dashboard(db)
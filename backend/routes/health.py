@@ -0,0 +1,51 @@
+import time
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import consultas_lentas
+from database import get_db, status_pools
+from model import RoleEnum
+from seguranca import exigir_role
+import schemas
+
+router = APIRouter(
+    prefix="/health",
+    tags=["Health"]
+)
+
+@router.get("/db", response_model=schemas.HealthDbResponse)
+async def health_db(db: AsyncSession = Depends(get_db)):
+    # o status dos pools é lido antes do SELECT para não contar a própria requisição
+    pools = status_pools()
+
+    inicio = time.perf_counter()
+    try:
+        await db.execute(text("SELECT 1"))
+    except Exception:
+        return {"ok": False, "pools": pools}
+
+    return {
+        "ok": True,
+        "latencia_ms": round((time.perf_counter() - inicio) * 1000, 3),
+        "pools": pools,
+    }
+
+# Consultas acima de SQL_LENTO_MS neste worker (ver consultas_lentas.py)
+@router.get(
+    "/consultas-lentas",
+    response_model=list[schemas.ConsultaLenta],
+    dependencies=[Depends(exigir_role(RoleEnum.ADMIN))],
+)
+async def listar_consultas_lentas(
+    ordem: Literal["max", "total", "media", "execucoes"] = "max",
+    limit: int = Query(20, ge=1, le=200),
+):
+    return consultas_lentas.listar(ordem, limit)
+
+@router.delete("/consultas-lentas", dependencies=[Depends(exigir_role(RoleEnum.ADMIN))])
+async def limpar_consultas_lentas():
+    consultas_lentas.limpar()
+    return {"detail": "Registro de consultas lentas limpo"}
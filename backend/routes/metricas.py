@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from metricas import CONTENT_TYPE, registro
+
+router = APIRouter(tags=["Health"])
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registro.exportar(), media_type=CONTENT_TYPE)
@@ -0,0 +1,63 @@
+from datetime import date, datetime, time, timedelta
+from typing import Literal, Optional
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cobertura import cobertura
+from database import get_db
+from model import RoleEnum
+from relatorios import relatorio_aplicacoes
+import schemas
+import seguranca
+
+router = APIRouter(
+    prefix="/relatorios",
+    tags=["Relatórios"]
+)
+
+# os dois relatórios trazem agregados por unidade: só para a gestão
+gestao = seguranca.exigir_role(RoleEnum.ADMIN, RoleEnum.GESTOR)
+
+@router.get("/aplicacoes", response_model=schemas.RelatorioResponse, dependencies=[Depends(gestao)])
+async def relatorio_de_aplicacoes(
+    inicio: date,
+    fim: date,
+    granularidade: Literal["dia", "semana", "mes", "ano"] = "mes",
+    agrupar: Literal["total", "vacina", "unidade"] = "total",
+    vacina_id: Optional[int] = None,
+    unidade_id: Optional[uuid.UUID] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    # fim é inclusivo para quem chama; internamente o intervalo é [inicio, fim + 1 dia)
+    inicio_dt = datetime.combine(inicio, time.min)
+    fim_dt = datetime.combine(fim + timedelta(days=1), time.min)
+    if fim_dt <= inicio_dt:
+        raise HTTPException(status_code=400, detail="fim deve ser igual ou posterior a inicio")
+
+    linhas = await relatorio_aplicacoes(
+        db, inicio_dt, fim_dt, granularidade, agrupar, vacina_id, unidade_id
+    )
+    return {
+        "inicio": inicio_dt,
+        "fim": fim_dt,
+        "granularidade": granularidade,
+        "agrupar": agrupar,
+        "linhas": linhas,
+    }
+
+
+@router.get(
+    "/cobertura",
+    response_model=schemas.CoberturaResponse,
+    dependencies=[Depends(gestao)],
+)
+async def cobertura_vacinal(
+    agrupar: Literal["vacina", "unidade", "campanha"] = "vacina",
+    vacina_id: Optional[int] = None,
+    unidade_id: Optional[uuid.UUID] = None,
+    campanha_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    return await cobertura(db, agrupar, vacina_id, unidade_id, campanha_id)
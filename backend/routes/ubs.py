@@ -1,244 +1,307 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
-
-import model, schemas
-from database import SessionLocal
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import Literal, Optional
+import uuid
+
+import alocacao, busca, cache, carregamento, model, schemas, seguranca, vencimentos
+from database import get_db
+from model import RoleEnum
+from roteamento import get_db_leitura
+from paginacao import LIMITE_MAXIMO, LIMITE_PADRAO, listar, paginar, stream_ndjson
+from serializacao import projecao
 
 router = APIRouter(
     prefix="/ubs",
     tags=["UBS"]
 )
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# escritas: unidades só por admin; estoques, lotes e fornecedores também por gestor
+so_admin = seguranca.exigir_role(RoleEnum.ADMIN)
+gestao = seguranca.exigir_role(RoleEnum.ADMIN, RoleEnum.GESTOR)
 
 # unidade de saude
 
-@router.post("/unidades", response_model=schemas.UnidadeResponse)
-def criar_unidade(unidade: schemas.UnidadeCreate, db: Session = Depends(get_db)):
+@router.post("/unidades", response_model=schemas.UnidadeResponse, dependencies=[Depends(so_admin)])
+async def criar_unidade(unidade: schemas.UnidadeCreate, db: AsyncSession = Depends(get_db)):
     obj = model.UnidadeDeSaude(**unidade.model_dump())
     db.add(obj)
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
+    await cache.invalidar("unidades")
+    await db.refresh(obj)
     return obj
 
-@router.get("/unidades", response_model=list[schemas.UnidadeResponse])
-def listar_unidades(db: Session = Depends(get_db)):
-    return db.query(model.UnidadeDeSaude).all()
-
-@router.get("/unidades/busca", response_model=list[schemas.BuscaUnidade])
-def fuzzysearch_unidades(termo: str = Query(..., min_length=3), db: Session = Depends(get_db)):
-    results = (
-        db.query(
-            model.UnidadeDeSaude.id,
-            model.UnidadeDeSaude.nome_unidade
-            )
-        .filter(
-            or_(
-                model.UnidadeDeSaude.nome_unidade.self_group().ilike(f"%{termo}%"),
-                model.UnidadeDeSaude.nome_unidade.op("<%", is_comparison=True)(termo)
-            )
-            
-        )
-        .order_by(func.similarity(model.UnidadeDeSaude.nome_unidade, termo).desc())
-        .limit(10)
-        .all()
+@router.get("/unidades", response_model=schemas.Pagina[schemas.UnidadeResponse])
+async def listar_unidades(
+    request: Request,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    after: Optional[uuid.UUID] = None,
+    formato: Literal["json", "ndjson"] = "json",
+    db: AsyncSession = Depends(get_db_leitura)
+):
+    stmt, chave = projecao(model.UnidadeDeSaude, schemas.UnidadeResponse), model.UnidadeDeSaude.id
+    if formato == "ndjson":
+        return stream_ndjson(stmt, schemas.UnidadeResponse, chave, after, bind=db.bind)
+    return await cache.resposta_em_cache(
+        request, "unidades", f"{limit}:{after}", schemas.Pagina[schemas.UnidadeResponse],
+        lambda: paginar(db, stmt, chave, limit, after)
     )
 
-    return results
+@router.get("/unidades/busca", response_model=list[schemas.BuscaUnidade])
+async def fuzzysearch_unidades(termo: str = Query(..., min_length=3), db: AsyncSession = Depends(get_db_leitura)):
+    return await busca.buscar_unidades(db, termo)
 
 
 @router.get("/unidades/{nome_unidade}", response_model=schemas.UnidadeResponse)
-def buscar_unidade(nome_unidade: str, db: Session = Depends(get_db)):
-    obj = db.query(model.UnidadeDeSaude).get(nome_unidade)
+async def buscar_unidade(nome_unidade: uuid.UUID, db: AsyncSession = Depends(get_db_leitura)):
+    obj = await db.get(model.UnidadeDeSaude, nome_unidade)
     if not obj:
         raise HTTPException(status_code=404, detail="Unidade não encontrada")
     return obj
 
-@router.put("/unidades/{nome_unidade}", response_model=schemas.UnidadeResponse)
-def atualizar_unidade(
-    nome_unidade: str,
+@router.put("/unidades/{nome_unidade}", response_model=schemas.UnidadeResponse, dependencies=[Depends(so_admin)])
+async def atualizar_unidade(
+    nome_unidade: uuid.UUID,
     dados: schemas.UnidadeCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    obj = db.query(model.UnidadeDeSaude).get(nome_unidade)
+    obj = await db.get(model.UnidadeDeSaude, nome_unidade)
     if not obj:
         raise HTTPException(status_code=404, detail="Unidade não encontrada")
 
     for campo, valor in dados.model_dump().items():
         setattr(obj, campo, valor)
 
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
+    await cache.invalidar("unidades")
+    await db.refresh(obj)
     return obj
 
-@router.delete("/unidades/{nome_unidade}")
-def deletar_unidade(nome_unidade: str, db: Session = Depends(get_db)):
-    obj = db.query(model.UnidadeDeSaude).get(nome_unidade)
+@router.delete("/unidades/{nome_unidade}", dependencies=[Depends(so_admin)])
+async def deletar_unidade(nome_unidade: uuid.UUID, db: AsyncSession = Depends(get_db)):
+    obj = await db.get(model.UnidadeDeSaude, nome_unidade)
     if not obj:
         raise HTTPException(status_code=404, detail="Unidade não encontrada")
 
-    db.delete(obj)
-    db.commit()
+    await db.delete(obj)
+    await db.commit()
+    await cache.invalidar("unidades")
     return {"detail": "Unidade removida com sucesso"}
 
 # estoque
 
-@router.post("/estoques", response_model=schemas.EstoqueResponse)
-def criar_estoque(estoque: schemas.EstoqueCreate, db: Session = Depends(get_db)):
-    unidade = db.query(model.UnidadeDeSaude).get(estoque.nome_unidade)
+@router.post("/estoques", response_model=schemas.EstoqueResponse, dependencies=[Depends(gestao)])
+async def criar_estoque(estoque: schemas.EstoqueCreate, db: AsyncSession = Depends(get_db)):
+    unidade = await db.get(model.UnidadeDeSaude, estoque.nome_unidade)
     if not unidade:
         raise HTTPException(status_code=404, detail="Unidade não encontrada")
 
     obj = model.Estoque(**estoque.model_dump())
     db.add(obj)
-    db.commit()
-    db.refresh(obj)
-    return obj
+    await db.commit()
+    # recarrega com unidade/gestor; lazy load não funciona na sessão async
+    return await db.get(
+        model.Estoque, obj.id_estoque, options=carregamento.ESTOQUE, populate_existing=True
+    )
 
-@router.get("/estoques", response_model=list[schemas.EstoqueResponse])
-def listar_estoques(db: Session = Depends(get_db)):
-    return db.query(model.Estoque).all()
+@router.get("/estoques", response_model=schemas.Pagina[schemas.EstoqueResponse])
+async def listar_estoques(
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    after: Optional[int] = None,
+    formato: Literal["json", "ndjson"] = "json",
+    db: AsyncSession = Depends(get_db_leitura)
+):
+    return await listar(
+        db, select(model.Estoque).options(*carregamento.ESTOQUE), schemas.EstoqueResponse,
+        model.Estoque.id_estoque, limit, after, formato
+    )
 
 @router.get("/estoques/{estoque_id}", response_model=schemas.EstoqueResponse)
-def buscar_estoque(estoque_id: int, db: Session = Depends(get_db)):
-    obj = db.query(model.Estoque).get(estoque_id)
+async def buscar_estoque(estoque_id: int, db: AsyncSession = Depends(get_db_leitura)):
+    obj = await db.get(model.Estoque, estoque_id, options=carregamento.ESTOQUE)
     if not obj:
         raise HTTPException(status_code=404, detail="Estoque não encontrado")
     return obj
 
-@router.put("/estoques/{estoque_id}", response_model=schemas.EstoqueResponse)
-def atualizar_estoque(
+@router.put("/estoques/{estoque_id}", response_model=schemas.EstoqueResponse, dependencies=[Depends(gestao)])
+async def atualizar_estoque(
     estoque_id: int,
     dados: schemas.EstoqueCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    obj = db.query(model.Estoque).get(estoque_id)
+    obj = await db.get(model.Estoque, estoque_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Estoque não encontrado")
 
     for campo, valor in dados.model_dump().items():
         setattr(obj, campo, valor)
 
-    db.commit()
-    db.refresh(obj)
-    return obj
+    await db.commit()
+    # recarrega com unidade/gestor; lazy load não funciona na sessão async
+    return await db.get(
+        model.Estoque, obj.id_estoque, options=carregamento.ESTOQUE, populate_existing=True
+    )
 
-@router.delete("/estoques/{estoque_id}")
-def deletar_estoque(estoque_id: int, db: Session = Depends(get_db)):
-    obj = db.query(model.Estoque).get(estoque_id)
+@router.delete("/estoques/{estoque_id}", dependencies=[Depends(gestao)])
+async def deletar_estoque(estoque_id: int, db: AsyncSession = Depends(get_db)):
+    obj = await db.get(model.Estoque, estoque_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Estoque não encontrado")
 
-    db.delete(obj)
-    db.commit()
+    await db.delete(obj)
+    await db.commit()
     return {"detail": "Estoque removido com sucesso"}
 
 # lote
 
-@router.post("/lotes", response_model=schemas.LoteResponse)
-def criar_lote(lote: schemas.LoteCreate, db: Session = Depends(get_db)):
-    estoque = db.query(model.Estoque).get(lote.estoque_id)
+@router.post("/lotes", response_model=schemas.LoteResponse, dependencies=[Depends(gestao)])
+async def criar_lote(lote: schemas.LoteCreate, db: AsyncSession = Depends(get_db)):
+    estoque = await db.get(model.Estoque, lote.estoque_id)
     if not estoque:
         raise HTTPException(status_code=404, detail="Estoque não encontrado")
 
     obj = model.Lote(**lote.model_dump())
     db.add(obj)
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
+    # recarrega com vacina/fabricante; lazy load não funciona na sessão async
+    return await db.get(
+        model.Lote, obj.id_lote, options=carregamento.LOTE, populate_existing=True
+    )
+
+@router.get("/lotes", response_model=schemas.Pagina[schemas.LoteResponse])
+async def listar_lotes(
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    after: Optional[int] = None,
+    formato: Literal["json", "ndjson"] = "json",
+    db: AsyncSession = Depends(get_db_leitura)
+):
+    return await listar(
+        db, select(model.Lote).options(*carregamento.LOTE), schemas.LoteResponse,
+        model.Lote.id_lote, limit, after, formato
+    )
+
+@router.get("/lotes/fefo", response_model=schemas.LoteResponse)
+async def alocar_lote(
+    vacina_id: int,
+    estoque_id: Optional[int] = None,
+    unidade_id: Optional[uuid.UUID] = None,
+    db: AsyncSession = Depends(get_db_leitura)
+):
+    if estoque_id is None and unidade_id is None:
+        raise HTTPException(status_code=400, detail="Informe estoque_id ou unidade_id")
+
+    obj = await alocacao.lote_fefo(db, vacina_id, estoque_id, unidade_id, options=carregamento.LOTE)
+    if not obj:
+        raise HTTPException(status_code=404, detail="Nenhum lote válido com doses para esta vacina")
     return obj
 
-@router.get("/lotes", response_model=list[schemas.LoteResponse])
-def listar_lotes(db: Session = Depends(get_db)):
-    return db.query(model.Lote).all()
+@router.get("/lotes/vencimento", response_model=schemas.VencimentoResponse)
+async def vencimento_lotes(
+    unidade_id: Optional[uuid.UUID] = None,
+    vacina_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db_leitura)
+):
+    return await vencimentos.resumo_vencimento(db, unidade_id, vacina_id)
 
 @router.get("/lotes/{lote_id}", response_model=schemas.LoteResponse)
-def buscar_lote(lote_id: int, db: Session = Depends(get_db)):
-    obj = db.query(model.Lote).get(lote_id)
+async def buscar_lote(lote_id: int, db: AsyncSession = Depends(get_db_leitura)):
+    obj = await db.get(model.Lote, lote_id, options=carregamento.LOTE)
     if not obj:
         raise HTTPException(status_code=404, detail="Lote não encontrado")
     return obj
 
-@router.put("/lotes/{lote_id}", response_model=schemas.LoteResponse)
-def atualizar_lote(
+@router.put("/lotes/{lote_id}", response_model=schemas.LoteResponse, dependencies=[Depends(gestao)])
+async def atualizar_lote(
     lote_id: int,
     dados: schemas.LoteCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    obj = db.query(model.Lote).get(lote_id)
+    obj = await db.get(model.Lote, lote_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Lote não encontrado")
 
     for campo, valor in dados.model_dump().items():
         setattr(obj, campo, valor)
 
-    db.commit()
-    db.refresh(obj)
-    return obj
+    await db.commit()
+    # recarrega com vacina/fabricante; lazy load não funciona na sessão async
+    return await db.get(
+        model.Lote, obj.id_lote, options=carregamento.LOTE, populate_existing=True
+    )
 
-@router.delete("/lotes/{lote_id}")
-def deletar_lote(lote_id: int, db: Session = Depends(get_db)):
-    obj = db.query(model.Lote).get(lote_id)
+@router.delete("/lotes/{lote_id}", dependencies=[Depends(gestao)])
+async def deletar_lote(lote_id: int, db: AsyncSession = Depends(get_db)):
+    obj = await db.get(model.Lote, lote_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Lote não encontrado")
 
-    db.delete(obj)
-    db.commit()
+    await db.delete(obj)
+    await db.commit()
     return {"detail": "Lote removido com sucesso"}
 
 # fornecedor
 
-@router.post("/fornecedores", response_model=schemas.FornecedorResponse)
-def criar_fornecedor(fornecedor: schemas.FornecedorCreate, db: Session = Depends(get_db)):
+@router.post("/fornecedores", response_model=schemas.FornecedorResponse, dependencies=[Depends(gestao)])
+async def criar_fornecedor(fornecedor: schemas.FornecedorCreate, db: AsyncSession = Depends(get_db)):
     obj = model.Fornecedor(
         cnpj_fornecedor=fornecedor.cnpj,
         nome=fornecedor.nome,
         telefone=fornecedor.telefone
     )
     db.add(obj)
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
+    await cache.invalidar("fornecedores")
+    await db.refresh(obj)
     return obj
 
-@router.get("/fornecedores", response_model=list[schemas.FornecedorResponse])
-def listar_fornecedores(db: Session = Depends(get_db)):
-    return db.query(model.Fornecedor).all()
+@router.get("/fornecedores", response_model=schemas.Pagina[schemas.FornecedorResponse])
+async def listar_fornecedores(
+    request: Request,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    after: Optional[str] = None,
+    formato: Literal["json", "ndjson"] = "json",
+    db: AsyncSession = Depends(get_db_leitura)
+):
+    stmt, chave = projecao(model.Fornecedor, schemas.FornecedorResponse), model.Fornecedor.cnpj_fornecedor
+    if formato == "ndjson":
+        return stream_ndjson(stmt, schemas.FornecedorResponse, chave, after, bind=db.bind)
+    return await cache.resposta_em_cache(
+        request, "fornecedores", f"{limit}:{after}", schemas.Pagina[schemas.FornecedorResponse],
+        lambda: paginar(db, stmt, chave, limit, after)
+    )
 
 @router.get("/fornecedores/{cnpj}", response_model=schemas.FornecedorResponse)
-def buscar_fornecedor(cnpj: str, db: Session = Depends(get_db)):
-    obj = db.query(model.Fornecedor).get(cnpj)
+async def buscar_fornecedor(cnpj: str, db: AsyncSession = Depends(get_db_leitura)):
+    obj = await db.get(model.Fornecedor, cnpj)
     if not obj:
         raise HTTPException(status_code=404, detail="Fornecedor não encontrado")
     return obj
 
-@router.put("/fornecedores/{cnpj}", response_model=schemas.FornecedorResponse)
-def atualizar_fornecedor(
+@router.put("/fornecedores/{cnpj}", response_model=schemas.FornecedorResponse, dependencies=[Depends(gestao)])
+async def atualizar_fornecedor(
     cnpj: str,
     dados: schemas.FornecedorCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    obj = db.query(model.Fornecedor).get(cnpj)
+    obj = await db.get(model.Fornecedor, cnpj)
     if not obj:
         raise HTTPException(status_code=404, detail="Fornecedor não encontrado")
 
     obj.nome = dados.nome
     obj.telefone = dados.telefone
 
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
+    await cache.invalidar("fornecedores")
+    await db.refresh(obj)
     return obj
 
-@router.delete("/fornecedores/{cnpj}")
-def deletar_fornecedor(cnpj: str, db: Session = Depends(get_db)):
-    obj = db.query(model.Fornecedor).get(cnpj)
+@router.delete("/fornecedores/{cnpj}", dependencies=[Depends(gestao)])
+async def deletar_fornecedor(cnpj: str, db: AsyncSession = Depends(get_db)):
+    obj = await db.get(model.Fornecedor, cnpj)
     if not obj:
         raise HTTPException(status_code=404, detail="Fornecedor não encontrado")
 
-    db.delete(obj)
-    db.commit()
+    await db.delete(obj)
+    await db.commit()
+    await cache.invalidar("fornecedores")
     return {"detail": "Fornecedor removido com sucesso"}
\ No newline at end of file
@@ -1,310 +1,305 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, or_, text
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import List, Literal, Optional
 import uuid
-from model import Usuario, RoleEnum
+from model import RoleEnum
 
-import model, schemas
-from database import SessionLocal
+import busca, caderneta, model, schemas, seguranca
+from database import get_db
+from roteamento import get_db_leitura
+from paginacao import LIMITE_MAXIMO, LIMITE_PADRAO, listar, paginar_composto
+from importacao import importar_pacientes
+from serializacao import projecao, resposta
 
 router = APIRouter(
     prefix="/users",
     tags=["Usuários"]
 )
 
-def get_db():
-    db = SessionLocal()
+# escritas: contas de admin e gestor só por admin; o resto também por gestor.
+# Sem isso qualquer um criava um admin e fazia login com ele.
+so_admin = seguranca.exigir_role(RoleEnum.ADMIN)
+gestao = seguranca.exigir_role(RoleEnum.ADMIN, RoleEnum.GESTOR)
+
+# diretório (todas as roles)
+
+@router.get("", response_model=schemas.Pagina[schemas.UsuarioResponse])
+async def listar_usuarios(
+    role: Optional[List[RoleEnum]] = Query(None),
+    ordem: Literal["asc", "desc"] = "asc",
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    after: Optional[str] = None,
+    db: AsyncSession = Depends(get_db_leitura)
+):
+    # Só a tabela usuario: o response não usa colunas das tabelas filhas.
+    # Sem JOIN e projetando só as colunas do response, a página é um
+    # index-only scan em ordem:
+    #   - uma role: faixa do idx_usuario_role_nome, só linhas daquela role;
+    #   - nenhuma ou várias: idx_usuario_nome, descartando as de outras
+    #     roles até encher a página. Com várias roles raras (ex.: ADMIN e
+    #     GESTOR entre milhões de pacientes) isso lê muitas entradas por
+    #     página; nesse caso é melhor uma requisição por role.
+    # bench/endpoints.py mede os três casos (users, users_role, users_roles).
+    u = model.Usuario
+    stmt = projecao(u, schemas.UsuarioResponse)
+    if role:
+        stmt = stmt.where(u.role.in_(role))
     try:
-        yield db
-    finally:
-        db.close()
+        pagina = await paginar_composto(db, stmt, (u.unome, u.pnome, u.id), limit, after, desc=ordem == "desc")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return resposta(schemas.Pagina[schemas.UsuarioResponse], pagina)
 
 # paciente
 
-@router.post("/pacientes", response_model=schemas.PacienteResponse)
-def criar_paciente(paciente: schemas.PacienteCreate, db: Session = Depends(get_db)):
-    obj = model.Paciente(**paciente.model_dump())
+@router.post("/pacientes", response_model=schemas.PacienteResponse, dependencies=[Depends(gestao)])
+async def criar_paciente(paciente: schemas.PacienteCreate, db: AsyncSession = Depends(get_db)):
+    obj = model.Paciente(**await seguranca.dados_com_hash(paciente))
     db.add(obj)
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
+    await db.refresh(obj)
     return obj
 
-@router.get("/pacientes", response_model=list[schemas.PacienteResponse])
-def listar_pacientes(db: Session = Depends(get_db)):
-    return db.query(model.Paciente).all()
-
-@router.get("/pacientes/busca", response_model=list[schemas.BaseUsuarioBuscaResponse])
-def buscar_pacientes(termo: str = Query(..., min_length=3), db: Session = Depends(get_db)):
-    nome_completo = model.Paciente.pnome + " " + model.Paciente.unome
-    
-    results = (
-        db.query(
-            model.Usuario.id,
-            nome_completo.label("nome")
-            )
-        .filter(
-            Usuario.role == RoleEnum.PACIENTE,
-            or_(
-                nome_completo.self_group().ilike(f"%{termo}%"),
-                nome_completo.self_group().op("<%", is_comparison=True)(termo)
-            ),
-            
-        )
-        .order_by(func.similarity(nome_completo, termo).desc())
-        .limit(10)
-        .all()
+@router.post("/pacientes/import", response_model=schemas.ImportacaoResponse, dependencies=[Depends(gestao)])
+async def importar_csv_pacientes(arquivo: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
+    try:
+        resultado = await importar_pacientes(db, arquivo.file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await db.commit()
+    return resultado
+
+@router.get("/pacientes", response_model=schemas.Pagina[schemas.PacienteResponse])
+async def listar_pacientes(
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    after: Optional[uuid.UUID] = None,
+    formato: Literal["json", "ndjson"] = "json",
+    db: AsyncSession = Depends(get_db_leitura)
+):
+    return await listar(
+        db, projecao(model.Paciente, schemas.PacienteResponse), schemas.PacienteResponse,
+        model.Paciente.id, limit, after, formato
     )
 
-    return results
-
-@router.get("profissionais/busca")
-def fuzzysearch_profissional(termo: str = Query(..., min_length=3), db: Session = Depends(get_db)):
-    nome_completo = model.Profissional.pnome + " " + model.Profissional.unome
-    
-    results = (
-        db.query(
-            model.Usuario.id,
-            nome_completo.label("nome")
-            )
-        .filter(
-            Usuario.role == RoleEnum.PROFISSIONAL,
-            or_(
-                nome_completo.self_group().ilike(f"%{termo}%"),
-                nome_completo.self_group().op("<%", is_comparison=True)(termo)
-            ),
-            
-        )
-        .order_by(func.similarity(nome_completo, termo).desc())
-        .limit(10)
-        .all()
-    )
+@router.get("/pacientes/busca", response_model=list[schemas.BaseUsuarioBuscaResponse])
+async def buscar_pacientes(termo: str = Query(..., min_length=3), db: AsyncSession = Depends(get_db_leitura)):
+    return await busca.buscar_usuarios(db, RoleEnum.PACIENTE, termo)
 
-    return results
-
-@router.get("gestores/busca")
-def fuzzysearch_gestores(termo: str = Query(..., min_length=3), db: Session = Depends(get_db)):
-    nome_completo = model.Gestor.pnome + " " + model.Gestor.unome
-    
-    results = (
-        db.query(
-            model.Usuario.id,
-            nome_completo.label("nome")
-            )
-        .filter(
-            Usuario.role == RoleEnum.GESTOR,
-            or_(
-                nome_completo.self_group().ilike(f"%{termo}%"),
-                nome_completo.self_group().op("<%", is_comparison=True)(termo)
-            ),
-            
-        )
-        .order_by(func.similarity(nome_completo, termo).desc())
-        .limit(10)
-        .all()
-    )
+@router.get("/profissionais/busca", response_model=list[schemas.BaseUsuarioBuscaResponse])
+async def fuzzysearch_profissional(termo: str = Query(..., min_length=3), db: AsyncSession = Depends(get_db_leitura)):
+    return await busca.buscar_usuarios(db, RoleEnum.PROFISSIONAL, termo)
 
-    return results
-
-@router.get("admins/busca")
-def fuzzysearch_admin(termo: str = Query(..., min_length=3), db: Session = Depends(get_db)):
-    nome_completo = model.Admin.pnome + " " + model.Admin.unome
-
-    db.execute(text("SELECT set_limit(0.3);"))
-    
-    results = (
-        db.query(
-            model.Usuario.id,
-            nome_completo.label("nome")
-            )
-        .filter(
-            Usuario.role == RoleEnum.ADMIN,
-            or_(
-                nome_completo.self_group().ilike(f"%{termo}%"),
-                nome_completo.self_group().op("<%", is_comparison=True)(termo)
-            ),
-            
-        )
-        .order_by(func.similarity(nome_completo, termo).desc())
-        .limit(10)
-        .all()
-    )
+@router.get("/gestores/busca", response_model=list[schemas.BaseUsuarioBuscaResponse])
+async def fuzzysearch_gestores(termo: str = Query(..., min_length=3), db: AsyncSession = Depends(get_db_leitura)):
+    return await busca.buscar_usuarios(db, RoleEnum.GESTOR, termo)
 
-    return results
+@router.get("/admins/busca", response_model=list[schemas.BaseUsuarioBuscaResponse])
+async def fuzzysearch_admin(termo: str = Query(..., min_length=3), db: AsyncSession = Depends(get_db_leitura)):
+    return await busca.buscar_usuarios(db, RoleEnum.ADMIN, termo)
 
 @router.get("/pacientes/{paciente_id}", response_model=schemas.PacienteResponse)
-def buscar_paciente(paciente_id: uuid.UUID, db: Session = Depends(get_db)):
-    obj = db.query(model.Paciente).get(paciente_id)
+async def buscar_paciente(paciente_id: uuid.UUID, db: AsyncSession = Depends(get_db_leitura)):
+    obj = await db.get(model.Paciente, paciente_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Paciente não encontrado")
     return obj
 
-@router.put("/pacientes/{paciente_id}", response_model=schemas.PacienteResponse)
-def atualizar_paciente(
+@router.get("/pacientes/{paciente_id}/caderneta", response_model=schemas.Caderneta)
+async def caderneta_paciente(paciente_id: uuid.UUID, db: AsyncSession = Depends(get_db_leitura)):
+    return await caderneta.caderneta(db, paciente_id)
+
+@router.put("/pacientes/{paciente_id}", response_model=schemas.PacienteResponse, dependencies=[Depends(gestao)])
+async def atualizar_paciente(
     paciente_id: uuid.UUID,
     dados: schemas.UsuarioCreateCommon,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    obj = db.query(model.Paciente).get(paciente_id)
+    obj = await db.get(model.Paciente, paciente_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Paciente não encontrado")
 
-    for campo, valor in dados.model_dump().items():
+    for campo, valor in (await seguranca.dados_com_hash(dados)).items():
         setattr(obj, campo, valor)
 
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
+    await db.refresh(obj)
     return obj
 
-@router.delete("/pacientes/{paciente_id}")
-def deletar_paciente(paciente_id: uuid.UUID, db: Session = Depends(get_db)):
-    obj = db.query(model.Paciente).get(paciente_id)
+@router.delete("/pacientes/{paciente_id}", dependencies=[Depends(gestao)])
+async def deletar_paciente(paciente_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
+    obj = await db.get(model.Paciente, paciente_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Paciente não encontrado")
 
-    db.delete(obj)
-    db.commit()
+    await db.delete(obj)
+    await db.commit()
     return {"detail": "Paciente removido com sucesso"}
 
 # profissional
 
-@router.post("/profissionais", response_model=schemas.ProfissionalResponse)
-def criar_profissional(profissional: schemas.ProfissionalCreate, db: Session = Depends(get_db)):
-    obj = model.Profissional(**profissional.model_dump())
+@router.post("/profissionais", response_model=schemas.ProfissionalResponse, dependencies=[Depends(gestao)])
+async def criar_profissional(profissional: schemas.ProfissionalCreate, db: AsyncSession = Depends(get_db)):
+    obj = model.Profissional(**await seguranca.dados_com_hash(profissional))
     db.add(obj)
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
+    await db.refresh(obj)
     return obj
 
-@router.get("/profissionais", response_model=list[schemas.ProfissionalResponse])
-def listar_profissionais(db: Session = Depends(get_db)):
-    return db.query(model.Profissional).all()
+@router.get("/profissionais", response_model=schemas.Pagina[schemas.ProfissionalResponse])
+async def listar_profissionais(
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    after: Optional[uuid.UUID] = None,
+    formato: Literal["json", "ndjson"] = "json",
+    db: AsyncSession = Depends(get_db_leitura)
+):
+    return await listar(
+        db, projecao(model.Profissional, schemas.ProfissionalResponse), schemas.ProfissionalResponse,
+        model.Profissional.id, limit, after, formato
+    )
 
 @router.get("/profissionais/{profissional_id}", response_model=schemas.ProfissionalResponse)
-def buscar_profissional(profissional_id: uuid.UUID, db: Session = Depends(get_db)):
-    obj = db.query(model.Profissional).get(profissional_id)
+async def buscar_profissional(profissional_id: uuid.UUID, db: AsyncSession = Depends(get_db_leitura)):
+    obj = await db.get(model.Profissional, profissional_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Profissional não encontrado")
     return obj
 
-@router.put("/profissionais/{profissional_id}", response_model=schemas.ProfissionalResponse)
-def atualizar_profissional(
+@router.put("/profissionais/{profissional_id}", response_model=schemas.ProfissionalResponse, dependencies=[Depends(gestao)])
+async def atualizar_profissional(
     profissional_id: uuid.UUID,
     dados: schemas.UsuarioCreateCommon,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    obj = db.query(model.Profissional).get(profissional_id)
+    obj = await db.get(model.Profissional, profissional_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Profissional não encontrado")
 
-    for campo, valor in dados.model_dump().items():
+    for campo, valor in (await seguranca.dados_com_hash(dados)).items():
         setattr(obj, campo, valor)
 
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
+    await db.refresh(obj)
     return obj
 
-@router.delete("/profissionais/{profissional_id}")
-def deletar_profissional(profissional_id: uuid.UUID, db: Session = Depends(get_db)):
-    obj = db.query(model.Profissional).get(profissional_id)
+@router.delete("/profissionais/{profissional_id}", dependencies=[Depends(gestao)])
+async def deletar_profissional(profissional_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
+    obj = await db.get(model.Profissional, profissional_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Profissional não encontrado")
 
-    db.delete(obj)
-    db.commit()
+    await db.delete(obj)
+    await db.commit()
     return {"detail": "Profissional removido com sucesso"}
 
 # gestor
 
-@router.post("/gestores", response_model=schemas.GestorResponse)
-def criar_gestor(gestor: schemas.GestorCreate, db: Session = Depends(get_db)):
-    obj = model.Gestor(**gestor.model_dump())
+@router.post("/gestores", response_model=schemas.GestorResponse, dependencies=[Depends(so_admin)])
+async def criar_gestor(gestor: schemas.GestorCreate, db: AsyncSession = Depends(get_db)):
+    obj = model.Gestor(**await seguranca.dados_com_hash(gestor))
     db.add(obj)
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
+    await db.refresh(obj)
     return obj
 
-@router.get("/gestores", response_model=list[schemas.GestorResponse])
-def listar_gestores(db: Session = Depends(get_db)):
-    return db.query(model.Gestor).all()
+@router.get("/gestores", response_model=schemas.Pagina[schemas.GestorResponse])
+async def listar_gestores(
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    after: Optional[uuid.UUID] = None,
+    formato: Literal["json", "ndjson"] = "json",
+    db: AsyncSession = Depends(get_db_leitura)
+):
+    return await listar(
+        db, projecao(model.Gestor, schemas.GestorResponse), schemas.GestorResponse,
+        model.Gestor.id, limit, after, formato
+    )
 
 @router.get("/gestores/{gestor_id}", response_model=schemas.GestorResponse)
-def buscar_gestor(gestor_id: uuid.UUID, db: Session = Depends(get_db)):
-    obj = db.query(model.Gestor).get(gestor_id)
+async def buscar_gestor(gestor_id: uuid.UUID, db: AsyncSession = Depends(get_db_leitura)):
+    obj = await db.get(model.Gestor, gestor_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Gestor não encontrado")
     return obj
 
-@router.put("/gestores/{gestor_id}", response_model=schemas.GestorResponse)
-def atualizar_gestor(
+@router.put("/gestores/{gestor_id}", response_model=schemas.GestorResponse, dependencies=[Depends(so_admin)])
+async def atualizar_gestor(
     gestor_id: uuid.UUID,
     dados: schemas.UsuarioCreateCommon,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    obj = db.query(model.Gestor).get(gestor_id)
+    obj = await db.get(model.Gestor, gestor_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Gestor não encontrado")
 
-    for campo, valor in dados.model_dump().items():
+    for campo, valor in (await seguranca.dados_com_hash(dados)).items():
         setattr(obj, campo, valor)
 
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
+    await db.refresh(obj)
     return obj
 
-@router.delete("/gestores/{gestor_id}")
-def deletar_gestor(gestor_id: uuid.UUID, db: Session = Depends(get_db)):
-    obj = db.query(model.Gestor).get(gestor_id)
+@router.delete("/gestores/{gestor_id}", dependencies=[Depends(so_admin)])
+async def deletar_gestor(gestor_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
+    obj = await db.get(model.Gestor, gestor_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Gestor não encontrado")
 
-    db.delete(obj)
-    db.commit()
+    await db.delete(obj)
+    await db.commit()
     return {"detail": "Gestor removido com sucesso"}
 
 # admin
 
-@router.post("/admins", response_model=schemas.AdminResponse)
-def criar_admin(admin: schemas.AdminCreate, db: Session = Depends(get_db)):
-    obj = model.Admin(**admin.model_dump())
+@router.post("/admins", response_model=schemas.AdminResponse, dependencies=[Depends(so_admin)])
+async def criar_admin(admin: schemas.AdminCreate, db: AsyncSession = Depends(get_db)):
+    obj = model.Admin(**await seguranca.dados_com_hash(admin))
     db.add(obj)
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
+    await db.refresh(obj)
     return obj
 
-@router.get("/admins", response_model=list[schemas.AdminResponse])
-def listar_admins(db: Session = Depends(get_db)):
-    return db.query(model.Admin).all()
+@router.get("/admins", response_model=schemas.Pagina[schemas.AdminResponse])
+async def listar_admins(
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    after: Optional[uuid.UUID] = None,
+    formato: Literal["json", "ndjson"] = "json",
+    db: AsyncSession = Depends(get_db_leitura)
+):
+    return await listar(
+        db, projecao(model.Admin, schemas.AdminResponse), schemas.AdminResponse,
+        model.Admin.id, limit, after, formato
+    )
 
 @router.get("/admins/{admin_id}", response_model=schemas.AdminResponse)
-def buscar_admin(admin_id: uuid.UUID, db: Session = Depends(get_db)):
-    obj = db.query(model.Admin).get(admin_id)
+async def buscar_admin(admin_id: uuid.UUID, db: AsyncSession = Depends(get_db_leitura)):
+    obj = await db.get(model.Admin, admin_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Admin não encontrado")
     return obj
 
-@router.put("/admins/{admin_id}", response_model=schemas.AdminResponse)
-def atualizar_admin(
+@router.put("/admins/{admin_id}", response_model=schemas.AdminResponse, dependencies=[Depends(so_admin)])
+async def atualizar_admin(
     admin_id: uuid.UUID,
     dados: schemas.UsuarioCreateCommon,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    obj = db.query(model.Admin).get(admin_id)
+    obj = await db.get(model.Admin, admin_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Admin não encontrado")
 
-    for campo, valor in dados.model_dump().items():
+    for campo, valor in (await seguranca.dados_com_hash(dados)).items():
         setattr(obj, campo, valor)
 
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
+    await db.refresh(obj)
     return obj
 
-@router.delete("/admins/{admin_id}")
-def deletar_admin(admin_id: uuid.UUID, db: Session = Depends(get_db)):
-    obj = db.query(model.Admin).get(admin_id)
+@router.delete("/admins/{admin_id}", dependencies=[Depends(so_admin)])
+async def deletar_admin(admin_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
+    obj = await db.get(model.Admin, admin_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Admin não encontrado")
 
-    db.delete(obj)
-    db.commit()
+    await db.delete(obj)
+    await db.commit()
     return {"detail": "Admin removido com sucesso"}
\ No newline at end of file
@@ -1,69 +1,71 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-
-from sqlalchemy import desc, func, or_
-from sqlalchemy.orm import Session, joinedload
-from database import SessionLocal
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Literal, Optional
+from database import get_db
+from roteamento import get_db_leitura
+from paginacao import LIMITE_MAXIMO, LIMITE_PADRAO, paginar, stream_ndjson
+import busca
+import cache
+import carregamento
 import schemas 
 import model 
+import seguranca
+from model import RoleEnum
 
 router = APIRouter(
     prefix="/vacinas",
     tags=["Vacinas"]
 )
 
-def get_db():
-    db = SessionLocal()
-    try: 
-        yield db
-    finally:
-        db.close()
-
+# o catálogo de vacinas é alterado só por admin
+so_admin = seguranca.exigir_role(RoleEnum.ADMIN)
 
-@router.get("", response_model=list[schemas.VacinaResponse])
-def listar_vacinas(db: Session = Depends(get_db)): 
-    return db.query(model.Vacina).all()
 
-@router.post("", response_model=schemas.VacinaResponse)
-def criar_vacina(vacina: schemas.VacinaCreate, db: Session = Depends(get_db)):
+@router.get("", response_model=schemas.Pagina[schemas.VacinaResponse])
+async def listar_vacinas(
+    request: Request,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    after: Optional[int] = None,
+    formato: Literal["json", "ndjson"] = "json",
+    db: AsyncSession = Depends(get_db_leitura)
+):
+    stmt, chave = select(model.Vacina).options(*carregamento.VACINA), model.Vacina.codigo_vacina
+    if formato == "ndjson":
+        return stream_ndjson(stmt, schemas.VacinaResponse, chave, after, bind=db.bind)
+    return await cache.resposta_em_cache(
+        request, "vacinas", f"{limit}:{after}", schemas.Pagina[schemas.VacinaResponse],
+        lambda: paginar(db, stmt, chave, limit, after)
+    )
+
+@router.post("", response_model=schemas.VacinaResponse, dependencies=[Depends(so_admin)])
+async def criar_vacina(vacina: schemas.VacinaCreate, db: AsyncSession = Depends(get_db)):
     obj = model.Vacina(**vacina.model_dump())
-    db.add(vacina)
-    db.commit()
-    db.refresh(obj)
+    db.add(obj)
+    await db.commit()
+    await cache.invalidar("vacinas")
 
-    return obj
+    # recarrega com o fabricante; lazy load não funciona na sessão async
+    return await db.get(
+        model.Vacina, obj.codigo_vacina, options=carregamento.VACINA, populate_existing=True
+    )
 
 @router.get("/buscar", response_model=list[schemas.BuscaVacina])
-def buscar_vacinas(
-    termo: str, 
-    db: Session = Depends(get_db)
+async def buscar_vacinas(
+    termo: str = Query(..., min_length=3),
+    db: AsyncSession = Depends(get_db_leitura)
 ):
+    return await busca.buscar_vacinas(db, termo)
 
-    vacinas = db.query(
-        model.Vacina.codigo_vacina.label("id"),
-        model.Vacina.nome.label("nome"),
-        model.Fabricante.nome.label("fabricante")
-        )\
-        .join(model.Fabricante, model.Vacina.fabricante_cnpj == model.Fabricante.cnpj_fabricante)\
-        .filter(
-            or_(
-                model.Vacina.nome.op("<%")(termo),
-                model.Fabricante.nome.op("<%")(termo)
-            )
-        )\
-        .order_by(func.least(func.similarity(model.Vacina.nome, termo), func.similarity(model.Fabricante.nome)))\
-        .limit(10)\
-        .all()
-
-    return vacinas
-
-@router.put("/{vacina_id}", response_model=schemas.VacinaResponse)
-def atualizar_vacina(
+@router.put("/{vacina_id}", response_model=schemas.VacinaResponse, dependencies=[Depends(so_admin)])
+async def atualizar_vacina(
     vacina_id: int,                  
     vacina_dados: schemas.VacinaCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     
-    vacina_existente = db.query(model.Vacina).filter(model.Vacina.id == vacina_id).first()
+    vacina_existente = await db.get(model.Vacina, vacina_id)
 
     
     if not vacina_existente:
@@ -75,18 +77,21 @@ def atualizar_vacina(
     for key, value in vacina_dados.model_dump().items():
         setattr(vacina_existente, key, value)
 
-    db.commit()
-    db.refresh(vacina_existente)
+    await db.commit()
+    await cache.invalidar("vacinas")
 
-    return vacina_existente
+    return await db.get(
+        model.Vacina, vacina_id, options=carregamento.VACINA, populate_existing=True
+    )
 
-@router.delete("/{vacina_id}")
-def deletar_vacina(vacina_id: str, db: Session = Depends(get_db)):
-    obj = db.query(model.UnidadeDeSaude).get(vacina_id)
+@router.delete("/{vacina_id}", dependencies=[Depends(so_admin)])
+async def deletar_vacina(vacina_id: int, db: AsyncSession = Depends(get_db)):
+    obj = await db.get(model.Vacina, vacina_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Vacina não encontrada")
 
-    db.delete(obj)
-    db.commit()
+    await db.delete(obj)
+    await db.commit()
+    await cache.invalidar("vacinas")
     return {"detail": "Vacina removida com sucesso"}
 
@@ -1,7 +1,7 @@
 import uuid
 import enum
-from datetime import datetime
-from typing import Optional, List
+from datetime import date, datetime
+from typing import Any, Dict, Generic, Optional, List, TypeVar
 from pydantic import BaseModel, EmailStr, ConfigDict, Field
 
 # --- 0. Enums (Deve ser igual ao do model) ---
@@ -68,6 +68,36 @@ class ProfissionalResponse(UsuarioResponse):
     # Exemplo: registro_conselho: Optional[str] = None
     pass
 
+# IMPORTAÇÃO EM MASSA
+class ImportacaoErro(BaseModel):
+    linha: int
+    motivo: str
+
+class ImportacaoResponse(BaseModel):
+    lidas: int
+    inseridos: int
+    total_erros: int
+    erros: List[ImportacaoErro]
+
+
+# --- 1.3 Autenticação ---
+
+class LoginRequest(BaseModel):
+    email: EmailStr
+    senha: str
+
+class TokenResponse(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    expira_em: datetime
+    usuario_id: uuid.UUID
+    role: RoleEnum
+
+class TokenUsuario(BaseModel):
+    id: uuid.UUID
+    role: RoleEnum
+    model_config = ConfigDict(from_attributes=True)
+
 
 # --- 2. Entidades de Apoio (Fabricante, Fornecedor, Unidade) ---
 
@@ -79,7 +109,8 @@ class FabricanteCreate(FabricanteBase):
     cnpj: str
 
 class FabricanteResponse(FabricanteBase):
-    cnpj: str
+    # no model a coluna se chama cnpj_fabricante
+    cnpj: str = Field(validation_alias="cnpj_fabricante")
     model_config = ConfigDict(from_attributes=True)
 
 class FornecedorBase(BaseModel):
@@ -90,7 +121,8 @@ class FornecedorCreate(FornecedorBase):
     cnpj: str
 
 class FornecedorResponse(FornecedorBase):
-    cnpj: str
+    # no model a coluna se chama cnpj_fornecedor
+    cnpj: str = Field(validation_alias="cnpj_fornecedor")
     model_config = ConfigDict(from_attributes=True)
 
 class UnidadeBase(BaseModel):
@@ -135,7 +167,7 @@ class VacinaResponse(VacinaBase):
     model_config = ConfigDict(from_attributes=True)
 
 class EstoqueCreate(BaseModel):
-    nome_unidade: str
+    nome_unidade: uuid.UUID # id da unidade de saúde
     gestor_id: uuid.UUID
 
 class EstoqueResponse(BaseModel):
@@ -175,15 +207,27 @@ class AplicacaoCreate(BaseModel):
     paciente_id: uuid.UUID
     profissional_id: uuid.UUID
     admin_id: uuid.UUID
-    unidade_nome: str
+    unidade_nome: uuid.UUID # id da unidade de saúde
     dose_id: int
-    lote_id: int
+    lote_id: Optional[int] = None # sem lote, usa o que vence primeiro na unidade (FEFO)
+
+class AplicacaoLoteResultado(BaseModel):
+    indice: int  # posição do item no lote enviado
+    id_aplicacao: Optional[int] = None
+    status: int
+    motivo: Optional[str] = None
+
+class AplicacaoLoteResponse(BaseModel):
+    recebidos: int
+    inseridos: int
+    total_erros: int
+    resultados: List[AplicacaoLoteResultado]
 
 class AplicacaoResponse(BaseModel):
     id_aplicacao: int
     data: datetime
 
-    lote: Optional[int] = None #aqui é o id do lote apenas 
+    lote: Optional[int] = Field(None, validation_alias="lote_id") #aqui é o id do lote apenas 
     paciente: Optional[PacienteResponse] = None
     profissional: Optional[ProfissionalResponse] = None
     admin: Optional[GestorResponse] = None
@@ -210,4 +254,162 @@ class CampanhaResponse(CampanhaCreate):
 # Many-to-Many
 class PublicacaoCreate(BaseModel):
     campanha_id: int
-    vacina_id: int
\ No newline at end of file
+    vacina_id: int
+
+
+# --- 6. Paginação ---
+
+T = TypeVar("T")
+
+class Pagina(BaseModel, Generic[T]):
+    itens: List[T]
+    # cursor para a próxima página (passar em ?after=); None na última
+    proximo: Optional[str] = None
+
+
+# --- 7. Saúde ---
+
+class PoolStatus(BaseModel):
+    pid: int
+    tamanho: int
+    max_overflow: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    checkouts: int
+    espera_media_ms: float
+    espera_max_ms: float
+    espera_total_ms: float
+    timeouts: int
+
+class HealthDbResponse(BaseModel):
+    ok: bool
+    latencia_ms: Optional[float] = None
+    pools: Dict[str, PoolStatus]  # "primaria" e, se configurada, "replica"
+
+class ConsultaLenta(BaseModel):
+    sql: str
+    parametros: str  # só os tipos, ex.: "(str, int)"
+    rotas: Dict[str, int]  # rota -> ocorrências
+    execucoes: int
+    total_s: float
+    max_s: float
+    media_s: float
+    ultima_em: datetime
+    plano: Optional[Any] = None  # EXPLAIN (ANALYZE, BUFFERS) em JSON, quando amostrado
+    plano_em: Optional[datetime] = None
+
+
+# --- 8. Dashboard ---
+
+class AplicacoesPorVacina(BaseModel):
+    vacina_id: int
+    nome: str
+    total: int
+
+class EstoquePorVacina(BaseModel):
+    vacina_id: int
+    nome: str
+    doses: int
+
+class AplicacoesPorDia(BaseModel):
+    dia: date
+    total: int
+
+class DashboardResumo(BaseModel):
+    doses_disponiveis: int
+    campanhas_ativas: int
+    aplicacoes_hoje: int
+    lotes_proximos_vencimento: int
+    aplicacoes_por_vacina: List[AplicacoesPorVacina]
+    estoque_por_vacina: List[EstoquePorVacina]
+    aplicacoes_por_dia: List[AplicacoesPorDia]
+
+
+# --- 9. Relatórios ---
+
+class RelatorioLinha(BaseModel):
+    periodo: datetime
+    chave: Optional[str] = None  # id da vacina/unidade quando agrupado
+    nome: Optional[str] = None
+    total: int
+
+class RelatorioResponse(BaseModel):
+    inicio: datetime
+    fim: datetime
+    granularidade: str
+    agrupar: str
+    linhas: List[RelatorioLinha]
+
+
+# --- 10. Vencimento de lotes ---
+
+class VencimentoItem(BaseModel):
+    unidade_id: uuid.UUID
+    unidade: str
+    vacina_id: int
+    vacina: str
+    lotes_vencidos: int
+    doses_vencidas: int
+    lotes_a_vencer: int
+    doses_a_vencer: int
+    proximo_vencimento: Optional[datetime] = None
+
+class VencimentoResponse(BaseModel):
+    gerado_em: datetime
+    janela_dias: int
+    itens: List[VencimentoItem]
+
+
+# --- 11. Caderneta ---
+
+class CadernetaAplicacao(BaseModel):
+    id_aplicacao: int
+    data: datetime
+    vacina_id: int
+    vacina: str
+    dose_id: int
+    dose_numero: Optional[int] = None
+    lote_id: Optional[int] = None
+    lote_validade: Optional[datetime] = None
+    unidade_id: Optional[uuid.UUID] = None
+    unidade: Optional[str] = None
+
+class ProximaDoseCaderneta(BaseModel):
+    vacina_id: int
+    vacina: str
+    dose_id: int
+    numero: int
+    data_prevista: date
+
+class Caderneta(BaseModel):
+    paciente_id: uuid.UUID
+    aplicacoes: List[CadernetaAplicacao]
+    proximas_doses: List[ProximaDoseCaderneta]
+
+class ProximaDoseResponse(BaseModel):
+    paciente_id: uuid.UUID
+    vacina_id: int
+    dose_id: int
+    numero: int
+    data_prevista: date
+    model_config = ConfigDict(from_attributes=True)
+
+
+# --- 12. Cobertura vacinal ---
+
+class CoberturaLinha(BaseModel):
+    vacina_id: int
+    vacina: str
+    unidade_id: Optional[uuid.UUID] = None
+    unidade: Optional[str] = None
+    campanha_id: Optional[int] = None
+    campanha: Optional[str] = None
+    iniciados: int  # pacientes com ao menos uma dose
+    completos: int  # pacientes com todas as doses da vacina
+    taxa: float
+
+class CoberturaResponse(BaseModel):
+    agrupar: str
+    pendentes: int  # aplicações ainda não consolidadas nos números
+    linhas: List[CoberturaLinha]
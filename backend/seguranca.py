@@ -0,0 +1,187 @@
+# Senhas e tokens de acesso.
+#
+# Hash de senha: scrypt (hashlib, sem dependência nova), de propósito caro
+# (dezenas de ms de CPU). Para não travar o event loop ele roda num
+# ProcessPoolExecutor de AUTH_PROCESSOS processos; um semáforo limita
+# quantos hashes ficam na fila, então um pico de logins espera em vez de
+# acumular trabalho sem limite.
+#
+# Token: JWT HS256 assinado com AUTH_SEGREDO, com o id e a role do usuário.
+# Com o segredo de exemplo (público, está no repositório) qualquer um
+# emitiria um token de ADMIN, então sem AUTH_SEGREDO a API não sobe.
+# Conferir o token é um HMAC sobre poucos bytes (microssegundos), sem ir ao
+# banco, então as dependências `usuario_atual` / `exigir_role` podem ficar
+# em qualquer rota.
+#
+# As funções de hash ficam em senhas.py, que só importa a stdlib: é o que
+# os processos do pool carregam.
+#
+# Senhas antigas gravadas em texto puro ainda funcionam no login e são
+# trocadas pelo hash na hora (ver routes/auth.py).
+import asyncio
+import hashlib
+import hmac
+import json
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+import config
+from model import RoleEnum
+from senhas import b64, conferir_hash, de_b64, gerar_hash, gerar_hashes
+
+# --- Hash de senha ---
+
+# Login de e-mail inexistente confere contra este hash, para levar o
+# mesmo tempo de um login com senha errada
+_HASH_FICTICIO = "scrypt$16384$8$1$AAAAAAAAAAAAAAAAAAAAAA$AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA"
+
+_pool: Optional[ProcessPoolExecutor] = None
+_fila: Optional[asyncio.Semaphore] = None
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: processos limpos, que só carregam senhas.py (nada de
+        # conexões ou event loop herdados do worker)
+        _pool = ProcessPoolExecutor(
+            max_workers=config.AUTH_PROCESSOS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+async def _no_pool(funcao, *args):
+    global _fila
+    if _fila is None:
+        _fila = asyncio.Semaphore(config.AUTH_FILA_MAX)
+    async with _fila:
+        return await asyncio.get_running_loop().run_in_executor(_executor(), funcao, *args)
+
+
+async def hash_senha(senha: str) -> str:
+    return await _no_pool(gerar_hash, senha)
+
+
+# Senhas por pedaço enviado ao pool pelo job da importação em massa
+# (importacao.loop_senhas). Pedaços pequenos e no máximo AUTH_PROCESSOS
+# deles na fila por vez: um login que chegue no meio espera um pedaço
+# (~1s), não o bloco inteiro.
+_PEDACO_HASHES = 32
+
+
+async def hash_senhas(senhas: list[str]) -> list[str]:
+    pedacos = [senhas[i:i + _PEDACO_HASHES] for i in range(0, len(senhas), _PEDACO_HASHES)]
+    limite = asyncio.Semaphore(config.AUTH_PROCESSOS)
+
+    async def um(pedaco):
+        async with limite:
+            return await _no_pool(gerar_hashes, pedaco)
+
+    resultado = []
+    for hashes in await asyncio.gather(*(um(p) for p in pedacos)):
+        resultado.extend(hashes)
+    return resultado
+
+
+async def dados_com_hash(dados) -> dict:
+    """model_dump() de um schema de criação/edição de usuário, com a senha já em hash."""
+    valores = dados.model_dump()
+    valores["senha"] = await hash_senha(valores["senha"])
+    return valores
+
+
+async def verificar_senha(senha: str, guardado: Optional[str]) -> bool:
+    return await _no_pool(conferir_hash, senha, guardado or _HASH_FICTICIO) and guardado is not None
+
+
+def encerrar_pool():
+    """Chamado no fim do lifespan."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+# --- Tokens ---
+
+@dataclass(frozen=True)
+class UsuarioToken:
+    id: uuid.UUID
+    role: RoleEnum
+
+
+_CABECALHO = b64(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+
+
+def conferir_segredo():
+    """Chamado na subida da API: RuntimeError sem um AUTH_SEGREDO de verdade."""
+    if not config.AUTH_SEGREDO:
+        raise RuntimeError("Defina AUTH_SEGREDO (ou AUTH_SEGREDO_DEV=1 em desenvolvimento)")
+    if config.AUTH_SEGREDO == config.AUTH_SEGREDO_EXEMPLO and not config.AUTH_SEGREDO_DEV:
+        raise RuntimeError("AUTH_SEGREDO é o segredo de exemplo; use AUTH_SEGREDO_DEV=1 só em desenvolvimento")
+
+
+def _assinar(mensagem: bytes) -> str:
+    if not config.AUTH_SEGREDO:
+        raise RuntimeError("AUTH_SEGREDO não definido")
+    return b64(hmac.new(config.AUTH_SEGREDO.encode(), mensagem, hashlib.sha256).digest())
+
+
+def emitir_token(usuario_id: uuid.UUID, role: RoleEnum, agora: Optional[float] = None) -> tuple[str, int]:
+    """Devolve (token, expiração em epoch)."""
+    agora = int(agora or time.time())
+    expira = agora + config.AUTH_TOKEN_TTL_S
+    corpo = {"sub": str(usuario_id), "role": role.value, "iat": agora, "exp": expira}
+    conteudo = f"{_CABECALHO}.{b64(json.dumps(corpo, separators=(',', ':')).encode())}"
+    return f"{conteudo}.{_assinar(conteudo.encode())}", expira
+
+
+def ler_token(token: str) -> UsuarioToken:
+    """Confere assinatura e expiração; ValueError se o token não vale."""
+    try:
+        cabecalho, corpo, assinatura = token.split(".")
+    except ValueError:
+        raise ValueError("Token malformado")
+    if cabecalho != _CABECALHO:
+        raise ValueError("Algoritmo não suportado")
+    if not hmac.compare_digest(assinatura, _assinar(f"{cabecalho}.{corpo}".encode())):
+        raise ValueError("Assinatura inválida")
+
+    try:
+        dados = json.loads(de_b64(corpo))
+        expira, usuario = dados["exp"], UsuarioToken(id=uuid.UUID(dados["sub"]), role=RoleEnum(dados["role"]))
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Token malformado")
+    if expira < time.time():
+        raise ValueError("Token expirado")
+    return usuario
+
+
+# --- Dependências das rotas ---
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+async def usuario_atual(credenciais: Optional[HTTPAuthorizationCredentials] = Depends(_bearer)) -> UsuarioToken:
+    if credenciais is None:
+        raise HTTPException(status_code=401, detail="Não autenticado", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        return ler_token(credenciais.credentials)
+    except ValueError as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+
+
+def exigir_role(*roles: RoleEnum):
+    """Dependência que só deixa passar tokens com uma das roles."""
+    async def _verificar(usuario: UsuarioToken = Depends(usuario_atual)) -> UsuarioToken:
+        if usuario.role not in roles:
+            raise HTTPException(status_code=403, detail="Sem permissão para esta operação")
+        return usuario
+    return _verificar
@@ -0,0 +1,46 @@
+# Hash de senha com scrypt (hashlib). Este módulo só importa a stdlib
+# porque roda dentro dos processos do pool de seguranca.py.
+import base64
+import hashlib
+import hmac
+import os
+
+_SCRYPT_N, _SCRYPT_R, _SCRYPT_P = 2**14, 8, 1
+_PREFIXO = "scrypt"
+
+
+def b64(dados: bytes) -> str:
+    return base64.urlsafe_b64encode(dados).rstrip(b"=").decode()
+
+
+def de_b64(texto: str) -> bytes:
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+def _scrypt(senha: str, sal: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(senha.encode(), salt=sal, n=n, r=r, p=p, maxmem=128 * r * (n + p + 2), dklen=32)
+
+
+def gerar_hash(senha: str) -> str:
+    """Síncrona e cara: nas rotas, usar seguranca.hash_senha (no pool)."""
+    sal = os.urandom(16)
+    chave = _scrypt(senha, sal, _SCRYPT_N, _SCRYPT_R, _SCRYPT_P)
+    return f"{_PREFIXO}${_SCRYPT_N}${_SCRYPT_R}${_SCRYPT_P}${b64(sal)}${b64(chave)}"
+
+
+def gerar_hashes(senhas: list[str]) -> list[str]:
+    """Várias de uma vez: uma ida e volta ao processo do pool por pedaço."""
+    return [gerar_hash(senha) for senha in senhas]
+
+
+def eh_hash(guardado: str) -> bool:
+    return guardado.startswith(_PREFIXO + "$") and guardado.count("$") == 5
+
+
+def conferir_hash(senha: str, guardado: str) -> bool:
+    if not eh_hash(guardado):
+        # legado em texto puro
+        return hmac.compare_digest(senha.encode(), guardado.encode())
+    _, n, r, p, sal, chave = guardado.split("$")
+    calculada = _scrypt(senha, de_b64(sal), int(n), int(r), int(p))
+    return hmac.compare_digest(calculada, de_b64(chave))
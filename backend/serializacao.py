@@ -0,0 +1,61 @@
+# Caminho rápido de serialização para as listagens grandes.
+#
+# O caminho padrão (SELECT da entidade inteira -> objetos ORM -> Pydantic com
+# from_attributes -> jsonable/json.dumps) paga instrumentação do ORM por
+# atributo e colunas que o response nem usa. Aqui:
+#
+#   - `projecao(entidade, schema)` monta um SELECT só com as colunas que o
+#     schema declara, rotuladas com o nome que o schema espera;
+#   - `adapter(schema)` guarda um TypeAdapter por schema, construído uma vez;
+#   - `RespostaJSON` renderiza com orjson (que já entende UUID e datetime).
+#
+# Vale para schemas planos; os que têm objetos aninhados (LoteResponse,
+# AplicacaoResponse, ...) continuam no SELECT de entidade com options.
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import Enum, Select, String, select, type_coerce
+
+_adapters: dict = {}
+
+
+def adapter(schema) -> TypeAdapter:
+    """TypeAdapter de `schema`, criado só na primeira chamada."""
+    resultado = _adapters.get(schema)
+    if resultado is None:
+        resultado = _adapters[schema] = TypeAdapter(schema)
+    return resultado
+
+
+class RespostaJSON(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def projecao(entidade, schema) -> Select:
+    """SELECT com uma coluna por campo do schema (ou pelo validation_alias dele)."""
+    colunas = []
+    for nome, campo in schema.model_fields.items():
+        atributo = campo.validation_alias if isinstance(campo.validation_alias, str) else nome
+        coluna = getattr(entidade, atributo)
+        if isinstance(coluna.type, Enum):
+            # volta como str ('PACIENTE'), que o enum do schema aceita direto
+            coluna = type_coerce(coluna, String)
+        colunas.append(coluna.label(atributo))
+    return select(*colunas)
+
+
+def resposta(schema, dados, from_attributes: bool = False) -> RespostaJSON:
+    """Valida `dados` com o adapter de `schema` e devolve a resposta orjson."""
+    tipo = adapter(schema)
+    return RespostaJSON(tipo.dump_python(tipo.validate_python(dados, from_attributes=from_attributes)))
+
+
+def linha_json(schema, dados, from_attributes: bool = False) -> bytes:
+    """Uma linha NDJSON."""
+    tipo = adapter(schema)
+    return orjson.dumps(tipo.dump_python(tipo.validate_python(dados, from_attributes=from_attributes))) + b"\n"
@@ -0,0 +1,61 @@
+# Testes de integração: precisam de um Postgres de verdade.
+#
+#     createdb projkaua_teste
+#     DATABASE_URL=postgresql://.../projkaua_teste python -m pytest tests
+#
+# As migrações são aplicadas no começo da sessão. Cada teste cria os
+# próprios dados com bench/_cenario.py (a mesma fábrica do bench de
+# estoque). Sem banco acessível os testes são pulados.
+import os
+import sys
+import uuid
+
+import pytest
+
+os.environ.setdefault("AUTH_SEGREDO_DEV", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+import migracoes  # noqa: E402
+import model  # noqa: E402
+import seguranca  # noqa: E402
+from database import async_engine, async_engine_leitura, engine  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def banco():
+    try:
+        with engine.connect():
+            pass
+    except OperationalError:
+        pytest.skip("Postgres de teste indisponível (DATABASE_URL)")
+    migracoes.migrar(engine)
+
+
+@pytest.fixture
+async def engines(banco):
+    yield
+    # o pool asyncpg fica preso ao event loop do teste; cada teste tem o seu
+    await async_engine.dispose()
+    if async_engine_leitura is not async_engine:
+        await async_engine_leitura.dispose()
+
+
+@pytest.fixture
+async def cliente(engines):
+    from main import app
+
+    token, _ = seguranca.emitir_token(uuid.uuid4(), model.RoleEnum.ADMIN)
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app),
+        base_url="http://teste",
+        headers={"Authorization": f"Bearer {token}"},
+    ) as http:
+        yield http
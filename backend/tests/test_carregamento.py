@@ -0,0 +1,77 @@
+# Regressão de N+1 nas rotas que montam respostas aninhadas: o número de
+# comandos SQL de uma listagem não pode crescer com o tamanho da página.
+import pytest
+
+from bench._cenario import criar_cenario
+from carregamento import max_queries
+
+pytestmark = pytest.mark.anyio
+
+ITENS = 20
+
+
+async def _contar(cliente, url: str, **params) -> int:
+    with max_queries(1000) as comandos:
+        resposta = await cliente.get(url, params=params)
+    assert resposta.status_code == 200, resposta.text
+    return len(comandos)
+
+
+async def test_listar_lotes_um_select(cliente):
+    cenario = await criar_cenario(lotes=ITENS)
+    depois_de = min(cenario["lotes"]) - 1
+    await _contar(cliente, "/ubs/lotes", limit=1)  # aquece o pool
+
+    with max_queries(1):
+        resposta = await cliente.get("/ubs/lotes", params={"limit": ITENS, "after": depois_de})
+    assert len(resposta.json()["itens"]) == ITENS
+    assert resposta.json()["itens"][0]["vacina"]["fabricante"] is not None
+
+    assert await _contar(cliente, "/ubs/lotes", limit=1, after=depois_de) == \
+        await _contar(cliente, "/ubs/lotes", limit=ITENS, after=depois_de)
+
+
+async def test_listar_estoques_unidade_e_gestores(cliente):
+    cenario = await criar_cenario(lotes=1, estoques=ITENS)
+    depois_de = min(cenario["estoques"]) - 1
+    await _contar(cliente, "/ubs/estoques", limit=1)
+
+    # um SELECT com a unidade no JOIN e um para todos os gestores da página
+    with max_queries(2):
+        resposta = await cliente.get("/ubs/estoques", params={"limit": ITENS, "after": depois_de})
+    assert len(resposta.json()["itens"]) == ITENS
+
+    assert await _contar(cliente, "/ubs/estoques", limit=1, after=depois_de) == \
+        await _contar(cliente, "/ubs/estoques", limit=ITENS, after=depois_de)
+
+
+async def test_buscar_lote_e_estoque(cliente):
+    cenario = await criar_cenario()
+    await _contar(cliente, f"/ubs/lotes/{cenario['lotes'][0]}")
+
+    with max_queries(1):
+        resposta = await cliente.get(f"/ubs/lotes/{cenario['lotes'][0]}")
+    assert resposta.status_code == 200
+
+    with max_queries(2):
+        resposta = await cliente.get(f"/ubs/estoques/{cenario['estoques'][0]}")
+    assert resposta.status_code == 200
+
+
+async def test_registrar_aplicacao_recarrega_sem_lazy_load(cliente):
+    cenario = await criar_cenario()
+    dados = {
+        "paciente_id": str(cenario["pacientes"][0]),
+        "profissional_id": str(cenario["profissional_id"]),
+        "admin_id": str(cenario["admin_id"]),
+        "unidade_nome": str(cenario["unidade_id"]),
+        "dose_id": cenario["doses"][0],
+        "lote_id": cenario["lotes"][0],
+    }
+
+    # INSERT, baixa no lote, recarga com dose/unidade no JOIN e um SELECT
+    # por usuário (paciente, profissional, admin)
+    with max_queries(6):
+        resposta = await cliente.post("/aplicacoes/", json=dados)
+    assert resposta.status_code == 201, resposta.text
+    assert resposta.json()["paciente"]["id"] == dados["paciente_id"]
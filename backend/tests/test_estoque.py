@@ -0,0 +1,85 @@
+# Baixa concorrente de estoque: N registros em paralelo contra um lote com
+# k < N doses têm que dar exatamente k sucessos e zerar o lote, tanto com
+# lote_id quanto pelo FEFO. Versão de carga em bench/estoque.py.
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+import config
+import model
+import registro
+import schemas
+from bench._cenario import criar_cenario
+from database import AsyncSessionLocal
+
+pytestmark = pytest.mark.anyio
+
+DOSES = 5
+PEDIDOS = 30
+
+
+async def _registrar(dados: schemas.AplicacaoCreate, limite: asyncio.Semaphore):
+    async with limite:
+        try:
+            async with AsyncSessionLocal() as db:
+                await registro.registrar_aplicacao(db, dados)
+            return "ok"
+        except HTTPException as e:
+            return e.status_code
+
+
+async def _disparar(cenario: dict, lote_id) -> list:
+    pedidos = [
+        schemas.AplicacaoCreate(
+            paciente_id=cenario["pacientes"][i % len(cenario["pacientes"])],
+            profissional_id=cenario["profissional_id"],
+            admin_id=cenario["admin_id"],
+            unidade_nome=cenario["unidade_id"],
+            dose_id=cenario["doses"][0],
+            lote_id=lote_id,
+        )
+        for i in range(PEDIDOS)
+    ]
+    limite = asyncio.Semaphore(config.DB_POOL_SIZE)
+    return await asyncio.gather(*(_registrar(p, limite) for p in pedidos))
+
+
+async def _conferir(cenario: dict, resultados: list):
+    lote_id = cenario["lotes"][0]
+    async with AsyncSessionLocal() as db:
+        restante = (await db.get(model.Lote, lote_id)).quantidade
+        aplicadas = (await db.execute(
+            select(func.count()).where(model.Aplicacao.lote_id == lote_id)
+        )).scalar()
+
+    assert resultados.count("ok") == DOSES
+    assert set(resultados) == {"ok", 409}
+    assert restante == 0
+    assert aplicadas == DOSES
+
+
+@pytest.mark.parametrize("com_lote", [True, False], ids=["lote_id", "fefo"])
+async def test_baixa_concorrente_sem_vender_a_mais(engines, com_lote):
+    cenario = await criar_cenario(doses=DOSES, pacientes=PEDIDOS)
+    resultados = await _disparar(cenario, cenario["lotes"][0] if com_lote else None)
+    await _conferir(cenario, resultados)
+
+
+@pytest.mark.parametrize("com_lote", [True, False], ids=["lote_id", "fefo"])
+async def test_dose_inexistente_404_nos_dois_caminhos(engines, com_lote):
+    cenario = await criar_cenario()
+    dados = schemas.AplicacaoCreate(
+        paciente_id=cenario["pacientes"][0],
+        profissional_id=cenario["profissional_id"],
+        admin_id=cenario["admin_id"],
+        unidade_nome=cenario["unidade_id"],
+        dose_id=-1,
+        lote_id=cenario["lotes"][0] if com_lote else None,
+    )
+    async with AsyncSessionLocal() as db:
+        with pytest.raises(HTTPException) as erro:
+            await registro.registrar_aplicacao(db, dados)
+    assert erro.value.status_code == 404
+    assert erro.value.detail == "Dose não encontrada"
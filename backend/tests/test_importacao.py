@@ -0,0 +1,49 @@
+# A importação grava as senhas como vieram e não calcula hash; o job
+# (importacao.loop_senhas) troca pelo hash depois do commit.
+import io
+import uuid
+
+import pytest
+from sqlalchemy import select
+
+import importacao
+import model
+from database import AsyncSessionLocal
+from senhas import conferir_hash, eh_hash
+
+pytestmark = pytest.mark.anyio
+
+
+def _csv(sufixo: str, n: int) -> io.BytesIO:
+    linhas = ["pnome,unome,senha,email,telefone,cpf_usuario"]
+    linhas += [
+        f"Imp,Teste,senha{i},imp.{sufixo}.{i}@exemplo.com,0000000000,{sufixo[:8]}{i:03d}"
+        for i in range(n)
+    ]
+    return io.BytesIO("\n".join(linhas).encode())
+
+
+async def _senhas(sufixo: str) -> dict:
+    async with AsyncSessionLocal() as db:
+        linhas = (await db.execute(
+            select(model.Usuario.email, model.Usuario.senha)
+            .where(model.Usuario.email.like(f"imp.{sufixo}.%"))
+        )).all()
+    return dict(linhas)
+
+
+async def test_importa_sem_hash_e_job_troca_depois(engines):
+    sufixo = uuid.uuid4().hex[:10]
+    async with AsyncSessionLocal() as db:
+        resultado = await importacao.importar_pacientes(db, _csv(sufixo, 5))
+        await db.commit()
+    assert resultado["inseridos"] == 5
+
+    antes = await _senhas(sufixo)
+    assert not any(eh_hash(s) for s in antes.values())
+
+    await importacao.hash_todas_pendentes(AsyncSessionLocal)
+
+    depois = await _senhas(sufixo)
+    assert all(eh_hash(s) for s in depois.values())
+    assert conferir_hash("senha0", depois[f"imp.{sufixo}.0@exemplo.com"])
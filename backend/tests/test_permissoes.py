@@ -0,0 +1,57 @@
+# As escritas de usuários, unidades, lotes e vacinas exigem token com a
+# role certa; sem isso qualquer um criaria um admin para si.
+import uuid
+
+import httpx
+import pytest
+
+import model
+import seguranca
+
+pytestmark = pytest.mark.anyio
+
+
+def _admin_novo() -> dict:
+    sufixo = uuid.uuid4().hex[:10]
+    return {
+        "pnome": "Intruso", "unome": "Teste", "senha": "senha123", "telefone": "0000000000",
+        "email": f"intruso.{sufixo}@exemplo.com", "cpf_usuario": sufixo,
+    }
+
+
+@pytest.fixture
+async def anonimo(engines):
+    from main import app
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://teste") as http:
+        yield http
+
+
+async def test_criar_admin_sem_token(anonimo):
+    resposta = await anonimo.post("/users/admins", json=_admin_novo())
+    assert resposta.status_code in (401, 403)
+
+
+@pytest.mark.parametrize("role", [model.RoleEnum.PACIENTE, model.RoleEnum.PROFISSIONAL, model.RoleEnum.GESTOR])
+async def test_criar_admin_sem_ser_admin(anonimo, role):
+    token, _ = seguranca.emitir_token(uuid.uuid4(), role)
+    resposta = await anonimo.post(
+        "/users/admins", json=_admin_novo(), headers={"Authorization": f"Bearer {token}"}
+    )
+    assert resposta.status_code == 403
+
+
+async def test_criar_admin_com_admin(cliente):
+    resposta = await cliente.post("/users/admins", json=_admin_novo())
+    assert resposta.status_code == 200, resposta.text
+
+
+@pytest.mark.parametrize("metodo, url", [
+    ("post", "/ubs/unidades"),
+    ("post", "/ubs/lotes"),
+    ("put", "/vacinas/1"),
+    ("delete", "/users/pacientes/00000000-0000-0000-0000-000000000000"),
+])
+async def test_escritas_sem_token(anonimo, metodo, url):
+    resposta = await anonimo.request(metodo.upper(), url, json={})
+    assert resposta.status_code == 401
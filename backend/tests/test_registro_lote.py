@@ -0,0 +1,55 @@
+# Registro em lote com item num mês cuja partição foi desanexada: o item
+# volta com erro próprio e os outros entram (antes o lote todo dava 500).
+import datetime
+
+import pytest
+
+import particoes
+from bench._cenario import criar_cenario
+from database import engine
+
+pytestmark = pytest.mark.anyio
+
+MES = datetime.date(1990, 1, 1)
+
+
+def _apagar_se_solta():
+    with engine.begin() as connection:
+        try:
+            particoes.apagar(connection, MES)
+        except ValueError:
+            pass
+
+
+@pytest.fixture
+def mes_desanexado(banco):
+    _apagar_se_solta()
+    with engine.begin() as connection:
+        particoes.criar(connection, MES, MES)
+    particoes.desanexar(engine, MES)
+    yield MES
+    _apagar_se_solta()
+
+
+async def test_item_em_mes_desanexado(cliente, mes_desanexado):
+    cenario = await criar_cenario(doses=10)
+    base = {
+        "paciente_id": str(cenario["pacientes"][0]),
+        "profissional_id": str(cenario["profissional_id"]),
+        "admin_id": str(cenario["admin_id"]),
+        "unidade_nome": str(cenario["unidade_id"]),
+        "dose_id": cenario["doses"][0],
+        "lote_id": cenario["lotes"][0],
+    }
+    resposta = await cliente.post("/aplicacoes/batch", json=[
+        {**base, "data": datetime.datetime(1990, 1, 15, 10).isoformat()},
+        base,
+    ])
+    assert resposta.status_code == 200, resposta.text
+
+    corpo = resposta.json()
+    assert corpo["inseridos"] == 1
+    desanexado, normal = corpo["resultados"]
+    assert desanexado["status"] == 400
+    assert "partição" in desanexado["motivo"]
+    assert normal["status"] == 201
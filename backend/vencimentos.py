@@ -0,0 +1,100 @@
+# Resumo de vencimento de lotes, pré-calculado em segundo plano.
+#
+# Um job periódico (loop_vencimentos, iniciado no lifespan) lê só os lotes
+# com doses que já venceram ou vencem dentro da janela, pelo índice
+# parcial idx_lote_validade, e guarda um resumo por unidade e vacina em
+# memória. GET /ubs/lotes/vencimento responde desse resumo, sem tocar no
+# banco: o custo da leitura é o tamanho da resposta, não o número de lotes.
+#
+# O resumo pode ficar até VENCIMENTOS_INTERVALO_S atrasado em relação às
+# baixas de estoque; para vencimento, que muda em escala de dias, basta.
+import asyncio
+import datetime
+import logging
+import uuid
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+import model
+from resumos import DIAS_PROXIMO_VENCIMENTO
+
+logger = logging.getLogger(__name__)
+
+# Última varredura: {"gerado_em", "janela_dias", "por_unidade": {unidade_id: [itens]}}
+# É trocada inteira a cada varredura, então quem lê nunca vê um estado pela metade.
+_estado: Optional[dict] = None
+
+
+def _consulta(agora: datetime.datetime, limite: datetime.datetime):
+    vencido = model.Lote.validade <= agora
+    a_vencer = model.Lote.validade > agora
+
+    return (
+        select(
+            model.Estoque.nome_unidade.label("unidade_id"),
+            model.UnidadeDeSaude.nome_unidade.label("unidade"),
+            model.Lote.vacina_id,
+            model.Vacina.nome.label("vacina"),
+            func.count().filter(vencido).label("lotes_vencidos"),
+            func.coalesce(func.sum(model.Lote.quantidade).filter(vencido), 0).label("doses_vencidas"),
+            func.count().filter(a_vencer).label("lotes_a_vencer"),
+            func.coalesce(func.sum(model.Lote.quantidade).filter(a_vencer), 0).label("doses_a_vencer"),
+            func.min(model.Lote.validade).filter(a_vencer).label("proximo_vencimento"),
+        )
+        .join(model.Estoque, model.Estoque.id_estoque == model.Lote.estoque_id)
+        .join(model.UnidadeDeSaude, model.UnidadeDeSaude.id == model.Estoque.nome_unidade)
+        .join(model.Vacina, model.Vacina.codigo_vacina == model.Lote.vacina_id)
+        # mesmo predicado do índice parcial
+        .where(model.Lote.quantidade > 0, model.Lote.validade <= limite)
+        .group_by(
+            model.Estoque.nome_unidade, model.UnidadeDeSaude.nome_unidade,
+            model.Lote.vacina_id, model.Vacina.nome,
+        )
+    )
+
+
+async def varrer(db: AsyncSession, janela_dias: int = DIAS_PROXIMO_VENCIMENTO) -> dict:
+    global _estado
+    agora = datetime.datetime.now()
+    limite = agora + datetime.timedelta(days=janela_dias)
+
+    por_unidade: dict = {}
+    for linha in (await db.execute(_consulta(agora, limite))).mappings():
+        por_unidade.setdefault(linha["unidade_id"], []).append(dict(linha))
+
+    _estado = {"gerado_em": agora, "janela_dias": janela_dias, "por_unidade": por_unidade}
+    return _estado
+
+
+async def resumo_vencimento(
+    db: AsyncSession,
+    unidade_id: Optional[uuid.UUID] = None,
+    vacina_id: Optional[int] = None,
+) -> dict:
+    # antes da primeira varredura do job (logo após subir), calcula na hora
+    estado = _estado or await varrer(db)
+
+    if unidade_id is not None:
+        itens = list(estado["por_unidade"].get(unidade_id, []))
+    else:
+        itens = [item for lista in estado["por_unidade"].values() for item in lista]
+    if vacina_id is not None:
+        itens = [item for item in itens if item["vacina_id"] == vacina_id]
+
+    return {"gerado_em": estado["gerado_em"], "janela_dias": estado["janela_dias"], "itens": itens}
+
+
+async def loop_vencimentos(session_factory, intervalo: float = config.VENCIMENTOS_INTERVALO_S):
+    """Tarefa de fundo iniciada no lifespan do app."""
+    while True:
+        try:
+            async with session_factory() as db:
+                await varrer(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Falha ao varrer vencimento de lotes")
+        await asyncio.sleep(intervalo)